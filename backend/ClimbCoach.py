@@ -1,31 +1,525 @@
 import anthropic
 from anthropic.types.beta import BetaToolUnionParam
+from pydantic import ValidationError
+import contextvars
+import hashlib
+import io
 import json
+import logging
+import numpy as np
 import pandas as pd
-from typing import List, Dict, Optional
 import requests
+import threading
+from typing import Any, Callable, Generator, Iterator, List, Dict, NamedTuple, Optional
 from dotenv import load_dotenv
 import os
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager, nullcontext
+
+from api_client import ApiClient, CircuitBreaker
+from conversations import Conversation, ConversationStore, TokenBudget
+from exercise_facets import FACET_FIELDS, FacetIndex
+from exercise_index import ExerciseIndex
+from exercise_store import ExerciseStore
+from exercise_vectors import ExerciseVectors
+from intent_router import Intent, match_intent, needs_full_model
+from schemas import WorkoutCreate, format_validation_error
+from snapshot import SnapshotCache, SourceFingerprints
+from telemetry import (BUILD_SECONDS, CHAT_ITERATIONS, CHAT_TURNS, DATASET_LOAD_SECONDS, DATASET_ROWS,
+                       EXERCISE_RELOADS, MODEL_CALL_SECONDS, MODEL_TOKENS, ROUTED_TURNS, TOOL_CALL_SECONDS, TOOL_CALLS,
+                       current_trace, setup_logging, span)
+from tool_results import ResultEncoder
+from training_load import LoadStateStore, window_fingerprint
+from ttl_cache import TTLCache
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = """You are an expert climbing coach with access to comprehensive datasets and specialized tools. 
+
+Your available tools:
+- get_training_load: Get user's current training load metrics and ACWR - USE THIS when creating workouts/plans
+- lookup_workouts: Get a list of all available workouts from the database (use this BEFORE creating training sessions)
+- search_exercises: Find exercises from 2900+ exercise database
+- create_workout: Create and save workouts to the database
+- create_training_session: Create and save training sessions with climbs and link to existing workouts
+
+When a user asks to create a training session:
+1. Use get_training_load FIRST to check their current load and ACWR
+2. Use lookup_workouts to find an appropriate existing workout to link
+3. Use create_training_session with a valid workoutId from the lookup results
+4. Adjust volume/intensity based on their ACWR to prevent overtraining
+
+When a user asks to create or save a workout:
+1. Use get_training_load FIRST to check their current load and ACWR
+2. Use create_workout tool, adjusting volume/intensity based on their training load
+
+When a user asks to log climbs:
+1. Use lookup_workouts first to find an appropriate workout
+2. Then use create_training_session
+
+Provide comprehensive, data-driven coaching advice based on the tools and data available."""
+
+# Marks the end of a prompt prefix Anthropic may cache between calls
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# Seconds a single tool call may take before the model is told it timed out
+TOOL_TIMEOUTS = {
+    "get_training_load": 15.0,
+    "lookup_workouts": 15.0,
+    "search_exercises": 5.0,
+    "create_workout": 60.0,
+    "create_training_session": 30.0,
+}
+DEFAULT_TOOL_TIMEOUT = 30.0
+
+# Tokens one tool result may add to the conversation before its largest table is cut behind a cursor
+TOOL_RESULT_BUDGETS = {
+    "get_training_load": 800,
+    "lookup_workouts": 1200,
+    "search_exercises": 1500,
+}
+DEFAULT_TOOL_RESULT_BUDGET = 1500
+
+# sort="rating" reorders the best ``limit * RATING_POOL_FACTOR`` (at least RATING_POOL_MIN) matches by rating
+RATING_POOL_FACTOR = 5
+RATING_POOL_MIN = 50
+
+# Training load state key; the app has a single athlete
+ATHLETE = "default"
+
+# Reply when a turn stops without a final answer
+MAX_ITERATIONS_REPLY = "Maximum iterations reached. Please try rephrasing your question."
+
+# Tools whose data a reply can be cached against; a turn calling any other tool is not cached
+CACHEABLE_TOOLS = ("get_training_load", "lookup_workouts", "search_exercises")
+
+# Version of the data each tool call of the current turn read, while recording_reads() is active
+_reads: contextvars.ContextVar[Optional[Dict[str, Optional[str]]]] = contextvars.ContextVar("reads", default=None)
+
+
+def tool_outcome(result: str) -> str:
+    """'failed' for the {"success": false, ...} results tools return on errors, else 'ok'"""
+    head = result[:32]
+    return "failed" if '"success": false' in head or '"success":false' in head else "ok"
+
+
+def usage_counts(usage) -> Dict[str, int]:
+    """Token counts of a response, including prompt cache reads and writes"""
+    return {
+        key: getattr(usage, key, 0) or 0
+        for key in ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+    }
+
+
+class ApiRequest(NamedTuple):
+    """A SvelteKit API call a tool flow waits on; the flow is sent its response"""
+    method: str
+    path: str
+    kwargs: Optional[Dict] = None
+
+
+# A tool's logic as a generator: yields ApiRequests, is sent their responses and returns the tool result.
+# The sync and async coaches only differ in how they make the requests (see _run_flow).
+Flow = Generator[ApiRequest, Any, str]
+
+
+class Turn:
+    """Tool-loop state of one chat turn, advanced the same way by the sync, async and streaming loops"""
+
+    def __init__(self, messages: List[Dict], digest: List[str], conversation: Optional[Conversation],
+                 model: Optional[str]):
+        self.messages = messages
+        self.digest = digest
+        self.conversation = conversation
+        self.model = model
+        self.iterations = 0
+        # Set once the turn has ended
+        self.reply: Optional[str] = None
+        # Token counts summed over the turn's model calls
+        self.usage: Dict[str, int] = {}
+
+
+class ExerciseData(NamedTuple):
+    """Exercise store with its search index, vectors and facets, replaced as one unit.
+
+    Readers take ``coach.exercises`` once per call, so a search never mixes
+    an index with a store it was not built from. ``vectors`` is None while
+    warm-up is still serving a keyword-only index.
+    """
+    store: ExerciseStore
+    index: ExerciseIndex
+    vectors: Optional[ExerciseVectors] = None
+    facets: Optional[FacetIndex] = None
+
+
+class WarmUp:
+    """Progress of loading the exercise data, reported by /readyz"""
+
+    def __init__(self):
+        self.status = "pending"  # pending, running, ready, timed_out or failed
+        self.stage: Optional[str] = None
+        self.error: Optional[str] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.done = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def start(self) -> None:
+        self.status = "running"
+        self.started = time.monotonic()
+
+    def finish(self, error: Optional[Exception] = None) -> None:
+        self.status = "failed" if error else "ready"
+        self.error = str(error) if error else None
+        self.stage = None
+        self.finished = time.monotonic()
+        self.done.set()
+
+    def time_out(self, timeout: float) -> None:
+        """Stop waiting; the load carries on and marks itself ready if it finishes"""
+        if not self.done.is_set():
+            self.status = "timed_out"
+            self.error = f"Still loading ({self.stage}) after {timeout:g} seconds"
+
+    def to_dict(self) -> Dict:
+        end = self.finished if self.finished is not None else time.monotonic()
+        return {
+            "status": self.status,
+            "stage": self.stage,
+            "error": self.error,
+            "elapsed_seconds": round(end - self.started, 3) if self.started is not None else None,
+        }
+
+
 class ClimbingCoachSystem:
-    def __init__(self, kaggle_gym_path, kaggle_climb_path, google_sheets_url, api_base_url: str = "http://localhost:5173"):
+    def __init__(self, kaggle_gym_path, kaggle_climb_path, google_sheets_url, api_base_url: str = "http://localhost:5173",
+                 lazy: bool = False):
         self.client = anthropic.Anthropic()
         # Allow overriding Claude model via env var; default to a supported model
         self.claude_model = os.getenv("CLAUDE_MODEL", "claude-sonnet-4-5")
+        # Cheaper, faster model for short questions that plan or write nothing; unset keeps every turn on claude_model
+        self.fast_model = os.getenv("CLAUDE_FAST_MODEL", "")
+        # Bare lookups ("show my ACWR") are answered from their read tool without a model call
+        self.intent_routing = os.getenv("INTENT_ROUTING", "1") != "0"
         self.kaggle_gym_path = kaggle_gym_path
         self.kaggle_climb_path = kaggle_climb_path
         self.google_sheets_url = google_sheets_url
         self.api_base_url = api_base_url
         
-        # Load and store data
-        self.gym_data = self.load_kaggle_gym_data(kaggle_gym_path)
-        self.climb_data = self.load_kaggle_climb_data(kaggle_climb_path)
-        self.sheets_data = self.load_google_sheets_data(google_sheets_url)
+        # Shared keep-alive client for the SvelteKit API tools
+        self.api = ApiClient(api_base_url, **self._api_client_settings())
         
-        # Create indexed knowledge bases
-        self.exercise_db = self._build_exercise_db()
+        # Short-lived cache of read tool results, invalidated by our own writes
+        self.read_cache = TTLCache(ttl=float(os.getenv("TOOL_CACHE_TTL", "30")))
+        # Share of keyword (BM25) score in hybrid exercise search
+        self.search_keyword_weight = float(os.getenv("SEARCH_KEYWORD_WEIGHT", "0.5"))
+        # Upper bound on sessions fetched for the locally computed training load
+        self.training_load_max_sessions = int(os.getenv("TRAINING_LOAD_MAX_SESSIONS", "1000"))
+        # Tool results as the model sees them: compact tables under a token budget per tool
+        result_budget = os.getenv("TOOL_RESULT_TOKEN_BUDGET")
+        self.result_encoder = ResultEncoder(
+            {} if result_budget else TOOL_RESULT_BUDGETS,
+            int(result_budget) if result_budget else DEFAULT_TOOL_RESULT_BUDGET,
+            verbose=os.getenv("TOOL_RESULT_FORMAT", "compact") == "verbose",
+            cursor_ttl=float(os.getenv("TOOL_RESULT_CURSOR_TTL", "600")),
+            max_cursors=int(os.getenv("TOOL_RESULT_CURSOR_MAX", "256")),
+        )
+        
+        # Static request prefix: built once and marked cacheable
+        self.system_blocks = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": CACHE_CONTROL}]
+        self._tools = self._build_tools()
+        
+        # Server-side chat history, trimmed to a per-call token budget
+        self.conversations = ConversationStore(
+            max_conversations=int(os.getenv("MAX_CONVERSATIONS", "256")),
+            ttl=float(os.getenv("CONVERSATION_TTL", "3600"))
+        )
+        self.token_budget = TokenBudget(
+            max_tokens=int(os.getenv("CONVERSATION_TOKEN_BUDGET", "12000")),
+            fixed_chars=len(SYSTEM_PROMPT) + len(json.dumps(self._tools))
+        )
+        # Cumulative token counts, including prompt cache reads/writes
+        self.token_usage = {
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "cache_read_input_tokens": 0,
+            "cache_creation_input_tokens": 0,
+        }
+        
+        # Bounded pool for running one turn's tool calls concurrently
+        self.tool_concurrency = int(os.getenv("TOOL_CONCURRENCY", "4"))
+        self.tool_executor = ThreadPoolExecutor(max_workers=self.tool_concurrency, thread_name_prefix="coach-tool")
+        
+        # Raw datasets are only loaded when the snapshot is stale, and dropped once it is rebuilt
+        self.gym_data = None
+        self.sheets_data = None
+        self._climb_data = None
+        self._climb_data_loaded = False
+
+        # Bounds every Google Sheets request, so a slow export cannot stall warm-up
+        self.sheets_timeout = float(os.getenv("SHEETS_TIMEOUT", "10"))
+
+        # Change detection for the gym CSV and the sheet, shared with the snapshot
+        self.source_fingerprints = SourceFingerprints(
+            sheets_ttl=float(os.getenv("SHEETS_SNAPSHOT_TTL", "3600")),
+            timeout=self.sheets_timeout
+        )
+        # Seconds between checks for changed sources once warm; 0 disables hot reload
+        self.refresh_interval = float(os.getenv("EXERCISE_REFRESH_INTERVAL", "300"))
+
+        # Snapshot of the processed exercise store; set EXERCISE_SNAPSHOT_DIR="" to disable
+        snapshot_dir = os.getenv("EXERCISE_SNAPSHOT_DIR", ".snapshot")
+        self.snapshot_cache = SnapshotCache(
+            snapshot_dir,
+            fingerprints=self.source_fingerprints
+        ) if snapshot_dir else None
+        # Incremental EWMA/ACWR state, persisted next to the snapshot
+        self.load_states = LoadStateStore(os.path.join(snapshot_dir, "training_load.json") if snapshot_dir else None)
+
+        # Create indexed knowledge bases; lazy callers run warm_up()/start_warm_up() themselves
+        self.exercises: Optional[ExerciseData] = None
+        self.warmup = WarmUp()
+        # Fingerprints of the sources ``exercises`` was built from
+        self.source_state: Optional[Dict[str, Dict]] = None
+        # One build at a time: warm-up, then refreshes
+        self._exercise_lock = threading.Lock()
+        self._refresh_stop = threading.Event()
+        if not lazy:
+            self.warm_up()
+
+    @property
+    def exercise_db(self) -> Optional[ExerciseStore]:
+        return self.exercises.store if self.exercises else None
+
+    @property
+    def exercise_index(self) -> Optional[ExerciseIndex]:
+        return self.exercises.index if self.exercises else None
+
+    @property
+    def exercise_vectors(self) -> Optional[ExerciseVectors]:
+        return self.exercises.vectors if self.exercises else None
+
+    def exercise_version(self) -> Optional[str]:
+        """Content fingerprint of the served exercise data; None while warm-up is still publishing partial indexes"""
+        if not self.warmup.ready:
+            return None
+        state = self.source_state or {}
+        # Without fingerprints (no snapshot, no hot reload) the data never changes after warm-up
+        return "|".join(str(state[key].get('sha256')) for key in sorted(state)) or "static"
+
+    def warm_up(self) -> None:
+        """Load the exercise store, index and vectors, recording progress in ``self.warmup``"""
+        self.warmup.start()
+        try:
+            with self._exercise_lock:
+                self._load_exercise_db()
+        except Exception as e:
+            logger.exception("Exercise database warm-up failed")
+            self.warmup.finish(e)
+            return
+        self.warmup.finish()
+
+    def start_warm_up(self, on_done: Optional[Callable[[], None]] = None) -> threading.Thread:
+        """Run warm_up on a daemon thread, calling ``on_done`` when it ends"""
+        def run():
+            self.warm_up()
+            if on_done is not None:
+                on_done()
+
+        thread = threading.Thread(target=run, name="coach-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def _exercise_sources(self) -> Dict[str, str]:
+        return {'gym_path': self.kaggle_gym_path, 'sheets_url': self.google_sheets_url}
+
+    def refresh_exercises(self) -> bool:
+        """Rebuild the exercise data if a source changed, then swap it in; returns whether it did.
+
+        The sheet is revalidated with a conditional request and the CSV by
+        mtime/size (then hash). The new store, index and vectors are built
+        on the calling thread while searches keep reading the current
+        ExerciseData, and replace it in a single assignment. A source that
+        fails to load keeps the current data. Workers sharing a snapshot
+        directory rebuild once: the others map the snapshot it saves.
+        """
+        with self._exercise_lock:
+            sources = self._exercise_sources()
+            fingerprints = self.source_fingerprints.sources(sources, self.source_state, max_age=0)
+            if SourceFingerprints.same(self.source_state, fingerprints):
+                self.source_state = fingerprints
+                EXERCISE_RELOADS.inc(outcome="unchanged")
+                return False
+
+            with self._shared_build():
+                snapshot, saved = self._load_snapshot(sources)
+                if snapshot is not None and SourceFingerprints.same(saved, fingerprints):
+                    self.exercises = snapshot
+                    self.source_state = saved
+                    EXERCISE_RELOADS.inc(outcome="swapped")
+                    logger.info("Swapped in exercise database snapshot with %d exercises", len(snapshot.store))
+                    return True
+
+                logger.info("Exercise sources changed; rebuilding the exercise database")
+                gym_data = self.load_kaggle_gym_data(self.kaggle_gym_path)
+                sheets_data = self.load_google_sheets_data(self.google_sheets_url) if self.google_sheets_url else None
+                if (gym_data is None and not fingerprints['gym_path'].get('missing')) or \
+                        (sheets_data is None and self.google_sheets_url):
+                    logger.warning("Keeping the current exercise database; a changed source could not be loaded")
+                    EXERCISE_RELOADS.inc(outcome="error")
+                    return False
+
+                with span("build_exercise_db", metric=BUILD_SECONDS, step="exercise_db"):
+                    store = ExerciseStore.from_sources(gym_data, sheets_data)
+                del gym_data, sheets_data
+                with span("build_index", metric=BUILD_SECONDS, step="index"):
+                    index = ExerciseIndex.from_store(store)
+                with span("build_vectors", metric=BUILD_SECONDS, step="vectors"):
+                    vectors = ExerciseVectors.from_index(index, dims=int(os.getenv("EXERCISE_VECTOR_DIMS", "96")))
+                with span("build_facets", metric=BUILD_SECONDS, step="facets"):
+                    facets = FacetIndex.from_store(store)
+
+                self.exercises = self._save_snapshot(fingerprints, ExerciseData(store, index, vectors, facets))
+                self.source_state = fingerprints
+            EXERCISE_RELOADS.inc(outcome="swapped")
+            logger.info("Swapped in exercise database with %d exercises", len(store))
+            return True
+
+    def start_refresher(self, interval: float) -> Optional[threading.Thread]:
+        """Call refresh_exercises every ``interval`` seconds on a daemon thread once warm-up is done"""
+        if interval <= 0:
+            return None
+
+        def run():
+            self.warmup.done.wait()
+            while not self._refresh_stop.wait(interval):
+                try:
+                    self.refresh_exercises()
+                except Exception:
+                    logger.exception("Exercise database refresh failed")
+                    EXERCISE_RELOADS.inc(outcome="error")
+
+        thread = threading.Thread(target=run, name="coach-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def stop_refresher(self) -> None:
+        self._refresh_stop.set()
+
+    def _shared_build(self):
+        """Lock out other processes building into the same snapshot directory"""
+        return self.snapshot_cache.build_lock() if self.snapshot_cache is not None else nullcontext()
+
+    def _load_snapshot(self, sources: Dict[str, str]):
+        """(ExerciseData, fingerprints) from the snapshot, or (None, fingerprints) when there is none or it is stale"""
+        if self.snapshot_cache is None:
+            return None, None
+        with span("load_snapshot", metric=DATASET_LOAD_SECONDS, dataset="exercise_snapshot"):
+            snapshot, fingerprints = self.snapshot_cache.load(sources)
+        return (ExerciseData(*snapshot) if snapshot is not None else None), fingerprints
+
+    def _save_snapshot(self, fingerprints: Optional[Dict[str, Dict]], data: ExerciseData) -> ExerciseData:
+        """Save ``data`` as the snapshot and return it memory-mapped from there.
+
+        Serving the mapped arrays instead of the freshly built ones lets the
+        heap copy go, so every worker shares the page-cache copy.
+        """
+        if self.snapshot_cache is None or fingerprints is None:
+            return data
+        try:
+            self.snapshot_cache.save(fingerprints, data.store, data.index, data.vectors, data.facets)
+        except OSError as e:
+            logger.warning("Error saving exercise database snapshot: %s", e)
+            return data
+        mapped = self.snapshot_cache.open()
+        return ExerciseData(*mapped) if mapped is not None else data
+
+    def _api_client_settings(self) -> Dict:
+        """Timeouts, retries and breaker for SvelteKit API calls, from env"""
+        return {
+            "connect_timeout": float(os.getenv("API_CONNECT_TIMEOUT", "3")),
+            "read_timeout": float(os.getenv("API_READ_TIMEOUT", "20")),
+            "max_retries": int(os.getenv("API_MAX_RETRIES", "2")),
+            "breaker": CircuitBreaker(
+                failure_threshold=int(os.getenv("API_BREAKER_THRESHOLD", "5")),
+                reset_timeout=float(os.getenv("API_BREAKER_RESET", "30"))
+            ),
+        }
+
+    @property
+    def climb_data(self):
+        """Kaggle climb dataset, loaded on first use"""
+        if not self._climb_data_loaded:
+            self._climb_data = self.load_kaggle_climb_data(self.kaggle_climb_path)
+            self._climb_data_loaded = True
+        return self._climb_data
+
+    def _load_exercise_db(self):
+        """Load the exercise store and index from snapshot, rebuilding if a source changed.
+
+        A rebuild publishes a keyword-only index of the gym data first, then
+        again with the sheet's exercises, so search works while the sheet
+        downloads and the vectors are computed. Workers sharing a snapshot
+        directory take turns: the first one rebuilds it and the others wait
+        for it, then map the saved arrays instead of building their own copy.
+        """
+        sources = self._exercise_sources()
+        if self.snapshot_cache is not None:
+            self.warmup.stage = "snapshot"
+            snapshot, fingerprints = self._load_snapshot(sources)
+            if snapshot is None:
+                self.warmup.stage = "snapshot_lock"
+                with self.snapshot_cache.build_lock():
+                    snapshot, fingerprints = self._load_snapshot(sources)
+                    if snapshot is None:
+                        self._build_exercise_data(fingerprints)
+                        return
+            self.exercises = snapshot
+            self.source_state = fingerprints
+            DATASET_ROWS.set(len(snapshot.store), dataset="exercise_snapshot")
+            logger.info("Loaded exercise database snapshot with %d exercises", len(snapshot.store))
+            return
+
+        # Fingerprint before loading, so a change made mid-load is picked up by the next refresh
+        self._build_exercise_data(self.source_fingerprints.sources(sources) if self.refresh_interval > 0 else None)
+
+    def _build_exercise_data(self, fingerprints: Optional[Dict[str, Dict]]):
+        """Build the store, index and vectors from the source datasets in stages"""
+        self.warmup.stage = "kaggle_gym"
+        self.gym_data = self.load_kaggle_gym_data(self.kaggle_gym_path)
+        self.sheets_data = None
+        self._publish_keyword_index()
+        if self.google_sheets_url:
+            self.warmup.stage = "google_sheets"
+            self.sheets_data = self.load_google_sheets_data(self.google_sheets_url)
+            if self.sheets_data is not None:
+                self._publish_keyword_index()
+
+        self.warmup.stage = "vectors"
+        data = self.exercises
+        with span("build_vectors", metric=BUILD_SECONDS, step="vectors"):
+            vectors = ExerciseVectors.from_index(data.index, dims=int(os.getenv("EXERCISE_VECTOR_DIMS", "96")))
+        self.gym_data = self.sheets_data = None
+        self.exercises = self._save_snapshot(fingerprints, data._replace(vectors=vectors))
+        self.source_state = fingerprints
+
+    def _publish_keyword_index(self):
+        """Build the store and BM25 index from the datasets loaded so far and serve them"""
+        self.warmup.stage = "index"
+        with span("build_exercise_db", metric=BUILD_SECONDS, step="exercise_db"):
+            store = self._build_exercise_db()
+        with span("build_index", metric=BUILD_SECONDS, step="index"):
+            index = ExerciseIndex.from_store(store)
+        with span("build_facets", metric=BUILD_SECONDS, step="facets"):
+            facets = FacetIndex.from_store(store)
+        self.exercises = ExerciseData(store, index, facets=facets)
 
     def load_google_sheets_data(self, url):
         """Load data from Google Sheets CSV export"""
@@ -36,81 +530,61 @@ class ClimbingCoachSystem:
             else:
                 csv_url = url
             
-            df = pd.read_csv(csv_url)
-            print(f"Loaded Google Sheets data: {df.shape[0]} rows, {df.shape[1]} columns")
+            with span("load_google_sheets", metric=DATASET_LOAD_SECONDS, dataset="google_sheets"):
+                if csv_url.startswith(("http://", "https://")):
+                    # Reuse the export a change check just downloaded
+                    body = self.source_fingerprints.take_body(url)
+                    if body is None:
+                        response = requests.get(csv_url, timeout=self.sheets_timeout)
+                        response.raise_for_status()
+                        body = response.content
+                    df = pd.read_csv(io.BytesIO(body))
+                else:
+                    df = pd.read_csv(csv_url)
+            DATASET_ROWS.set(df.shape[0], dataset="google_sheets")
+            logger.info("Loaded Google Sheets data: %d rows, %d columns", df.shape[0], df.shape[1])
             return df
         except Exception as e:
-            print(f"Error loading Google Sheets data: {e}")
+            logger.warning("Error loading Google Sheets data: %s", e)
             return None
     
     def load_kaggle_gym_data(self, file_path):
         """Load Kaggle gym exercise dataset"""
         try:
-            df = pd.read_csv(file_path)
-            print(f"Loaded Kaggle gym data: {df.shape[0]} rows, {df.shape[1]} columns")
+            with span("load_kaggle_gym", metric=DATASET_LOAD_SECONDS, dataset="kaggle_gym"):
+                df = pd.read_csv(file_path)
+            DATASET_ROWS.set(df.shape[0], dataset="kaggle_gym")
+            logger.info("Loaded Kaggle gym data: %d rows, %d columns", df.shape[0], df.shape[1])
             return df
         except Exception as e:
-            print(f"Error loading Kaggle gym data: {e}")
+            logger.warning("Error loading Kaggle gym data: %s", e)
             return None
     
     def load_kaggle_climb_data(self, file_path):
         """Load Kaggle climbing dataset"""
         try:
             if isinstance(file_path, str):
-                df = pd.read_csv(file_path)
-                print(f"Loaded Kaggle climb data: {df.shape[0]} rows, {df.shape[1]} columns")
+                with span("load_kaggle_climb", metric=DATASET_LOAD_SECONDS, dataset="kaggle_climb"):
+                    df = pd.read_csv(file_path)
+                DATASET_ROWS.set(df.shape[0], dataset="kaggle_climb")
+                logger.info("Loaded Kaggle climb data: %d rows, %d columns", df.shape[0], df.shape[1])
                 return df
             elif isinstance(file_path, dict):
                 dfs = {}
                 for key, path in file_path.items():
-                    dfs[key] = pd.read_csv(path)
-                    print(f"Loaded {key}: {dfs[key].shape[0]} rows")
+                    with span("load_kaggle_climb", metric=DATASET_LOAD_SECONDS, dataset=f"kaggle_climb_{key}"):
+                        dfs[key] = pd.read_csv(path)
+                    DATASET_ROWS.set(dfs[key].shape[0], dataset=f"kaggle_climb_{key}")
+                    logger.info("Loaded %s: %d rows", key, dfs[key].shape[0])
                 return dfs
         except Exception as e:
-            print(f"Error loading Kaggle climb data: {e}")
+            logger.warning("Error loading Kaggle climb data: %s", e)
             return None
     
-    def _build_exercise_db(self) -> List[Dict]:
+    def _build_exercise_db(self) -> ExerciseStore:
         """Build searchable exercise database"""
-        exercises = []
-        
-        if self.gym_data is not None:
-            climbing_relevant_bodyparts = ['forearms', 'shoulders', 'back', 'core', 'abs', 'lats', 'biceps', 'chest', 'triceps']
-            
-            for _, row in self.gym_data.iterrows():
-                try:
-                    bodypart = str(row.get('BodyPart', '')).lower()
-                    if any(bp in bodypart for bp in climbing_relevant_bodyparts):
-                        desc = str(row.get('Desc', ''))
-                        exercises.append({
-                            'name': row.get('Title', 'Unknown'),
-                            'description': desc[:300] if len(desc) > 300 else desc,
-                            'bodypart': row.get('BodyPart', ''),
-                            'equipment': row.get('Equipment', ''),
-                            'level': row.get('Level', ''),
-                            'type': row.get('Type', ''),
-                            'rating': row.get('Rating', '')
-                        })
-                except:
-                    continue
-        
-        if self.sheets_data is not None:
-            for _, row in self.sheets_data.iterrows():
-                try:
-                    exercise = {}
-                    for col in self.sheets_data.columns:
-                        if pd.notna(row[col]):
-                            val = str(row[col])
-                            # Truncate long text fields
-                            if len(val) > 300:
-                                val = val[:300]
-                            exercise[col] = val
-                    if exercise:
-                        exercises.append(exercise)
-                except:
-                    continue
-        
-        print(f"Built exercise database with {len(exercises)} exercises")
+        exercises = ExerciseStore.from_sources(self.gym_data, self.sheets_data)
+        logger.info("Built exercise database with %d exercises", len(exercises))
         return exercises
     
     def _build_progression_db(self) -> List[Dict]:
@@ -140,78 +614,169 @@ class ClimbingCoachSystem:
                             'source': 'climb_data'
                         })
         
-        print(f"Built progression database with {len(progressions)} entries")
+        logger.info("Built progression database with %d entries", len(progressions))
         return progressions
     
     
     
-    def search_exercises(self, query: str, limit: int = 4) -> str:
-        """Search for exercises based on query"""
-        query_lower = query.lower()
-        results = []
-        
-        for exercise in self.exercise_db:
-            score = 0
-            exercise_text = json.dumps(exercise).lower()
-            
-            # Simple keyword matching
-            for word in query_lower.split():
-                if word in exercise_text:
-                    score += 1
-            
-            if score > 0:
-                results.append((score, exercise))
-        
-        results.sort(reverse=True, key=lambda x: x[0])
-        top_results = []
-        for _, ex in results[:limit]:
-            # Create truncated version
-            truncated = {
-                'name': ex.get('name', 'Unknown'),
-                'bodypart': ex.get('bodypart', ''),
-                'equipment': ex.get('equipment', ''),
-                'level': ex.get('level', ''),
-                # Truncate description to 150 chars
-                'description': (ex.get('description', '')[:150] + '...') if len(ex.get('description', '')) > 150 else ex.get('description', '')
-            }
-            top_results.append(truncated)
+    def _search_exercise_ids(self, data: ExerciseData, queries: List[str], limit: int, mode: str,
+                             docs: Optional[np.ndarray] = None, sort: str = "relevance") -> List[List[int]]:
+        """Doc ids per query for a search mode: keyword (BM25), semantic (LSA) or hybrid.
+
+        Until the vectors are built every mode falls back to keyword search.
+        ``docs`` (from FacetIndex.match) limits scoring to those exercises.
+        With ``sort="rating"`` the most relevant matches are reordered best
+        rated first.
+        """
+        fetch = max(limit * RATING_POOL_FACTOR, RATING_POOL_MIN) if sort == "rating" else limit
+        if mode == "keyword" or data.vectors is None:
+            allowed = None
+            if docs is not None:
+                allowed = np.zeros(len(data.store), dtype=bool)
+                allowed[docs] = True
+            results = [[doc_id for _, doc_id in data.index.search(q, fetch, allowed)] for q in queries]
+        else:
+            keyword_weight = 0.0 if mode == "semantic" else self.search_keyword_weight
+            hits = data.vectors.search_batch(data.index, queries, fetch, keyword_weight, docs)
+            results = [[doc_id for _, doc_id in query_hits] for query_hits in hits]
+        if sort == "rating":
+            results = [data.facets.by_rating(np.asarray(ids, dtype=np.int64), limit).tolist() for ids in results]
+        return results
+
+    def _browse_exercise_ids(self, data: ExerciseData, docs: Optional[np.ndarray], limit: int, sort: str) -> List[int]:
+        """Exercises for a filter-only search: best rated first, or in database order"""
+        if sort == "rating":
+            if docs is None:
+                return data.facets.rating_order[:limit].tolist()
+            return data.facets.by_rating(docs, limit).tolist()
+        if docs is None:
+            return list(range(min(limit, len(data.store))))
+        return docs[:limit].tolist()
+
+    def _filter_exercise_ids(self, data: ExerciseData, filters: Optional[Dict]):
+        """Doc ids matching ``filters`` (None when there are none), or an error result naming unknown values"""
+        filters = {
+            field: [values] if isinstance(values, str) else list(values)
+            for field, values in (filters or {}).items() if values
+        }
+        if not filters:
+            return None, None
+        unknown = data.facets.unknown(filters)
+        if unknown:
+            return None, json.dumps({
+                "success": False,
+                "error": "No exercises have these filter values; use the known values or drop the filter",
+                "unknown": unknown,
+                "known_values": {field: data.facets.values(field) for field in unknown if field in FACET_FIELDS}
+            }, indent=2)
+        return data.facets.match(filters), None
+
+    def _warming_up_result(self) -> str:
+        """Search result returned before any exercise index is available"""
+        return json.dumps({
+            "success": False,
+            "warming_up": True,
+            "error": "The exercise database is still loading. Try again shortly, or answer without exercise search."
+        }, indent=2)
+
+    def _format_exercise(self, ex: Dict) -> Dict:
+        """Truncated exercise record for tool results"""
+        return {
+            'name': ex.get('name', 'Unknown'),
+            'bodypart': ex.get('bodypart', ''),
+            'equipment': ex.get('equipment', ''),
+            'level': ex.get('level', ''),
+            # Truncate description to 150 chars
+            'description': (ex.get('description', '')[:150] + '...') if len(ex.get('description', '')) > 150 else ex.get('description', '')
+        }
+
+    def search_exercises(self, query: str, limit: int = 4, mode: str = "hybrid", filters: Optional[Dict] = None,
+                         sort: str = "relevance") -> str:
+        """Search for exercises based on query, optionally within bodypart/equipment/level/type filters"""
+        data = self.exercises
+        if data is None:
+            return self._warming_up_result()
+        docs, error = self._filter_exercise_ids(data, filters)
+        if error:
+            return error
+        if query.strip():
+            (doc_ids,) = self._search_exercise_ids(data, [query], limit, mode, docs, sort)
+        else:
+            doc_ids = self._browse_exercise_ids(data, docs, limit, sort)
+        top_results = [self._format_exercise(ex) for ex in data.store.records(doc_ids)]
     
         return json.dumps(top_results, indent=2)
+
+    def search_exercises_batch(self, queries: List[str], limit: int = 4, mode: str = "hybrid",
+                               filters: Optional[Dict] = None, sort: str = "relevance") -> str:
+        """Run several searches in one call, sharing any filters; results are keyed by query"""
+        data = self.exercises
+        if data is None:
+            return self._warming_up_result()
+        docs, error = self._filter_exercise_ids(data, filters)
+        if error:
+            return error
+        results = self._search_exercise_ids(data, queries, limit, mode, docs, sort)
+        return json.dumps({
+            query: [self._format_exercise(ex) for ex in data.store.records(doc_ids)]
+            for query, doc_ids in zip(queries, results)
+        }, indent=2)
+
+    def _search_tool(self, tool_input: Dict) -> str:
+        """Dispatch a search_exercises call to the single or batched search"""
+        limit = tool_input.get("limit", 8)
+        mode = tool_input.get("mode", "hybrid")
+        filters = tool_input.get("filters")
+        sort = tool_input.get("sort", "relevance")
+        if tool_input.get("queries"):
+            return self.search_exercises_batch(tool_input["queries"], limit, mode, filters, sort)
+        return self.search_exercises(tool_input.get("query", ""), limit, mode, filters, sort)
     
     
     
+    def _validate_session_data(self, session_data: dict) -> Optional[str]:
+        """Return an error result if required session fields are missing"""
+        required_fields = ['name', 'scheduledDate']
+        missing_fields = [f for f in required_fields if f not in session_data]
+        if missing_fields:
+            return json.dumps({
+                "success": False,
+                "error": f"Missing required fields: {', '.join(missing_fields)}"
+            }, indent=2)
+        return None
+
+    def _format_session_response(self, response) -> str:
+        """Format the /api/training POST response as a tool result"""
+        if response.status_code == 201:
+            created_session = response.json()
+            return json.dumps({
+                "success": True,
+                "message": f"Training session '{created_session['name']}' created successfully!",
+                "sessionId": created_session.get('id')
+            }, indent=2)
+        else:
+            return json.dumps({
+                "success": False,
+                "error": response.json().get("error", "Failed to create training session"),
+                "status_code": response.status_code
+            }, indent=2)
+
     def create_training_session_in_db(self, session_data: dict) -> str:
         """Create and save training session to database - accepts pre-parsed JSON"""
+        return self._run_flow(self._create_training_session_flow(session_data))
+
+    def _create_training_session_flow(self, session_data: dict) -> Flow:
         try:
-            # Validate required fields
-            required_fields = ['name', 'scheduledDate']
-            missing_fields = [f for f in required_fields if f not in session_data]
-            if missing_fields:
-                return json.dumps({
-                    "success": False,
-                    "error": f"Missing required fields: {', '.join(missing_fields)}"
-                }, indent=2)
+            error = self._validate_session_data(session_data)
+            if error:
+                return error
         
             # POST to API directly - NO nested Claude call
-            response = requests.post(
-                f"{self.api_base_url}/api/training",
-                json=session_data,
-                headers={"Content-Type": "application/json"}
-            )
-        
+            response = yield ApiRequest("POST", "/api/training", {"json": session_data})
             if response.status_code == 201:
-                created_session = response.json()
-                return json.dumps({
-                    "success": True,
-                    "message": f"Training session '{created_session['name']}' created successfully!",
-                    "sessionId": created_session.get('id')
-                }, indent=2)
-            else:
-                return json.dumps({
-                    "success": False,
-                    "error": response.json().get("error", "Failed to create training session"),
-                    "status_code": response.status_code
-                }, indent=2)
+                self.load_states.record(ATHLETE, response.json())
+                self.read_cache.invalidate("training_load")
+            return self._format_session_response(response)
             
         except Exception as e:
             return json.dumps({
@@ -219,73 +784,48 @@ class ClimbingCoachSystem:
                 "error": f"Error creating training session: {str(e)}"
             }, indent=2)
 
-    def create_workout_in_db(self, workout_request: str) -> str:
-        """Create and save workout to database"""
+    def _validate_workout_data(self, workout_data: dict):
+        """Validate structured workout input locally; returns (payload, error result)"""
         try:
-            # Use Claude to parse the workout request
-            parse_response = self.client.messages.create(
-                model=self.claude_model,
-                max_tokens=1024,
-                messages=[{
-                    "role": "user",
-                    "content": f"""Parse this workout request into JSON format:
-                    {{
-                        "name": "workout name",
-                        "description": "brief description",
-                        "userId": null,
-                        "scheduledDate": "ISO 8601 date or null",
-                        "exercises": [
-                            {{
-                                "name": "exercise name",
-                                "sets": number,
-                                "reps": number or null,
-                                "duration": seconds or null,
-                                "rest": seconds or null
-                            }}
-                        ]
-                    }}
-                    
-                    Today is October 10, 2025. Convert any mentioned dates to ISO 8601 format.
-                    
-                    Request: {workout_request}
-                    
-                    Return ONLY valid JSON, no other text."""
-                }]
-            )
-            
-            workout_json_str = parse_response.content[0].text.strip()
-            
-            # Clean up response
-            if workout_json_str.startswith("```json"):
-                workout_json_str = workout_json_str[7:]
-            if workout_json_str.startswith("```"):
-                workout_json_str = workout_json_str[3:]
-            if workout_json_str.endswith("```"):
-                workout_json_str = workout_json_str[:-3]
-            workout_json_str = workout_json_str.strip()
-            
-            workout_data = json.loads(workout_json_str)
+            workout = WorkoutCreate.model_validate(workout_data)
+        except ValidationError as e:
+            return None, json.dumps({
+                "success": False,
+                "error": f"Invalid workout_data: {format_validation_error(e)}"
+            }, indent=2)
+        return workout.model_dump(exclude_none=True), None
+
+    def _format_workout_response(self, response) -> str:
+        """Format the /api/workouts POST response as a tool result"""
+        if response.status_code == 201:
+            created_workout = response.json()
+            return json.dumps({
+                "success": True,
+                "message": f"Workout '{created_workout['name']}' created successfully!",
+                "workout": created_workout
+            }, indent=2)
+        else:
+            return json.dumps({
+                "success": False,
+                "error": response.json().get("error", "Failed to create workout"),
+                "status_code": response.status_code
+            }, indent=2)
+
+    def create_workout_in_db(self, workout_data: dict) -> str:
+        """Create and save workout to database - accepts structured JSON"""
+        return self._run_flow(self._create_workout_flow(workout_data))
+
+    def _create_workout_flow(self, workout_data: dict) -> Flow:
+        try:
+            payload, error = self._validate_workout_data(workout_data)
+            if error:
+                return error
             
             # POST to API
-            response = requests.post(
-                f"{self.api_base_url}/api/workouts",
-                json=workout_data,
-                headers={"Content-Type": "application/json"}
-            )
-            
+            response = yield ApiRequest("POST", "/api/workouts", {"json": payload})
             if response.status_code == 201:
-                created_workout = response.json()
-                return json.dumps({
-                    "success": True,
-                    "message": f"Workout '{created_workout['name']}' created successfully!",
-                    "workout": created_workout
-                }, indent=2)
-            else:
-                return json.dumps({
-                    "success": False,
-                    "error": response.json().get("error", "Failed to create workout"),
-                    "status_code": response.status_code
-                }, indent=2)
+                self.read_cache.invalidate("workouts")
+            return self._format_workout_response(response)
                 
         except Exception as e:
             return json.dumps({
@@ -293,63 +833,83 @@ class ClimbingCoachSystem:
                 "error": f"Error creating workout: {str(e)}"
             }, indent=2)
     
+    def _training_sessions_params(self) -> Dict:
+        """Query for the sessions behind the training load: the last 180 days"""
+        now = datetime.now(timezone.utc)
+        return {
+            "from": (now - timedelta(days=180)).isoformat(),
+            "to": now.isoformat(),
+            "take": self.training_load_max_sessions,
+        }
+
+    def _format_training_load_failure(self) -> str:
+        return json.dumps({
+            "success": False,
+            "message": "Failed to fetch training load data from API"
+        }, indent=2)
+
+    def _format_training_load(self, tl: Optional[Dict]) -> str:
+        """Format a trainingLoad summary as a tool result"""
+        if not tl:
+            return json.dumps({
+                "success": False,
+                "message": "No training load data available. User may not have any training sessions logged yet."
+            }, indent=2)
+        
+        # Interpret ACWR
+        acwr = tl.get('currentACWR')
+        interpretation = "Unknown"
+        recommendation = "Unable to provide recommendation without ACWR data."
+        
+        if acwr is not None:
+            if acwr < 0.8:
+                interpretation = "Undertraining"
+                recommendation = "Consider gradually increasing training volume. You have capacity for more work."
+            elif 0.8 <= acwr <= 1.5:
+                interpretation = "Optimal"
+                recommendation = "Your training load is well-balanced. Continue progressive training."
+            else:
+                interpretation = "Overtraining Risk"
+                recommendation = "CAUTION: High injury risk. Reduce volume, focus on recovery, consider a deload week."
+        
+        return json.dumps({
+            "success": True,
+            "training_load": {
+                "acwr": acwr,
+                "acwr_interpretation": interpretation,
+                "acwr_recommendation": recommendation,
+                "acute_load_7day": tl.get('acuteLoad'),
+                "chronic_load_42day": tl.get('chronicLoad'),
+                "max_grade_climbed": f"V{tl.get('maxGrade')}" if tl.get('maxGrade') is not None else "N/A",
+                "recent_sessions_7days": tl.get('recentSessionCount', 0),
+                "average_session_load": round(tl.get('averageSessionLoad', 0), 2),
+                "total_load": round(tl.get('totalLoad', 0), 2),
+                "recent_sessions": tl.get('recentSessions', [])
+            },
+            "optimal_range": "ACWR between 0.8-1.5 is optimal for progressive training without excessive injury risk"
+        }, indent=2)
+
     def get_training_load(self) -> str:
         """Get current training load metrics for the user"""
+        return self._run_flow(self._training_load_flow())
+
+    def _training_load_flow(self) -> Flow:
+        cached = self.read_cache.get("training_load")
+        if cached is not None:
+            return cached
         try:
-            # Fetch training load from API
-            response = requests.get(
-                f"{self.api_base_url}/api/training-load",
-                headers={"Content-Type": "application/json"}
-            )
-            
+            token = self.read_cache.token("training_load")
+            response = yield ApiRequest("GET", "/api/training", {"params": self._training_sessions_params()})
             if response.status_code != 200:
-                return json.dumps({
-                    "success": False,
-                    "message": "Failed to fetch training load data from API"
-                }, indent=2)
-            
-            data = response.json()
-            
-            if not data.get('success') or not data.get('trainingLoad'):
-                return json.dumps({
-                    "success": False,
-                    "message": "No training load data available. User may not have any training sessions logged yet."
-                }, indent=2)
-            
-            tl = data['trainingLoad']
-            
-            # Interpret ACWR
-            acwr = tl.get('currentACWR')
-            interpretation = "Unknown"
-            recommendation = "Unable to provide recommendation without ACWR data."
-            
-            if acwr is not None:
-                if acwr < 0.8:
-                    interpretation = "Undertraining"
-                    recommendation = "Consider gradually increasing training volume. You have capacity for more work."
-                elif 0.8 <= acwr <= 1.5:
-                    interpretation = "Optimal"
-                    recommendation = "Your training load is well-balanced. Continue progressive training."
-                else:
-                    interpretation = "Overtraining Risk"
-                    recommendation = "CAUTION: High injury risk. Reduce volume, focus on recovery, consider a deload week."
-            
-            return json.dumps({
-                "success": True,
-                "training_load": {
-                    "acwr": acwr,
-                    "acwr_interpretation": interpretation,
-                    "acwr_recommendation": recommendation,
-                    "acute_load_7day": tl.get('acuteLoad'),
-                    "chronic_load_42day": tl.get('chronicLoad'),
-                    "max_grade_climbed": f"V{tl.get('maxGrade')}" if tl.get('maxGrade') is not None else "N/A",
-                    "recent_sessions_7days": tl.get('recentSessionCount', 0),
-                    "average_session_load": round(tl.get('averageSessionLoad', 0), 2),
-                    "total_load": round(tl.get('totalLoad', 0), 2),
-                    "recent_sessions": tl.get('recentSessions', [])
-                },
-                "optimal_range": "ACWR between 0.8-1.5 is optimal for progressive training without excessive injury risk"
-            }, indent=2)
+                return self._format_training_load_failure()
+            sessions = response.json()
+            # The stored state is reused only while every session in the window is unchanged
+            tl = self.load_states.summary(ATHLETE, window_fingerprint(sessions)) if sessions else None
+            if sessions and tl is None:
+                tl = self.load_states.rebuild(ATHLETE, sessions).summary()
+            result = self._format_training_load(tl)
+            self.read_cache.set("training_load", result, token)
+            return result
             
         except Exception as e:
             return json.dumps({
@@ -358,14 +918,23 @@ class ClimbingCoachSystem:
             }, indent=2)
     
     def get_tools(self) -> List[BetaToolUnionParam]:
+        """Tool specifications, built once and shared by every request"""
+        return self._tools
+
+    def _build_tools(self) -> List[BetaToolUnionParam]:
         """Define Claude tool specifications"""
-        return [
+        tools = [
             {
                 "name": "get_training_load",
                 "description": "Get the user's current training load metrics including ACWR (Acute:Chronic Workload Ratio), recent session data, and personalized recommendations. Use this when creating workouts or training plans to ensure proper load management and injury prevention.",
                 "input_schema": {
                     "type": "object",
-                    "properties": {},
+                    "properties": {
+                        "cursor": {
+                            "type": "string",
+                            "description": "Continue a truncated result: the cursor from its \"more\" field"
+                        }
+                    },
                     "required": []
                 }
             },
@@ -374,7 +943,12 @@ class ClimbingCoachSystem:
                 "description": "Get a list of all available workouts from the database. Use this to find workout IDs when creating training sessions.",
                 "input_schema": {
                     "type": "object",
-                    "properties": {},
+                    "properties": {
+                        "cursor": {
+                            "type": "string",
+                            "description": "Continue a truncated result: the cursor from its \"more\" field"
+                        }
+                    },
                     "required": []
                 }
             },
@@ -393,7 +967,11 @@ The search matches these fields against your query terms. Relevant keywords incl
 - Body parts: forearms, shoulders, back, core, abs, lats, biceps, chest, triceps
 - Common equipment: hangboard, campus board, rings, weights
 - Exercise types: strength, endurance, power
-- Training goals: finger strength, power endurance, technique""",
+- Training goals: finger strength, power endurance, technique
+
+The default hybrid mode also matches related words (e.g. "grip" finds forearm and wrist exercises), so one search per topic is usually enough. To look up several topics, pass them together in "queries" instead of calling the tool repeatedly.
+
+For hard requirements like a difficulty level or available equipment, use "filters" rather than query words: only exercises with one of the listed values in every given field are returned. With filters, "query" may be empty to list matching exercises. An unknown filter value returns the values that exist.""",
                 "input_schema": {
                     "type": "object",
                     "properties": {
@@ -401,13 +979,41 @@ The search matches these fields against your query terms. Relevant keywords incl
                             "type": "string",
                             "description": "Search query using relevant keywords like body parts (forearms, core), equipment (hangboard), or training goals (finger strength)"
                         },
+                        "queries": {
+                            "type": "array",
+                            "items": {"type": "string"},
+                            "description": "Several search queries to run at once; results are returned per query"
+                        },
                         "limit": {
                             "type": "integer",
-                            "description": "Maximum number of exercises to return (default: 8)",
+                            "description": "Maximum number of exercises to return per query (default: 8)",
                             "default": 8
+                        },
+                        "mode": {
+                            "type": "string",
+                            "enum": ["hybrid", "semantic", "keyword"],
+                            "description": "hybrid (default) blends related-word matching with keyword matching; keyword only matches the query's words",
+                            "default": "hybrid"
+                        },
+                        "filters": {
+                            "type": "object",
+                            "description": "Exact field values to restrict results to, e.g. {\"level\": [\"Beginner\"], \"bodypart\": [\"Forearms\"], \"equipment\": [\"Body Only\"]}",
+                            "properties": {
+                                field: {"type": "array", "items": {"type": "string"}}
+                                for field in FACET_FIELDS
+                            }
+                        },
+                        "sort": {
+                            "type": "string",
+                            "enum": ["relevance", "rating"],
+                            "description": "relevance (default), or rating to put the best rated of the relevant exercises first",
+                            "default": "relevance"
+                        },
+                        "cursor": {
+                            "type": "string",
+                            "description": "Continue a truncated result: the cursor from its \"more\" field"
                         }
-                    },
-                    "required": ["query"]
+                    }
                 }
             },
             {
@@ -416,12 +1022,44 @@ The search matches these fields against your query terms. Relevant keywords incl
                 "input_schema": {
                     "type": "object",
                     "properties": {
-                        "workout_request": {
-                            "type": "string",
-                            "description": "Full description of the workout including name, exercises with sets/reps/duration, and optional scheduled date. Example: 'Create a workout called Finger Strength scheduled for October 15, 2025 with hangboard training: 5 sets of 10 second hangs with 3 minute rest'"
+                        "workout_data": {
+                            "type": "object",
+                            "description": """Structured workout. Example:
+{
+  "name": "Finger Strength",
+  "description": "Max hangs on a 20mm edge",
+  "scheduledDate": "2025-10-15T00:00:00.000Z",
+  "exercises": [
+    {"name": "Max hangs", "sets": 5, "reps": null, "duration": 10, "rest": 180}
+  ]
+}
+
+IMPORTANT:
+- duration and rest are in seconds
+- Date must be ISO 8601 format or null""",
+                            "properties": {
+                                "name": {"type": "string"},
+                                "description": {"type": "string"},
+                                "scheduledDate": {"type": ["string", "null"]},
+                                "exercises": {
+                                    "type": "array",
+                                    "items": {
+                                        "type": "object",
+                                        "properties": {
+                                            "name": {"type": "string"},
+                                            "sets": {"type": "integer"},
+                                            "reps": {"type": ["integer", "null"]},
+                                            "duration": {"type": ["integer", "null"]},
+                                            "rest": {"type": ["integer", "null"]}
+                                        },
+                                        "required": ["name", "sets"]
+                                    }
+                                }
+                            },
+                            "required": ["name", "exercises"]
                         }
                     },
-                    "required": ["workout_request"]
+                    "required": ["workout_data"]
                 }
             },
             {
@@ -469,145 +1107,438 @@ IMPORTANT:
     }
 }
         ]
+        # Cache breakpoint after the last tool caches the whole tool list
+        tools[-1] = {**tools[-1], "cache_control": CACHE_CONTROL}
+        return tools
+
+    def _request_messages(self, messages: List[Dict]) -> List[Dict]:
+        """Copy of messages with a cache breakpoint on the newest user content.
+
+        Each iteration of a turn then reads everything before its new tool
+        results from the prompt cache. Only the final message is marked so
+        the request stays within the API's breakpoint limit.
+        """
+        if not messages:
+            return messages
+        last = messages[-1]
+        content = last["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        content = list(content)
+        content[-1] = {**content[-1], "cache_control": CACHE_CONTROL}
+        return messages[:-1] + [{**last, "content": content}]
+
+    def _request_kwargs(self, messages: List[Dict], max_tokens: int = 2048, model: Optional[str] = None) -> Dict:
+        """Arguments for a tool-loop model call with cacheable prefixes.
+
+        The system prompt, tools and messages are plain JSON already, so
+        they go in ``extra_body``, which the SDK sends as is. Passed as
+        parameters, the SDK walks every content block against each member
+        of its param unions on every call: milliseconds per call, growing
+        with the history, and on the event loop for the async client.
+        """
+        return {
+            "model": model or self.claude_model,
+            "max_tokens": max_tokens,
+            "messages": [],
+            "extra_body": {
+                "system": self.system_blocks,
+                "tools": self.get_tools(),
+                "messages": self._request_messages(messages),
+            },
+        }
+
+    def _record_usage(self, usage, model: Optional[str] = None) -> Dict[str, int]:
+        """Extract token counts (including prompt cache hits) from a response"""
+        counts = usage_counts(usage)
+        for key, value in counts.items():
+            self.token_usage[key] += value
+        for kind, key in (("input", "input_tokens"), ("output", "output_tokens"),
+                          ("cache_read", "cache_read_input_tokens"), ("cache_write", "cache_creation_input_tokens")):
+            MODEL_TOKENS.inc(counts[key], model=model or self.claude_model, kind=kind)
+        logger.debug(
+            "Tokens: input=%d output=%d cache_read=%d cache_write=%d", counts["input_tokens"],
+            counts["output_tokens"], counts["cache_read_input_tokens"], counts["cache_creation_input_tokens"]
+        )
+        return counts
+
+    def _record_turn(self, iterations: int, outcome: str) -> None:
+        """Model calls a turn used, and whether it ended normally or hit max_iterations"""
+        CHAT_ITERATIONS.observe(iterations)
+        CHAT_TURNS.inc(outcome=outcome)
     
     def process_tool_call(self, tool_name: str, tool_input: Dict) -> str:
         """Process tool calls and return results"""
+        return self._run_flow(self._tool_flow(tool_name, tool_input))
+
+    def _tool_flow(self, tool_name: str, tool_input: Dict) -> Flow:
         if tool_name == "get_training_load":
-            return self.get_training_load()
+            return (yield from self._training_load_flow())
         elif tool_name == "lookup_workouts":
-            return self.lookup_past_workouts()
+            return (yield from self._workouts_flow())
         elif tool_name == "search_exercises":
-            return self.search_exercises(tool_input["query"], tool_input.get("limit", 8))
+            return self._search_tool(tool_input)
         elif tool_name == "create_workout":
-            return self.create_workout_in_db(tool_input["workout_request"])
+            return (yield from self._create_workout_flow(tool_input["workout_data"]))
         elif tool_name == "create_training_session":
-            return self.create_training_session_in_db(tool_input["session_data"])
+            return (yield from self._create_training_session_flow(tool_input["session_data"]))
         else:
             return json.dumps({"error": f"Unknown tool: {tool_name}"})
+
+    def _run_flow(self, flow: Flow) -> str:
+        """Run a tool flow, making its API requests with the blocking client"""
+        try:
+            request = next(flow)
+            while True:
+                try:
+                    response = self.api.request(request.method, request.path, **(request.kwargs or {}))
+                except Exception as e:
+                    request = flow.throw(e)
+                else:
+                    request = flow.send(response)
+        except StopIteration as done:
+            return done.value
     
-    def create_training_plan(self, user_query: str, max_iterations: int = 6, context: dict = None) -> str:
+    def _tool_timeout_result(self, tool_name: str) -> str:
+        """Tool result returned when a tool exceeds its time budget"""
+        timeout = TOOL_TIMEOUTS.get(tool_name, DEFAULT_TOOL_TIMEOUT)
+        return json.dumps({
+            "success": False,
+            "error": f"Tool {tool_name} timed out after {timeout:g} seconds"
+        }, indent=2)
+
+    def _tool_error_result(self, tool_name: str, error: Exception) -> str:
+        """Tool result returned when a tool raises"""
+        return json.dumps({"error": f"Error running {tool_name}: {str(error)}"})
+
+    def _page_tool_result(self, tool_name: str, tool_input: Dict) -> Optional[str]:
+        """The next page of a cut result when the call passes a cursor, else None"""
+        cursor = tool_input.get("cursor")
+        if not cursor:
+            return None
+        return self.result_encoder.page(tool_name, cursor, self.token_budget.chars_per_token)
+
+    def _finish_tool_call(self, block, result: str, outcome: str) -> Dict:
+        """Count a finished tool call, note the data it read and encode its result for the model.
+
+        ``outcome`` is ok or failed for a result the tool returned (see
+        tool_outcome), error or timeout otherwise.
+        """
+        TOOL_CALLS.inc(tool=block.name, outcome=outcome)
+        returned = outcome in ("ok", "failed")
+        # A page continues a result already recorded and encoded by the call that was cut
+        if not block.input.get("cursor"):
+            reads = _reads.get()
+            if reads is not None:
+                version = self._read_version(block.name, result) if returned else None
+                if version is None or reads.setdefault(block.name, version) != version:
+                    reads[block.name] = None
+            if returned:
+                result = self.result_encoder.encode(block.name, result, self.token_budget.chars_per_token)
+        return {
+            "type": "tool_result",
+            "tool_use_id": block.id,
+            "content": result
+        }
+
+    def _read_version(self, tool_name: str, result: str) -> Optional[str]:
+        """Version of the data behind a successful read tool's result; None for failures and writes"""
+        if tool_name not in CACHEABLE_TOOLS or tool_outcome(result) != "ok":
+            return None
+        if tool_name == "search_exercises":
+            return self.exercise_version()
+        return hashlib.sha256(result.encode()).hexdigest()[:16]
+
+    @contextmanager
+    def recording_reads(self) -> Iterator[Dict[str, Optional[str]]]:
+        """Collect the version of the data each tool call in the block reads, None where it cannot be reused"""
+        reads: Dict[str, Optional[str]] = {}
+        token = _reads.set(reads)
+        try:
+            yield reads
+        finally:
+            try:
+                _reads.reset(token)
+            except ValueError:
+                # Closed from another context, e.g. an abandoned streaming response
+                pass
+
+    def _traced_tool_call(self, tool_name: str, tool_input: Dict) -> str:
+        with span("tool", metric=TOOL_CALL_SECONDS, tool=tool_name):
+            page = self._page_tool_result(tool_name, tool_input)
+            return page if page is not None else self.process_tool_call(tool_name, tool_input)
+
+    def _run_tool_calls(self, tool_blocks: List) -> List[Dict]:
+        """Run independent tool calls on the tool pool, keeping tool_use order"""
+        futures = []
+        for block in tool_blocks:
+            logger.debug("Using tool: %s", block.name)
+            deadline = time.monotonic() + TOOL_TIMEOUTS.get(block.name, DEFAULT_TOOL_TIMEOUT)
+            # Each call runs in a copy of this context so its span joins the request's trace
+            future = self.tool_executor.submit(
+                contextvars.copy_context().run, self._traced_tool_call, block.name, block.input
+            )
+            futures.append((future, deadline))
+
+        tool_results = []
+        for block, (future, deadline) in zip(tool_blocks, futures):
+            try:
+                result = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                outcome = tool_outcome(result)
+            except FutureTimeoutError:
+                # The worker thread keeps running; the model just stops waiting for it
+                result = self._tool_timeout_result(block.name)
+                outcome = "timeout"
+            except Exception as e:
+                result = self._tool_error_result(block.name, e)
+                outcome = "error"
+            tool_results.append(self._finish_tool_call(block, result, outcome))
+        return tool_results
+
+    def _final_text(self, response) -> str:
+        """Concatenate the text blocks of a final model response"""
+        final_response = ""
+        for block in response.content:
+            if hasattr(block, "text"):
+                final_response += block.text
+        return final_response
+
+    def _start_turn(self, user_query: str, conversation: Optional[Conversation]):
+        """Messages and digest a turn starts from: the conversation's history plus the new query"""
+        if conversation is None:
+            return [{"role": "user", "content": user_query}], []
+        return conversation.messages + [{"role": "user", "content": user_query}], conversation.digest
+
+    def _end_turn(self, conversation: Optional[Conversation], messages: List[Dict], digest: List[str], reply: str):
+        """Save a completed turn; unfinished turns are never kept"""
+        if conversation is not None and reply:
+            conversation.commit(messages + [{"role": "assistant", "content": reply}], digest)
+
+    def _begin_turn(self, user_query: str, conversation: Optional[Conversation], model: Optional[str]) -> Turn:
+        messages, digest = self._start_turn(user_query, conversation)
+        return Turn(messages, digest, conversation, model)
+
+    def _prepare_call(self, turn: Turn) -> List[Dict]:
+        """Compact the turn's history for its next model call; returns the messages to send"""
+        turn.messages, turn.digest = self.token_budget.compact(turn.messages, turn.digest)
+        return turn.messages
+
+    def _finish_call(self, turn: Turn, response) -> Optional[List]:
+        """Book a model response into the turn.
+
+        Returns the tool_use blocks to run next, or None once the turn has
+        ended, with ``turn.reply`` set.
+        """
+        turn.iterations += 1
+        for key, value in self._record_usage(response.usage, turn.model).items():
+            turn.usage[key] = turn.usage.get(key, 0) + value
+        self.token_budget.observe(turn.messages, response.usage)
+
+        if response.stop_reason == "end_turn":
+            turn.reply = self._final_text(response)
+            self._end_turn(turn.conversation, turn.messages, turn.digest, turn.reply)
+            self._record_turn(turn.iterations, "end_turn")
+            return None
+        if response.stop_reason != "tool_use":
+            # Unexpected stop reason
+            turn.reply = MAX_ITERATIONS_REPLY
+            self._record_turn(turn.iterations, "stop")
+            return None
+        # Plain dicts: history is resent on every call and kept in conversations and the response cache
+        turn.messages.append({
+            "role": "assistant",
+            "content": [block.model_dump(mode="json", exclude_none=True) for block in response.content]
+        })
+        return [block for block in response.content if block.type == "tool_use"]
+
+    def _add_tool_results(self, turn: Turn, tool_results: List[Dict]) -> None:
+        turn.messages.append({"role": "user", "content": tool_results})
+
+    def _out_of_iterations(self, turn: Turn) -> str:
+        """End a turn that used every iteration without a final answer"""
+        turn.reply = MAX_ITERATIONS_REPLY
+        self._record_turn(turn.iterations, "max_iterations")
+        return turn.reply
+
+    def route(self, user_query: str) -> Optional[Intent]:
+        """The lookup to answer locally, or None when the message goes to the model"""
+        return match_intent(user_query) if self.intent_routing else None
+
+    def _route_turn(self, user_query: str):
+        """Intent to answer locally (None for a model turn) and the model tier otherwise, counted by route"""
+        intent = self.route(user_query)
+        if intent is not None:
+            route, model = intent.tool, None
+        elif self.fast_model and not needs_full_model(user_query):
+            route, model = "fast_model", self.fast_model
+        else:
+            route, model = "model", self.claude_model
+        ROUTED_TURNS.inc(route=route)
+        current = current_trace()
+        if current is not None:
+            current.attributes["route"] = route
+        return intent, model
+
+    def _routed_reply(self, intent: Intent, result: str, user_query: str,
+                      conversation: Optional[Conversation]) -> str:
+        """Templated reply to a routed lookup, saved to the conversation like a model turn"""
+        TOOL_CALLS.inc(tool=intent.tool, outcome=tool_outcome(result))
+        try:
+            data = json.loads(result)
+        except ValueError:
+            data = {"success": False}
+        if intent.tool == "get_training_load":
+            reply = self._training_load_reply(data, result)
+        elif intent.tool == "lookup_workouts":
+            reply = self._workouts_reply(data)
+        else:
+            reply = self._exercises_reply(data, intent.tool_input["query"])
+        messages, digest = self._start_turn(user_query, conversation)
+        self._end_turn(conversation, messages, digest, reply)
+        return reply
+
+    def _training_load_reply(self, data: Dict, result: str) -> str:
+        if result == self._format_training_load(None):
+            return "There is no training load to show yet. Log a training session and your ACWR will show up here."
+        if not data.get("success"):
+            return "I couldn't get your training load just now. Please try again in a moment."
+        tl = data["training_load"]
+
+        def number(value) -> str:
+            return f"{value:.2f}".rstrip("0").rstrip(".") if isinstance(value, (int, float)) else "N/A"
+
+        if tl.get("acwr") is None:
+            headline = "Your ACWR isn't available yet."
+        else:
+            headline = f"Your ACWR is **{number(tl['acwr'])}**: {tl['acwr_interpretation']} (0.8-1.5 is optimal)."
+        return "\n".join([
+            headline,
+            "",
+            f"- Acute load (7 days): {number(tl.get('acute_load_7day'))}",
+            f"- Chronic load (42 days): {number(tl.get('chronic_load_42day'))}",
+            f"- Sessions in the last 7 days: {tl.get('recent_sessions_7days', 0)}",
+            f"- Hardest grade climbed: {tl.get('max_grade_climbed', 'N/A')}",
+            "",
+            tl.get("acwr_recommendation", ""),
+        ]).rstrip()
+
+    def _workouts_reply(self, data: Dict) -> str:
+        if not data.get("success"):
+            return "I couldn't load your workouts just now. Please try again in a moment."
+        workouts = data["workouts"]
+        if not workouts:
+            return "You don't have any saved workouts yet."
+        total = data.get("total", len(workouts))
+        header = f"You have {total} saved workout{'s' if total != 1 else ''}"
+        header += f". Here are the first {len(workouts)}:" if total > len(workouts) else ":"
+        lines = [header, ""]
+        for w in workouts:
+            date = f" ({w['date']})" if w.get("date") else ""
+            lines.append(f"- **{w['name']}**{date}: {w['exercises']}")
+        return "\n".join(lines)
+
+    def _exercises_reply(self, data, query: str) -> str:
+        if isinstance(data, dict):
+            if data.get("warming_up"):
+                return "The exercise database is still loading. Please try again in a moment."
+            return "I couldn't search the exercises just now. Please try again in a moment."
+        if not data:
+            return f'I couldn\'t find any exercises matching "{query}".'
+        lines = [f'Exercises matching "{query}":', ""]
+        for ex in data:
+            details = ", ".join(value for value in (ex.get("bodypart"), ex.get("equipment"), ex.get("level")) if value)
+            line = f"- **{ex['name']}**" + (f" ({details})" if details else "")
+            if ex.get("description"):
+                line += f": {ex['description']}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def create_training_plan(self, user_query: str, max_iterations: int = 6, context: dict = None,
+                             conversation: Optional[Conversation] = None) -> str:
         """Main interface for creating training plans using Claude tool calling"""
         
         # Store training load data if provided
         if context and "training_load" in context:
             self.training_load_data = context["training_load"]
         
-        system_prompt = """You are an expert climbing coach with access to comprehensive datasets and specialized tools. 
-
-Your available tools:
-- get_training_load: Get user's current training load metrics and ACWR - USE THIS when creating workouts/plans
-- lookup_workouts: Get a list of all available workouts from the database (use this BEFORE creating training sessions)
-- search_exercises: Find exercises from 2900+ exercise database
-- create_workout: Create and save workouts to the database
-- create_training_session: Create and save training sessions with climbs and link to existing workouts
-
-When a user asks to create a training session:
-1. Use get_training_load FIRST to check their current load and ACWR
-2. Use lookup_workouts to find an appropriate existing workout to link
-3. Use create_training_session with a valid workoutId from the lookup results
-4. Adjust volume/intensity based on their ACWR to prevent overtraining
-
-When a user asks to create or save a workout:
-1. Use get_training_load FIRST to check their current load and ACWR
-2. Use create_workout tool, adjusting volume/intensity based on their training load
-
-When a user asks to log climbs:
-1. Use lookup_workouts first to find an appropriate workout
-2. Then use create_training_session
-
-Provide comprehensive, data-driven coaching advice based on the tools and data available."""
+        # Bare lookups skip the tool loop
+        intent, model = self._route_turn(user_query)
+        if intent is not None:
+            with span("tool", metric=TOOL_CALL_SECONDS, tool=intent.tool, routed=True):
+                result = self.process_tool_call(intent.tool, intent.tool_input)
+            return self._routed_reply(intent, result, user_query, conversation)
         
-        messages = [{"role": "user", "content": user_query}]
+        turn = self._begin_turn(user_query, conversation, model)
         
         for iteration in range(max_iterations):
-            response = self.client.messages.create(
-                model=self.claude_model,
-                max_tokens=2048,
-                system=system_prompt,
-                tools=self.get_tools(),
-                messages=messages
-            )
+            messages = self._prepare_call(turn)
+            with span("model_call", metric=MODEL_CALL_SECONDS, model=model, streaming="false",
+                      iteration=iteration) as attributes:
+                response = self.client.messages.create(**self._request_kwargs(messages, model=model))
+                attributes["stop_reason"] = response.stop_reason
+                attributes.update(usage_counts(response.usage))
             
-            # Check if we're done (no tool use)
-            if response.stop_reason == "end_turn":
-                final_response = ""
-                for block in response.content:
-                    if hasattr(block, "text"):
-                        final_response += block.text
-                return final_response
-            
-            # Process tool calls
-            if response.stop_reason == "tool_use":
-                # Add assistant's response to messages
-                messages.append({"role": "assistant", "content": response.content})
-                
-                # Process each tool use
-                tool_results = []
-                for block in response.content:
-                    if block.type == "tool_use":
-                        print(f"\nUsing tool: {block.name}")
-                        print(f"Input: {json.dumps(block.input, indent=2)}")
-                        
-                        result = self.process_tool_call(block.name, block.input)
-                        print(f"Result preview: {result[:200]}...")
-                        
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": block.id,
-                            "content": result
-                        })
-                
-                # Add tool results to messages
-                messages.append({"role": "user", "content": tool_results})
-            else:
-                # Unexpected stop reason
-                break
+            # Run this turn's tool calls concurrently, or stop when it is done
+            tool_blocks = self._finish_call(turn, response)
+            if tool_blocks is None:
+                return turn.reply
+            self._add_tool_results(turn, self._run_tool_calls(tool_blocks))
         
-        return "Maximum iterations reached. Please try rephrasing your question."
+        return self._out_of_iterations(turn)
     
     def analyze_dataset_stats(self):
         """Print statistics about loaded datasets"""
         print("\n=== Dataset Statistics ===")
         print(f"Exercise database: {len(self.exercise_db)} exercises")
     
+    def _format_workouts_response(self, response) -> str:
+        """Simplify the /api/workouts response into a compact tool result"""
+        if response.status_code == 200:
+            workouts = response.json()
+            # Simplify workouts to reduce token usage
+            simplified_workouts = []
+            for w in workouts[:15]:  # Limit to 15
+                exercise_names = []
+                if 'exercises' in w and w['exercises']:
+                    exercise_names = [ex.get('name', 'Exercise') for ex in w['exercises'][:5]]
+                    if len(w['exercises']) > 5:
+                        exercise_names.append(f"...+{len(w['exercises']) - 5} more")
+            
+                simplified_workouts.append({
+                    'id': w.get('id'),
+                    'name': w.get('name', 'Unnamed')[:50],
+                    'date': w.get('scheduledDate', '')[:10] if w.get('scheduledDate') else None,
+                    'exercises': ', '.join(exercise_names) if exercise_names else 'No exercises'
+                })
+        
+            return json.dumps({
+                "success": True,
+                "total": len(workouts),
+                "workouts": simplified_workouts
+            }, indent=2)
+        else:
+            return json.dumps({
+                "success": False,
+                "error": "Failed to fetch workouts",
+                "status_code": response.status_code
+            }, indent=2)
+
     def lookup_past_workouts(self) -> str:
         """Get list of available workouts from the database"""
+        return self._run_flow(self._workouts_flow())
+
+    def _workouts_flow(self) -> Flow:
+        cached = self.read_cache.get("workouts")
+        if cached is not None:
+            return cached
         try:
             # GET request to workouts API
-            response = requests.get(
-                f"{self.api_base_url}/api/workouts",
-                headers={"Content-Type": "application/json"}
-            )
-            
+            token = self.read_cache.token("workouts")
+            response = yield ApiRequest("GET", "/api/workouts")
+            result = self._format_workouts_response(response)
             if response.status_code == 200:
-                workouts = response.json()
-                # Simplify workouts to reduce token usage
-                simplified_workouts = []
-                for w in workouts[:15]:  # Limit to 15
-                    exercise_names = []
-                    if 'exercises' in w and w['exercises']:
-                        exercise_names = [ex.get('name', 'Exercise') for ex in w['exercises'][:5]]
-                        if len(w['exercises']) > 5:
-                            exercise_names.append(f"...+{len(w['exercises']) - 5} more")
-                
-                    simplified_workouts.append({
-                        'id': w.get('id'),
-                        'name': w.get('name', 'Unnamed')[:50],
-                        'date': w.get('scheduledDate', '')[:10] if w.get('scheduledDate') else None,
-                        'exercises': ', '.join(exercise_names) if exercise_names else 'No exercises'
-                    })
-            
-                return json.dumps({
-                    "success": True,
-                    "total": len(workouts),
-                    "workouts": simplified_workouts
-                }, indent=2)
-            else:
-                return json.dumps({
-                    "success": False,
-                    "error": "Failed to fetch workouts",
-                    "status_code": response.status_code
-                }, indent=2)
+                self.read_cache.set("workouts", result, token)
+            return result
                 
         except Exception as e:
             return json.dumps({
@@ -618,6 +1549,7 @@ Provide comprehensive, data-driven coaching advice based on the tools and data a
 
 # Usage example
 if __name__ == "__main__":
+    setup_logging()
     coach = ClimbingCoachSystem(
         kaggle_gym_path="data/gym_data.csv",
         kaggle_climb_path="climb_dataset.csv",
@@ -0,0 +1,191 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Optional
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from telemetry import API_CIRCUIT_OPEN, API_REQUEST_SECONDS, API_RETRIES
+
+# Statuses worth retrying for idempotent requests
+RETRY_STATUSES = {502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an API that has been failing"""
+
+
+class CircuitBreaker:
+    """Fail fast after repeated errors, then let one probe through after a cool-down.
+
+    Closed: requests flow. After ``failure_threshold`` consecutive failures
+    the breaker opens and rejects requests for ``reset_timeout`` seconds,
+    then half-opens to allow a single probe; its outcome closes or re-opens.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_request(self) -> None:
+        with self._lock:
+            state = self.state
+            if state == "open" or (state == "half-open" and self.probing):
+                retry_in = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+                raise CircuitOpenError(f"API circuit open after repeated failures; retrying in {retry_in:.0f}s")
+            if state == "half-open":
+                self.probing = True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+        API_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                API_CIRCUIT_OPEN.set(1)
+            self.probing = False
+
+
+class _ApiClientBase:
+    """Retry policy, circuit breaker and metrics shared by the sync and async clients"""
+
+    def __init__(self, base_url: str, connect_timeout: float = 3.0, read_timeout: float = 20.0,
+                 max_retries: int = 2, backoff_base: float = 0.2, backoff_max: float = 2.0,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker or CircuitBreaker()
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record(self, endpoint: str, latency: float, failed: bool) -> None:
+        API_REQUEST_SECONDS.observe(latency, endpoint=endpoint, outcome="error" if failed else "ok")
+
+    def _record_retry(self, endpoint: str) -> None:
+        API_RETRIES.inc(endpoint=endpoint)
+
+    def _record_response(self, endpoint: str, status_code: int, latency: float) -> None:
+        """Count a response; server errors also count against the breaker"""
+        failed = status_code >= 500
+        if failed:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        self._record(endpoint, latency, failed=failed)
+
+
+class ApiClient(_ApiClientBase):
+    """Pooled keep-alive client for the SvelteKit API.
+
+    GETs are retried on connection errors, timeouts and 502/503/504 with
+    jittered backoff; POSTs are never retried since they are not idempotent.
+    """
+
+    def __init__(self, base_url: str, pool_size: int = 10, **kwargs):
+        super().__init__(base_url, **kwargs)
+        self.session = requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        endpoint = f"{method} {path}"
+        retries = self.max_retries if method == "GET" else 0
+        for attempt in range(retries + 1):
+            self.breaker.before_request()
+            started = time.perf_counter()
+            try:
+                response = self.session.request(
+                    method, f"{self.base_url}{path}",
+                    timeout=(self.connect_timeout, self.read_timeout), **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                self.breaker.record_failure()
+                self._record(endpoint, time.perf_counter() - started, failed=True)
+                if attempt == retries:
+                    raise
+            else:
+                self._record_response(endpoint, response.status_code, time.perf_counter() - started)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+            self._record_retry(endpoint)
+            time.sleep(self._backoff(attempt))
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class AsyncApiClient(_ApiClientBase):
+    """asyncio counterpart of ApiClient built on one shared httpx.AsyncClient"""
+
+    def __init__(self, base_url: str, pool_size: int = 20, **kwargs):
+        super().__init__(base_url, **kwargs)
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers={"Content-Type": "application/json"},
+            timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def request(self, method: str, path: str, **kwargs) -> httpx.Response:
+        endpoint = f"{method} {path}"
+        retries = self.max_retries if method == "GET" else 0
+        for attempt in range(retries + 1):
+            self.breaker.before_request()
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except httpx.TransportError:
+                self.breaker.record_failure()
+                self._record(endpoint, time.perf_counter() - started, failed=True)
+                if attempt == retries:
+                    raise
+            else:
+                self._record_response(endpoint, response.status_code, time.perf_counter() - started)
+                if response.status_code not in RETRY_STATUSES or attempt == retries:
+                    return response
+            self._record_retry(endpoint)
+            await asyncio.sleep(self._backoff(attempt))
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
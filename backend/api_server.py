@@ -1,10 +1,98 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from ClimbCoach import ClimbingCoachSystem
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import AsyncIterator, Dict, Optional, Tuple
+import asyncio
+import json
+import logging
+import math
 import os
+import time
 
-app = FastAPI()
+from model_scheduler import ModelOverloaded
+from response_cache import CachedReply, FlightAbandoned, ResponseCache, SingleFlight, normalize_message
+from telemetry import (HTTP_REQUEST_SECONDS, HTTP_REQUESTS, RESPONSE_CACHE, current_trace, render_metrics,
+                       setup_logging, trace)
+
+# Before the coach is created, so dataset loading is logged
+setup_logging()
+logger = logging.getLogger("api_server")
+
+from async_coach import AsyncClimbingCoachSystem
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Serve immediately; the exercise data loads in the background (see /readyz)
+    warm_up = asyncio.create_task(coach.warm_up_in_background(float(os.getenv("WARMUP_TIMEOUT", "120"))))
+    # Then poll the gym CSV and the sheet, swapping in a rebuilt index when they change
+    coach.start_refresher(coach.refresh_interval)
+    yield
+    warm_up.cancel()
+    await coach.aclose()
+
+app = FastAPI(lifespan=lifespan)
+
+
+@app.exception_handler(ModelOverloaded)
+async def model_overloaded(request, exc: ModelOverloaded):
+    """Shed load early with a 503 and a hint of when to retry, rather than queueing without bound"""
+    return JSONResponse(
+        {"detail": {"error": str(exc), "status": "overloaded"}},
+        status_code=503,
+        headers={"Retry-After": str(math.ceil(exc.retry_after))}
+    )
+
+
+# Probes and scrapes are counted but not traced
+UNTRACED_ROUTES = {"/healthz", "/readyz", "/metrics"}
+
+
+class TelemetryMiddleware:
+    """Traces every request and records its duration and status.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so the trace stays open
+    until a streamed response has been fully sent and the coach's spans,
+    which run while the body streams, land in it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Route paths used as metric labels; built on the first request, once every route is registered
+        self.routes = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if self.routes is None:
+            self.routes = {route.path for route in app.routes}
+        route = scope["path"] if scope["path"] in self.routes else "other"
+        method = scope["method"]
+        started = time.perf_counter()
+        response = {"status": 500}
+
+        async def send_with_trace_id(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                if current is not None:
+                    current.attributes["status"] = message["status"]
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", current.id.encode())]
+            await send(message)
+
+        try:
+            if route in UNTRACED_ROUTES:
+                current = None
+                return await self.app(scope, receive, send_with_trace_id)
+            with trace(f"{method} {route}") as current:
+                current.attributes["status"] = 500
+                await self.app(scope, receive, send_with_trace_id)
+        finally:
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=response["status"])
+
+
+app.add_middleware(TelemetryMiddleware)
 
 # Configure CORS
 app.add_middleware(
@@ -16,37 +104,197 @@ app.add_middleware(
 )
 
 # Initialize the ClimbingCoachSystem
-coach = ClimbingCoachSystem(
+coach = AsyncClimbingCoachSystem(
     kaggle_gym_path=os.getenv("KAGGLE_GYM_PATH", "data/gym_data.csv"),
     kaggle_climb_path=os.getenv("KAGGLE_CLIMB_PATH", "data/climb_data.csv"),
     google_sheets_url=os.getenv("GOOGLE_SHEETS_URL", ""),
-    api_base_url="http://localhost:5173"
+    api_base_url=os.getenv("API_BASE_URL", "http://localhost:5173"),
+    lazy=True
 )
 
+# First messages of new conversations: answered once per distinct question while their data is unchanged
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "128")),
+    ttl=float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+)
+in_flight = SingleFlight()
+
+
+def _cache_key(message: str):
+    return coach.claude_model, normalize_message(message)
+
+
+def _record_cache_result(result: str) -> None:
+    RESPONSE_CACHE.inc(result=result)
+    current = current_trace()
+    if current is not None:
+        current.attributes["response_cache"] = result
+
+
+async def cached_reply(message: str) -> Tuple[Optional[CachedReply], str]:
+    """A cached reply whose data is still current, or None with "miss"/"stale" (stale entries are evicted)"""
+    key = _cache_key(message)
+    entry = response_cache.get(key)
+    if entry is None:
+        return None, "miss"
+    if await coach.read_versions(list(entry.versions)) != entry.versions:
+        response_cache.discard(key)
+        return None, "stale"
+    return entry, "hit"
+
+
+def _store_first_turn(key, entry: CachedReply) -> None:
+    if entry.versions is not None:
+        response_cache.set(key, entry)
+
+
+async def _first_turn(key, message: str, conversation_id: str) -> CachedReply:
+    entry = await coach.first_turn(message, conversation_id)
+    _store_first_turn(key, entry)
+    return entry
+
+
+async def answer(message: str, conversation) -> str:
+    """Reply to a message; a new conversation's first message may reuse a cached or in-flight reply"""
+    # Lookups the router answers locally cost less than checking a cached reply
+    if conversation.messages or not response_cache.enabled or coach.route(message) is not None:
+        return await coach.create_training_plan(message, conversation=conversation)
+    entry, result = await cached_reply(message)
+    if entry is None:
+        key = _cache_key(message)
+        try:
+            entry, shared = await in_flight.run(key, lambda: _first_turn(key, message, conversation.id))
+        except FlightAbandoned:
+            # The streamed reply being shared stopped early; answer this one directly
+            return await coach.create_training_plan(message, conversation=conversation)
+        if shared:
+            result = "coalesced"
+        elif entry.versions is None:
+            result = "uncacheable"
+    _record_cache_result(result)
+    if entry.messages:
+        conversation.commit(list(entry.messages), [])
+    return entry.reply
+
+
 class ChatRequest(BaseModel):
     message: str
+    stream: bool = False
+    # Continue an earlier chat; omitted or unknown ids start a new one
+    conversation_id: Optional[str] = Field(default=None, max_length=128)
+
+async def stream_events(message: str, conversation) -> AsyncIterator[Dict]:
+    """Streaming counterpart of answer().
+
+    A new conversation's first message replays a cached or in-flight reply
+    as one ``text`` event. Otherwise the streamed turn is shared with
+    identical first messages arriving meanwhile and cached once it is done.
+    """
+    if conversation.messages or not response_cache.enabled or coach.route(message) is not None:
+        async for event in coach.stream_training_plan(message, conversation=conversation):
+            yield event
+        return
+    key = _cache_key(message)
+    entry, result = await cached_reply(message)
+    if entry is None and (pending := in_flight.pending(key)) is not None:
+        try:
+            entry, result = await asyncio.shield(pending), "coalesced"
+        except FlightAbandoned:
+            pass
+    if entry is not None:
+        _record_cache_result(result)
+        if entry.messages:
+            conversation.commit(list(entry.messages), [])
+        yield {"type": "text", "text": entry.reply}
+        yield {"type": "done", "reply": entry.reply, "usage": {}, "cached": True}
+        return
+
+    leader = in_flight.lead(key)
+    try:
+        with coach.recording_reads() as reads:
+            async for event in coach.stream_training_plan(message, conversation=conversation):
+                if event["type"] == "done":
+                    entry = coach.first_turn_reply(event["reply"], conversation.messages, reads)
+                    _store_first_turn(key, entry)
+                    _record_cache_result(result if entry.versions is not None else "uncacheable")
+                    leader.set_result(entry)
+                yield event
+    finally:
+        if not leader.done():
+            leader.set_exception(FlightAbandoned("The streamed first turn stopped before its reply"))
+
+
+async def sse_events(message: str, conversation):
+    """Encode the coach's streaming events as Server-Sent Events"""
+    try:
+        async with conversation.lock:
+            async for event in stream_events(message, conversation):
+                if event["type"] == "done":
+                    event = {**event, "conversation_id": conversation.id}
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+    except ModelOverloaded as e:
+        error = {'type': 'error', 'error': str(e), 'status': 'overloaded', 'retry_after': math.ceil(e.retry_after)}
+        yield f"event: error\ndata: {json.dumps(error)}\n\n"
+    except Exception as e:
+        logger.exception("Streaming /analyze failed")
+        yield f"event: error\ndata: {json.dumps({'type': 'error', 'error': str(e), 'status': 'error'})}\n\n"
 
 @app.post("/analyze")
 async def analyze_performance(chat_request: ChatRequest):
+    conversation = coach.conversations.get_or_create(chat_request.conversation_id)
+    if chat_request.stream:
+        # Once the stream starts the status is 200, so turn requests away while a 503 is still possible
+        coach.scheduler.admit()
+        return StreamingResponse(
+            sse_events(chat_request.message, conversation),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
     try:
         # Log incoming request
-        print(f"Received request with message: {chat_request.message}")
+        logger.debug("Received request with message: %.200s", chat_request.message)
         
-        # Use the proper create_training_plan method that includes all tools and context
-        response_text = coach.create_training_plan(chat_request.message)
-        print(f"Response: {response_text}")
+        # Full tool-calling turn, or a cached or in-flight reply to the same first message
+        async with conversation.lock:
+            response_text = await answer(chat_request.message, conversation)
+        logger.debug("Response: %.200s", response_text)
         
         if not response_text:
             raise ValueError("Empty response from create_training_plan")
             
-        return {"reply": response_text, "status": "success"}
+        return {"reply": response_text, "status": "success", "conversation_id": conversation.id}
+    except ModelOverloaded:
+        raise
     except Exception as e:
-        print(f"Error: {str(e)}")
+        logger.exception("/analyze failed")
         raise HTTPException(
             status_code=500,
             detail={"error": str(e), "status": "error"}
         )
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: 200 once the exercise data is fully loaded, 503 while warming up or after a failure"""
+    data = coach.exercises
+    body = {
+        **coach.warmup.to_dict(),
+        "exercises": len(data.store) if data else 0,
+        "semantic_search": bool(data and data.vectors is not None),
+    }
+    return JSONResponse(body, status_code=200 if coach.warmup.ready else 503)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics for this worker"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Import string so WEB_CONCURRENCY can start several workers; they share the exercise snapshot
+    uvicorn.run("api_server:app", host="0.0.0.0", port=8000)
\ No newline at end of file
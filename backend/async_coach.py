@@ -0,0 +1,292 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import AsyncIterator, Dict, List, Optional
+
+import anthropic
+
+from api_client import AsyncApiClient
+from conversations import Conversation
+from intent_router import Intent
+from ClimbCoach import ClimbingCoachSystem, DEFAULT_TOOL_TIMEOUT, Flow, TOOL_TIMEOUTS, tool_outcome, usage_counts
+from model_scheduler import ModelScheduler, usage_tokens
+from response_cache import CachedReply
+from telemetry import MODEL_CALL_SECONDS, TOOL_CALL_SECONDS, span
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncClimbingCoachSystem(ClimbingCoachSystem):
+    """ClimbingCoachSystem whose Claude and SvelteKit API calls never block the event loop.
+
+    The tools, their response formatting and the tool loop's bookkeeping
+    are the synchronous coach's. Tools are written as flows that yield
+    their SvelteKit requests, and ``_run_flow`` here awaits those on one
+    shared ``AsyncApiClient``, so the API tools and ``process_tool_call``
+    return coroutines. CPU-only tools like ``search_exercises`` stay
+    synchronous. Only the awaited calls live in this class.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Retries go through the scheduler, so a rate limit holds back every call, not just the one that hit it
+        self.async_client = anthropic.AsyncAnthropic(max_retries=0)
+        self.scheduler = ModelScheduler(
+            concurrency=int(os.getenv("MODEL_CONCURRENCY", "8")),
+            tokens_per_minute=int(os.getenv("MODEL_TOKENS_PER_MINUTE", "0")),
+            queue_limit=int(os.getenv("MODEL_QUEUE_LIMIT", "64")),
+            queue_timeout=float(os.getenv("MODEL_QUEUE_TIMEOUT", "30")),
+            max_retries=int(os.getenv("MODEL_MAX_RETRIES", "3"))
+        )
+        self.http = AsyncApiClient(self.api_base_url, **self._api_client_settings())
+
+    async def warm_up_in_background(self, timeout: float) -> None:
+        """Load the exercise data on a daemon thread; mark the warm-up timed out after ``timeout`` seconds.
+
+        A timed-out load keeps going and becomes ready if it finishes, while
+        search serves whatever partial index it has published meanwhile.
+        """
+        loop = asyncio.get_running_loop()
+        finished = asyncio.Event()
+
+        def notify():
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(finished.set)
+
+        self.start_warm_up(on_done=notify)
+        try:
+            await asyncio.wait_for(finished.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.warmup.time_out(timeout)
+            logger.error("Exercise database warm-up timed out: %s", self.warmup.error)
+
+    async def aclose(self):
+        """Stop the source refresher and release the shared HTTP connections"""
+        self.stop_refresher()
+        await self.http.aclose()
+        await self.async_client.close()
+        self.api.close()
+
+    async def _run_flow(self, flow: Flow) -> str:
+        """Run a tool flow, awaiting its API requests on the shared async client"""
+        try:
+            request = next(flow)
+            while True:
+                try:
+                    response = await self.http.request(request.method, request.path, **(request.kwargs or {}))
+                except Exception as e:
+                    request = flow.throw(e)
+                else:
+                    request = flow.send(response)
+        except StopIteration as done:
+            return done.value
+
+    async def read_versions(self, tools: List[str]) -> Dict[str, Optional[str]]:
+        """Current version of the data each read tool returns, to check a cached reply against.
+
+        Goes through the tools themselves, so the check costs a read-cache
+        lookup or one SvelteKit request per tool rather than a model call.
+        """
+        async def current(tool: str) -> Optional[str]:
+            if tool == "search_exercises":
+                return self.exercise_version()
+            return self._read_version(tool, await self.process_tool_call(tool, {}))
+
+        return dict(zip(tools, await asyncio.gather(*(current(tool) for tool in tools))))
+
+    async def first_turn(self, user_query: str, conversation_id: Optional[str] = None) -> CachedReply:
+        """Answer the first message of a conversation, recording the data its tool calls read.
+
+        The turn runs on a scratch conversation that keeps ``conversation_id``,
+        so its model calls queue with the requesting conversation.
+        ``versions`` is None when the reply must not be reused: the turn did
+        not finish, or a tool failed, wrote data or saw its data change
+        mid-turn.
+        """
+        scratch = Conversation(conversation_id or uuid.uuid4().hex)
+        with self.recording_reads() as reads:
+            reply = await self.create_training_plan(user_query, conversation=scratch)
+        return self.first_turn_reply(reply, scratch.messages, reads)
+
+    @staticmethod
+    def first_turn_reply(reply: str, messages: List[Dict], reads: Dict[str, Optional[str]]) -> CachedReply:
+        """CachedReply for a first turn; reusable only if it was committed and every read has a version"""
+        reusable = messages and all(version is not None for version in reads.values())
+        return CachedReply(reply, list(messages), reads if reusable else None)
+
+    async def _answer_locally(self, intent: Intent, user_query: str, conversation: Optional[Conversation]) -> str:
+        """Reply to a routed lookup from its read tool alone"""
+        with span("tool", metric=TOOL_CALL_SECONDS, tool=intent.tool, routed=True):
+            try:
+                result = await asyncio.wait_for(
+                    self.process_tool_call(intent.tool, intent.tool_input),
+                    timeout=TOOL_TIMEOUTS.get(intent.tool, DEFAULT_TOOL_TIMEOUT)
+                )
+            except asyncio.TimeoutError:
+                result = self._tool_timeout_result(intent.tool)
+        return self._routed_reply(intent, result, user_query, conversation)
+
+    async def _run_tool_call(self, block, semaphore: asyncio.Semaphore,
+                             events: Optional[asyncio.Queue] = None) -> Dict:
+        """Run one tool call under the concurrency cap and its timeout"""
+        async with semaphore:
+            logger.debug("Using tool: %s", block.name)
+            if events is not None:
+                events.put_nowait({"type": "tool_start", "id": block.id, "name": block.name})
+            started = time.perf_counter()
+            ok = False
+            with span("tool", metric=TOOL_CALL_SECONDS, tool=block.name) as attributes:
+                try:
+                    result = self._page_tool_result(block.name, block.input)
+                    if result is None:
+                        result = await asyncio.wait_for(
+                            self.process_tool_call(block.name, block.input),
+                            timeout=TOOL_TIMEOUTS.get(block.name, DEFAULT_TOOL_TIMEOUT)
+                        )
+                    ok = True
+                    outcome = tool_outcome(result)
+                except asyncio.TimeoutError:
+                    result = self._tool_timeout_result(block.name)
+                    outcome = "timeout"
+                except Exception as e:
+                    result = self._tool_error_result(block.name, e)
+                    outcome = "error"
+                attributes["outcome"] = outcome
+            tool_result = self._finish_tool_call(block, result, outcome)
+            if events is not None:
+                events.put_nowait({
+                    "type": "tool_end",
+                    "id": block.id,
+                    "name": block.name,
+                    "ok": ok,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+                })
+        return tool_result
+
+    async def _run_tool_calls(self, tool_blocks: List, events: Optional[asyncio.Queue] = None) -> List[Dict]:
+        """Run independent tool calls concurrently; gather keeps tool_use order.
+
+        When ``events`` is given, tool_start/tool_end progress events are
+        put on it as each call begins and finishes.
+        """
+        semaphore = asyncio.Semaphore(self.tool_concurrency)
+        return await asyncio.gather(*(self._run_tool_call(block, semaphore, events) for block in tool_blocks))
+
+    def _call_tokens(self, messages: List[Dict]) -> int:
+        """Estimated input tokens of a model call, reserved from the scheduler's budget"""
+        return self.token_budget.estimate(messages) + int(self.token_budget.fixed_chars / self.token_budget.chars_per_token)
+
+    async def _create_message(self, messages: List[Dict], conversation: Optional[Conversation], iteration: int,
+                              model: Optional[str] = None):
+        """One model call through the scheduler, queued fairly per conversation; later iterations go first"""
+        kwargs = self._request_kwargs(messages, model=model)
+
+        async def request():
+            with span("model_call", metric=MODEL_CALL_SECONDS, model=kwargs["model"], streaming="false",
+                      iteration=iteration) as attributes:
+                response = await self.async_client.messages.create(**kwargs)
+                attributes["stop_reason"] = response.stop_reason
+                attributes.update(usage_counts(response.usage))
+            return response
+
+        key = conversation.id if conversation else None
+        return await self.scheduler.call(key, self._call_tokens(messages), request, continuing=iteration > 0)
+
+    async def _stream_message(self, messages: List[Dict], conversation: Optional[Conversation],
+                              iteration: int, model: Optional[str] = None) -> AsyncIterator[Dict]:
+        """Streaming counterpart of _create_message: yields text events, then a ``message`` event.
+
+        Errors before the first text delta are retried like create calls;
+        once text has been sent they propagate.
+        """
+        kwargs = self._request_kwargs(messages, model=model)
+        key = conversation.id if conversation else None
+        tokens = self._call_tokens(messages)
+        for attempt in range(self.scheduler.max_retries + 1):
+            streamed = False
+            async with self.scheduler.slot(key, tokens, continuing=iteration > 0 or attempt > 0) as grant:
+                try:
+                    with span("model_call", metric=MODEL_CALL_SECONDS, model=kwargs["model"], streaming="true",
+                              iteration=iteration) as attributes:
+                        async with self.async_client.messages.stream(**kwargs) as stream:
+                            async for event in stream:
+                                if event.type == "text":
+                                    streamed = True
+                                    yield {"type": "text", "text": event.text}
+                            response = await stream.get_final_message()
+                        attributes["stop_reason"] = response.stop_reason
+                        attributes.update(usage_counts(response.usage))
+                except (anthropic.APIStatusError, anthropic.APIConnectionError) as e:
+                    if streamed:
+                        raise
+                    delay = self.scheduler.backoff(e, attempt)
+                else:
+                    grant["usage"] = usage_tokens(response.usage)
+                    yield {"type": "message", "message": response}
+                    return
+            await asyncio.sleep(delay)
+
+    async def create_training_plan(self, user_query: str, max_iterations: int = 6, context: dict = None,
+                                   conversation: Optional[Conversation] = None) -> str:
+        """Main interface for creating training plans using Claude tool calling"""
+        if context and "training_load" in context:
+            self.training_load_data = context["training_load"]
+
+        # Bare lookups skip the tool loop
+        intent, model = self._route_turn(user_query)
+        if intent is not None:
+            return await self._answer_locally(intent, user_query, conversation)
+
+        turn = self._begin_turn(user_query, conversation, model)
+
+        for iteration in range(max_iterations):
+            messages = self._prepare_call(turn)
+            response = await self._create_message(messages, conversation, iteration, model)
+            tool_blocks = self._finish_call(turn, response)
+            if tool_blocks is None:
+                return turn.reply
+            self._add_tool_results(turn, await self._run_tool_calls(tool_blocks))
+
+        return self._out_of_iterations(turn)
+
+    async def stream_training_plan(self, user_query: str, max_iterations: int = 6,
+                                   conversation: Optional[Conversation] = None) -> AsyncIterator[Dict]:
+        """Streaming variant of create_training_plan.
+
+        Yields events as they happen: ``text`` deltas from the model,
+        ``tool_start``/``tool_end`` progress for each tool call, then a
+        final ``done`` event carrying the full reply. A routed lookup is
+        sent as one ``text`` event.
+        """
+        intent, model = self._route_turn(user_query)
+        if intent is not None:
+            reply = await self._answer_locally(intent, user_query, conversation)
+            yield {"type": "text", "text": reply}
+            yield {"type": "done", "reply": reply, "usage": {}, "routed": intent.tool}
+            return
+
+        turn = self._begin_turn(user_query, conversation, model)
+
+        for iteration in range(max_iterations):
+            messages = self._prepare_call(turn)
+            async for event in self._stream_message(messages, conversation, iteration, model):
+                if event["type"] == "message":
+                    response = event["message"]
+                else:
+                    yield event
+            tool_blocks = self._finish_call(turn, response)
+            if tool_blocks is None:
+                yield {"type": "done", "reply": turn.reply, "usage": turn.usage}
+                return
+
+            # Forward progress events while the tools run
+            events = asyncio.Queue()
+            task = asyncio.create_task(self._run_tool_calls(tool_blocks, events))
+            task.add_done_callback(lambda _: events.put_nowait(None))
+            while (event := await events.get()) is not None:
+                yield event
+            self._add_tool_results(turn, task.result())
+
+        yield {"type": "done", "reply": self._out_of_iterations(turn), "usage": turn.usage}
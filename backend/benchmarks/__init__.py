@@ -0,0 +1 @@
+"""Benchmarks for the coach backend; see benchmarks/run.py"""
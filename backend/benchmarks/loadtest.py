@@ -0,0 +1,303 @@
+"""End-to-end load test of ``/analyze`` against stand-in upstream APIs.
+
+Run from ``backend/``::
+
+    python -m benchmarks.loadtest                                  # 1, 4, 16 and 64 concurrent chats
+    python -m benchmarks.loadtest --concurrency 8 32 --stream --model-latency 1.5
+    python -m benchmarks.loadtest --script my_script.json --multi-turn
+
+``api_server.py`` runs unmodified in a child process (one uvicorn worker),
+pointed at a stub Anthropic Messages API that replays a tool_use/end_turn
+script with configurable latency and a stub SvelteKit app serving
+synthetic workouts and sessions. Closed-loop clients then post chats at
+each concurrency level for ``--duration`` seconds. Reported per level:
+throughput, p50/p95/p99 latency (and time to first text event when
+streaming), errors, and how long the server's event loop was blocked,
+measured by a timer task inside the server that records how late it
+wakes up.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.run import log, metadata, percentiles
+from benchmarks.stubs import COACHING_SCRIPT, AnthropicStub, SvelteKitStub
+from benchmarks.synthetic import write_datasets
+
+DEFAULT_CONCURRENCY = [1, 4, 16, 64]
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Lag above which the loop counts as blocked, in seconds
+BLOCKED_THRESHOLD = 0.005
+
+MESSAGES = [
+    "Plan a finger strength week around my current load",
+    "What should I do on my rest days to balance all the pulling?",
+    "Build me a 45 minute hangboard session",
+    "How do I fit campus boarding into my week without getting injured?",
+]
+
+
+class LoopMonitor:
+    """Measures event-loop blocking from how late a periodic sleep wakes up"""
+
+    def __init__(self, interval: float = 0.01, threshold: float = BLOCKED_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self) -> None:
+        self.lags: List[float] = []
+        self.blocked = 0.0
+        self.started = time.perf_counter()
+
+    async def run(self) -> None:
+        while True:
+            before = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - before - self.interval)
+            self.lags.append(lag)
+            if lag > self.threshold:
+                self.blocked += lag
+
+    def snapshot(self) -> Dict:
+        window = time.perf_counter() - self.started
+        lags = self.lags or [0.0]
+        return {
+            'window_s': round(window, 3),
+            'lag': percentiles(lags),
+            'blocked_s': round(self.blocked, 4),
+            'blocked_ratio': round(self.blocked / window, 4) if window else 0.0,
+        }
+
+
+def serve(port: int) -> None:
+    """Child process: api_server's app plus a loop monitor on the same loop"""
+    import uvicorn
+    from api_server import app
+
+    monitor = LoopMonitor()
+
+    @app.get('/_loadtest/loop')
+    async def loop_stats(reset: bool = False):
+        stats = monitor.snapshot()
+        if reset:
+            monitor.reset()
+        return stats
+
+    async def main():
+        asyncio.get_running_loop().create_task(monitor.run())
+        config = uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', access_log=False)
+        await uvicorn.Server(config).serve()
+
+    asyncio.run(main())
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, env: Dict[str, str], log_path: Optional[str], timeout: float) -> subprocess.Popen:
+    output = open(log_path, 'w') if log_path else subprocess.DEVNULL
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.loadtest', '--serve', str(port)],
+        cwd=BACKEND_DIR, env=env, stdout=output, stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"api_server exited with code {process.returncode} during startup")
+        try:
+            # Measure the warmed-up server, not the background load
+            if httpx.get(f"http://127.0.0.1:{port}/readyz", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f"api_server was not ready within {timeout}s")
+
+
+async def chat(client: httpx.AsyncClient, message: str, stream: bool,
+               conversation_id: Optional[str]) -> Dict:
+    """One /analyze call; returns latency, time to first text and the conversation id"""
+    payload = {'message': message, 'stream': stream, 'conversation_id': conversation_id}
+    started = time.perf_counter()
+    if not stream:
+        response = await client.post('/analyze', json=payload)
+        body = response.json() if response.status_code == 200 else {}
+        return {'ok': response.status_code == 200, 'status': response.status_code,
+                'seconds': time.perf_counter() - started, 'conversation_id': body.get('conversation_id')}
+
+    first_text = None
+    event_type = None
+    async with client.stream('POST', '/analyze', json=payload) as response:
+        async for line in response.aiter_lines():
+            if line.startswith('event: '):
+                event_type = line[len('event: '):]
+            elif line.startswith('data: ') and event_type:
+                if event_type == 'text' and first_text is None:
+                    first_text = time.perf_counter() - started
+                elif event_type in ('done', 'error'):
+                    data = json.loads(line[len('data: '):])
+                    return {'ok': event_type == 'done', 'status': response.status_code,
+                            'seconds': time.perf_counter() - started, 'first_text': first_text,
+                            'conversation_id': data.get('conversation_id')}
+    return {'ok': False, 'status': response.status_code, 'seconds': time.perf_counter() - started}
+
+
+async def run_level(base_url: str, concurrency: int, duration: float, warmup: float,
+                    stream: bool, multi_turn: bool) -> Dict:
+    """Closed loop: ``concurrency`` clients each send their next chat as soon as one finishes"""
+    samples: List[Dict] = []
+    errors: Dict[str, int] = {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        measure_from = time.perf_counter() + warmup
+        stop_at = measure_from + duration
+
+        async def worker(n: int):
+            conversation_id = None
+            turn = 0
+            while time.perf_counter() < stop_at:
+                begun = time.perf_counter()
+                try:
+                    result = await chat(client, MESSAGES[(n + turn) % len(MESSAGES)], stream,
+                                        conversation_id if multi_turn else None)
+                except httpx.HTTPError as e:
+                    result = {'ok': False, 'status': type(e).__name__}
+                turn += 1
+                if result['ok']:
+                    conversation_id = result.get('conversation_id')
+                if begun < measure_from:
+                    continue
+                if result['ok']:
+                    samples.append(result)
+                else:
+                    errors[str(result['status'])] = errors.get(str(result['status']), 0) + 1
+
+        await client.get('/_loadtest/loop', params={'reset': 'true'})
+        tasks = [asyncio.create_task(worker(n)) for n in range(concurrency)]
+        await asyncio.sleep(warmup)
+        await client.get('/_loadtest/loop', params={'reset': 'true'})
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - measure_from
+        loop = (await client.get('/_loadtest/loop')).json()
+
+    result = {
+        'concurrency': concurrency,
+        'completed': len(samples),
+        'errors': errors,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(samples) / elapsed, 3),
+        'latency': percentiles([s['seconds'] for s in samples]) if samples else None,
+        'event_loop': loop,
+    }
+    first_text = [s['first_text'] for s in samples if s.get('first_text') is not None]
+    if first_text:
+        result['first_text'] = percentiles(first_text)
+    return result
+
+
+def summary_line(level: Dict) -> str:
+    latency = level['latency'] or {}
+    loop = level['event_loop']
+    return (f"{level['concurrency']:>6} {level['throughput_rps']:>9.2f} "
+            f"{latency.get('p50_ms', float('nan')):>10.1f} {latency.get('p95_ms', float('nan')):>10.1f} "
+            f"{latency.get('p99_ms', float('nan')):>10.1f} {sum(level['errors'].values()):>7} "
+            f"{loop['lag']['p99_ms']:>12.1f} {loop['lag']['max_ms']:>12.1f} {loop['blocked_ratio'] * 100:>9.1f}%")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--serve', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=DEFAULT_CONCURRENCY,
+                        help='concurrent chats per level')
+    parser.add_argument('--duration', type=float, default=20.0, help='measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=2.0, help='unmeasured seconds before each level')
+    parser.add_argument('--stream', action='store_true', help='request Server-Sent Events')
+    parser.add_argument('--multi-turn', action='store_true', help='each client continues its own conversation')
+    parser.add_argument('--response-cache', action='store_true',
+                        help='keep the /analyze response cache on (off by default, since clients repeat MESSAGES)')
+    parser.add_argument('--script', help='JSON file with Anthropic stub steps (default: a three-call coaching turn)')
+    parser.add_argument('--model-latency', type=float, default=0.8, help='seconds per Messages API call')
+    parser.add_argument('--model-jitter', type=float, default=0.4, help='extra random seconds per Messages API call')
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help='seconds between streamed text deltas')
+    parser.add_argument('--model-limit', type=int, default=0,
+                        help='concurrent Messages API calls the stub accepts before answering 429 (0: no limit)')
+    parser.add_argument('--retry-after', type=float, default=1.0, help='retry-after seconds on the stub\'s 429s')
+    parser.add_argument('--api-latency', type=float, default=0.02, help='seconds per SvelteKit API call')
+    parser.add_argument('--rows', type=int, default=2000, help='synthetic gym/climb rows loaded by the server')
+    parser.add_argument('--workouts', type=int, default=200, help='workouts served by the SvelteKit stub')
+    parser.add_argument('--sessions', type=int, default=300, help='training sessions served by the SvelteKit stub')
+    parser.add_argument('--data-dir', default='.bench-data', help='where synthetic CSVs are cached')
+    parser.add_argument('--startup-timeout', type=float, default=300.0, help='seconds to wait for api_server')
+    parser.add_argument('--server-log', help='file for api_server output (discarded by default)')
+    parser.add_argument('--output', default='loadtest-results.json', help='JSON results file')
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.serve)
+        return 0
+
+    script = COACHING_SCRIPT
+    if args.script:
+        with open(args.script) as f:
+            script = json.load(f)
+    paths = write_datasets(args.data_dir, args.rows)
+    port = free_port()
+
+    with SvelteKitStub(args.workouts, args.sessions, args.api_latency) as sveltekit, \
+            AnthropicStub(script=script, latency=args.model_latency, jitter=args.model_jitter,
+                          chunk_delay=args.chunk_delay, concurrency_limit=args.model_limit,
+                          retry_after=args.retry_after) as anthropic_stub:
+        env = {
+            **os.environ,
+            'ANTHROPIC_BASE_URL': anthropic_stub.url,
+            'ANTHROPIC_API_KEY': os.environ.get('ANTHROPIC_API_KEY', 'loadtest-stub'),
+            'API_BASE_URL': sveltekit.url,
+            'KAGGLE_GYM_PATH': os.path.abspath(paths['gym']),
+            'KAGGLE_CLIMB_PATH': os.path.abspath(paths['climb']),
+            'GOOGLE_SHEETS_URL': os.path.abspath(paths['sheets']),
+            'EXERCISE_SNAPSHOT_DIR': '',
+            'RESPONSE_CACHE_SIZE': os.environ.get('RESPONSE_CACHE_SIZE', '128') if args.response_cache else '0',
+        }
+        log(f"Starting api_server on port {port}")
+        server = start_server(port, env, args.server_log, args.startup_timeout)
+        report = {'meta': {**metadata(), 'args': {k: v for k, v in vars(args).items() if k != 'serve'},
+                           'script_steps': len(script)}, 'levels': []}
+        try:
+            print(f"{'chats':>6} {'req/s':>9} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'errors':>7} "
+                  f"{'loop p99 ms':>12} {'loop max ms':>12} {'blocked':>10}")
+            for concurrency in args.concurrency:
+                model_calls, api_calls, rate_limited = anthropic_stub.calls, sveltekit.calls, anthropic_stub.rate_limited
+                level = asyncio.run(run_level(f"http://127.0.0.1:{port}", concurrency, args.duration,
+                                              args.warmup, args.stream, args.multi_turn))
+                level['model_calls'] = anthropic_stub.calls - model_calls
+                level['api_calls'] = sveltekit.calls - api_calls
+                level['rate_limited'] = anthropic_stub.rate_limited - rate_limited
+                report['levels'].append(level)
+                print(summary_line(level), flush=True)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    log(f"Wrote {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
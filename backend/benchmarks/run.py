@@ -0,0 +1,253 @@
+"""Micro-benchmarks for the coach's data paths at synthetic scale.
+
+Run from ``backend/``::
+
+    python -m benchmarks.run                                   # 1k, 100k and 1M rows
+    python -m benchmarks.run --sizes 1000 100000 --output new.json
+    python -m benchmarks.run --sizes 1000 --baseline old.json  # compare with an earlier run
+
+For each size, synthetic gym/climb/sheets CSVs are generated (and reused
+from ``--data-dir``), then every stage is timed. Build stages are repeated
+under ``tracemalloc`` for their peak Python/NumPy allocation, and
+per-call stages report latency percentiles. The SvelteKit API and the
+Anthropic API are replaced by local stub servers. Results are written as
+JSON so runs from two versions can be diffed or passed to ``--baseline``.
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.stubs import AnthropicStub, SvelteKitStub
+from benchmarks.synthetic import BODYPARTS, EQUIPMENT, TEXT_WORDS, write_datasets
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+
+# Ratio to the baseline above which a stage is flagged as a regression
+REGRESSION_RATIO = 1.2
+
+
+def log(message: str) -> None:
+    print(message, file=sys.stderr, flush=True)
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Latency summary in milliseconds"""
+    ms = np.asarray(samples) * 1000
+    return {
+        'count': int(len(ms)),
+        'mean_ms': round(float(ms.mean()), 4),
+        'p50_ms': round(float(np.percentile(ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(ms, 99)), 4),
+        'max_ms': round(float(ms.max()), 4),
+    }
+
+
+def measure(fn: Callable, memory: bool = True):
+    """Time one call; with ``memory`` call it again under tracemalloc for its peak"""
+    gc.collect()
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        result = fn()
+        stats = {'seconds': round(time.perf_counter() - started, 6)}
+        if memory:
+            del result
+            gc.collect()
+            tracemalloc.start()
+            result = fn()
+            stats['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 3)
+            tracemalloc.stop()
+    return result, stats
+
+
+def latencies(fn: Callable, args: List) -> Dict[str, float]:
+    """Per-call latency percentiles of ``fn`` over ``args``"""
+    samples = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for arg in args:
+            started = time.perf_counter()
+            fn(arg)
+            samples.append(time.perf_counter() - started)
+    return percentiles(samples)
+
+
+def sample_queries(count: int, seed: int = 0) -> List[str]:
+    """One to three word queries mixing body parts, equipment and description words"""
+    rng = np.random.default_rng(seed)
+    words = [w.lower() for w in BODYPARTS + EQUIPMENT] + TEXT_WORDS[:60]
+    return [' '.join(rng.choice(words, int(rng.integers(1, 4)), replace=False)) for _ in range(count)]
+
+
+class _Response:
+    """Just enough of requests.Response for the formatting helpers"""
+
+    def __init__(self, status_code: int, body):
+        self.status_code = status_code
+        self._body = body
+
+    def json(self):
+        return self._body
+
+
+def bench_size(rows: int, args, sveltekit: SvelteKitStub) -> Dict:
+    from ClimbCoach import ClimbingCoachSystem
+    from exercise_facets import FacetIndex
+    from exercise_index import ExerciseIndex
+    from exercise_vectors import ExerciseVectors
+    from snapshot import SnapshotCache
+    from ttl_cache import TTLCache
+
+    log(f"[{rows} rows] generating datasets")
+    paths, generate = measure(lambda: write_datasets(args.data_dir, rows), memory=False)
+    results = {'rows': rows, 'generate_datasets': generate, 'stages': {}, 'latency': {}}
+    stages = results['stages']
+
+    log(f"[{rows} rows] coach startup")
+    coach, stages['coach_init'] = measure(
+        lambda: ClimbingCoachSystem(paths['gym'], paths['climb'], paths['sheets'], api_base_url=sveltekit.url),
+        memory=False,
+    )
+    coach.read_cache = TTLCache(ttl=0)
+    results['exercises'] = len(coach.exercise_db)
+
+    memory = not args.no_memory
+    log(f"[{rows} rows] build stages")
+    # The coach drops its raw datasets once the store is built; keep them for the build stages
+    coach.gym_data, stages['load_kaggle_gym_data'] = measure(lambda: coach.load_kaggle_gym_data(paths['gym']), memory)
+    _, stages['load_kaggle_climb_data'] = measure(lambda: coach.load_kaggle_climb_data(paths['climb']), memory)
+    coach.sheets_data, stages['load_google_sheets_data'] = measure(
+        lambda: coach.load_google_sheets_data(paths['sheets']), memory
+    )
+    _, stages['build_exercise_db'] = measure(coach._build_exercise_db, memory)
+    _, stages['build_index'] = measure(lambda: ExerciseIndex.from_store(coach.exercise_db), memory)
+    _, stages['build_vectors'] = measure(
+        lambda: ExerciseVectors.from_index(coach.exercise_index, dims=coach.exercise_vectors.dims), memory
+    )
+    _, stages['build_facets'] = measure(lambda: FacetIndex.from_store(coach.exercise_db), memory)
+    _, stages['build_progression_db'] = measure(coach._build_progression_db, memory)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cache = SnapshotCache(directory)
+        sources = {'gym_path': paths['gym']}
+        fingerprints = cache.fingerprint_sources(sources)
+        _, stages['snapshot_save'] = measure(
+            lambda: cache.save(fingerprints, coach.exercise_db, coach.exercise_index, coach.exercise_vectors,
+                               coach.exercises.facets),
+            memory=False,
+        )
+        _, stages['snapshot_load'] = measure(lambda: cache.load(sources), memory)
+
+    log(f"[{rows} rows] search latency")
+    latency = results['latency']
+    queries = sample_queries(args.queries)
+    for mode in ('keyword', 'semantic', 'hybrid'):
+        latency[f"search_exercises.{mode}"] = latencies(lambda q: coach.search_exercises(q, 8, mode), queries)
+    filters = {'level': ['Beginner'], 'equipment': ['Body Only', 'Hangboard']}
+    latency['search_exercises.hybrid.filtered'] = latencies(
+        lambda q: coach.search_exercises(q, 8, filters=filters), queries
+    )
+    latency['search_exercises.filtered.rating'] = latencies(
+        lambda _: coach.search_exercises('', 8, filters={'bodypart': ['Forearms'], **filters}, sort='rating'), queries
+    )
+    batches = [queries[i:i + 8] for i in range(0, len(queries), 8)]
+    latency['search_exercises_batch.hybrid.8'] = latencies(lambda b: coach.search_exercises_batch(b, 8), batches)
+
+    log(f"[{rows} rows] API tool latency")
+    calls = list(range(args.requests))
+    response = _Response(200, sveltekit.workouts)
+    latency['format_workouts_response'] = latencies(lambda _: coach._format_workouts_response(response), calls)
+    latency['lookup_past_workouts'] = latencies(lambda _: coach.lookup_past_workouts(), calls)
+    latency['get_training_load'] = latencies(lambda _: coach.get_training_load(), calls)
+    latency['create_training_plan'] = latencies(lambda _: coach.create_training_plan("Plan a finger strength week"), calls)
+
+    coach.api.close()
+    return results
+
+
+def metadata() -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def compare(baseline: Dict, current: Dict) -> List[str]:
+    """Lines comparing build seconds and p50 latencies with a baseline run"""
+    lines = []
+    for size, result in current['results'].items():
+        old = baseline.get('results', {}).get(size)
+        if not old:
+            continue
+        pairs = [(f"{name} (s)", stats['seconds'], old['stages'].get(name, {}).get('seconds'))
+                 for name, stats in result['stages'].items()]
+        pairs += [(f"{name} p50 (ms)", stats['p50_ms'], old['latency'].get(name, {}).get('p50_ms'))
+                  for name, stats in result['latency'].items()]
+        for name, new_value, old_value in pairs:
+            if not old_value:
+                continue
+            ratio = new_value / old_value
+            flag = '  REGRESSION' if ratio > REGRESSION_RATIO else ''
+            lines.append(f"{size:>9} {name:<42} {old_value:>12.4f} -> {new_value:>12.4f}  x{ratio:.2f}{flag}")
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='gym/climb rows per run')
+    parser.add_argument('--queries', type=int, default=200, help='search queries per mode')
+    parser.add_argument('--requests', type=int, default=50, help='calls per API-backed stage')
+    parser.add_argument('--workouts', type=int, default=500, help='workouts served by the SvelteKit stub')
+    parser.add_argument('--data-dir', default='.bench-data', help='where synthetic CSVs are cached')
+    parser.add_argument('--output', default='bench-results.json', help='JSON results file')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    args = parser.parse_args(argv)
+
+    # Keep the run local: no snapshot directory, stubbed Anthropic endpoint
+    os.environ['EXERCISE_SNAPSHOT_DIR'] = ''
+    os.environ['TOOL_CACHE_TTL'] = '0'
+    os.environ.setdefault('ANTHROPIC_API_KEY', 'benchmark-stub')
+
+    with SvelteKitStub(workouts=args.workouts) as sveltekit, AnthropicStub() as anthropic_stub:
+        os.environ['ANTHROPIC_BASE_URL'] = anthropic_stub.url
+        report = {'meta': metadata(), 'results': {}}
+        for rows in args.sizes:
+            report['results'][str(rows)] = bench_size(rows, args, sveltekit)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    log(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            for line in compare(json.load(f), report):
+                print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
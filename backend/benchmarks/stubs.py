@@ -0,0 +1,345 @@
+"""Local stand-ins for the SvelteKit API and the Anthropic Messages API.
+
+Both are plain ``ThreadingHTTPServer``s on 127.0.0.1 serving canned JSON,
+so benchmarks exercise the real HTTP clients without network access or
+API keys. Point the coach at them with ``api_base_url=stub.url`` and
+``ANTHROPIC_BASE_URL=anthropic_stub.url``. Each stub can add a fixed
+latency plus random jitter to every response, and the Anthropic stub
+replays a script of tool_use/end_turn steps, streamed or not, optionally
+answering 429 beyond a number of concurrent calls like a rate-limited
+account.
+"""
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from benchmarks.synthetic import NAME_WORDS, V_GRADES
+from training_load import training_load_summary
+
+# A typical /analyze turn: read the athlete's state, look up exercises and
+# workouts in parallel, then answer
+COACHING_SCRIPT = [
+    {'tool_use': [{'name': 'get_training_load', 'input': {}}]},
+    {'tool_use': [{'name': 'search_exercises', 'input': {'queries': ['finger strength hangboard', 'antagonist push']}},
+                  {'name': 'lookup_workouts', 'input': {}}]},
+    {'text': "Your ACWR is in the sweet spot, so this week add one hangboard session: "
+             "7s hangs on a 20mm edge, 6 reps x 3 sets, plus push-ups and reverse wrist curls "
+             "on your rest days to balance the pulling volume."},
+]
+
+
+def fake_workouts(count: int, seed: int = 0) -> List[Dict]:
+    """Workouts shaped like GET /api/workouts results"""
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc)
+    workouts = []
+    for i in range(count):
+        exercises = [
+            {'id': f"e{i}-{j}", 'name': ' '.join(rng.choice(NAME_WORDS, 3)).title(),
+             'sets': int(rng.integers(1, 6)), 'reps': int(rng.integers(3, 12))}
+            for j in range(int(rng.integers(1, 9)))
+        ]
+        workouts.append({
+            'id': f"w{i}",
+            'name': f"Workout {i} " + ' '.join(rng.choice(NAME_WORDS, 2)).title(),
+            'description': 'Synthetic workout',
+            'scheduledDate': (now - timedelta(days=int(rng.integers(0, 365)))).isoformat(),
+            'exercises': exercises,
+        })
+    return workouts
+
+
+def fake_sessions(count: int, seed: int = 0) -> List[Dict]:
+    """Training sessions shaped like GET /api/training results, newest first"""
+    rng = np.random.default_rng(seed)
+    now = datetime.now(timezone.utc)
+    offsets = np.sort(rng.uniform(0, 180, count))
+    return [
+        {
+            'id': f"s{i}",
+            'name': f"Session {i}",
+            'description': '',
+            'workoutId': 'w0',
+            'scheduledDate': (now - timedelta(days=float(offset))).isoformat(),
+            'climbs': [
+                {'id': f"c{i}-{j}", 'name': 'Problem', 'grade': int(rng.integers(0, len(V_GRADES))),
+                 'flagBoulder': True, 'flagSport': False, 'attempts': int(rng.integers(0, 5))}
+                for j in range(int(rng.integers(1, 8)))
+            ],
+        }
+        for i, offset in enumerate(offsets)
+    ]
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Load tests open many connections at once; the default backlog is 5
+    request_queue_size = 256
+
+
+class _StubServer:
+    """Runs a handler class on an ephemeral port in a daemon thread"""
+
+    handler_class = BaseHTTPRequestHandler
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self._calls_lock = threading.Lock()
+        self.server = _Server(('127.0.0.1', 0), self._make_handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def delay(self) -> None:
+        """Count a request and sleep for the configured latency"""
+        with self._calls_lock:
+            self.calls += 1
+        seconds = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(self.handler_class):
+            def log_message(self, *args):
+                pass
+
+        Handler.stub = stub
+        return Handler
+
+    def start(self) -> "_StubServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def _send(self, status: int, body, content_type: str = 'application/json',
+              headers: Optional[Dict[str, str]] = None) -> None:
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self) -> Dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}')
+
+    def _start_chunked(self, status: int, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _chunk(self, data: bytes) -> None:
+        """One chunk of a chunked response; empty data ends it"""
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+
+
+class _SvelteKitHandler(_JsonHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        self.stub.delay()
+        if url.path == '/api/workouts':
+            return self._send(200, self.stub.workouts_body)
+        if url.path == '/api/training':
+            take = int(parse_qs(url.query).get('take', ['20'])[0])
+            return self._send(200, self.stub.sessions[:take])
+        if url.path == '/api/training-load':
+            return self._send(200, self.stub.training_load_body)
+        self._send(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        body = self._body()
+        self.stub.delay()
+        if url.path in ('/api/workouts', '/api/training'):
+            return self._send(201, {'id': uuid.uuid4().hex, **body})
+        self._send(404, {'error': 'Not found'})
+
+
+class SvelteKitStub(_StubServer):
+    """Serves /api/workouts, /api/training and /api/training-load from synthetic data"""
+
+    handler_class = _SvelteKitHandler
+
+    def __init__(self, workouts: int = 100, sessions: int = 200, latency: float = 0.0, jitter: float = 0.0):
+        self.workouts = fake_workouts(workouts)
+        self.sessions = fake_sessions(sessions)
+        # Encoded once so the stub's own serialization stays out of timings
+        self.workouts_body = json.dumps(self.workouts).encode()
+        self.training_load_body = json.dumps({
+            'success': True,
+            'trainingLoad': training_load_summary(self.sessions),
+        }).encode()
+        super().__init__(latency, jitter)
+
+
+class _AnthropicHandler(_JsonHandler):
+    def do_POST(self):
+        if urlparse(self.path).path != '/v1/messages':
+            return self._send(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': 'Not found'}})
+        request = self._body()
+        if not self.stub.enter():
+            return self._send(429, {'type': 'error', 'error': {'type': 'rate_limit_error',
+                                                                'message': 'Stub concurrency limit exceeded'}},
+                              headers={'retry-after': str(self.stub.retry_after)})
+        try:
+            self.stub.delay()
+            message = self.stub.reply(request)
+            if not request.get('stream'):
+                return self._send(200, message)
+            self._start_chunked(200, 'text/event-stream')
+            for event in self.stub.stream_events(message):
+                self._chunk(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode())
+                if self.stub.chunk_delay and event['type'] == 'content_block_delta':
+                    time.sleep(self.stub.chunk_delay)
+            self._chunk(b'')
+        finally:
+            self.stub.leave()
+
+
+class AnthropicStub(_StubServer):
+    """Answers POST /v1/messages by replaying ``script``.
+
+    A script is a list of steps, each ``{'tool_use': [{'name', 'input'}]}``
+    or ``{'text': ...}``. The step is picked from the number of assistant
+    messages since the user's latest message, so the stub is stateless and
+    any number of chats can run through it at once; past the end of the
+    script the last step repeats. Streaming requests get the same message
+    as Server-Sent Events, one text delta per word. With
+    ``concurrency_limit``, calls beyond that many in flight get a 429 with
+    ``retry-after`` (counted in ``rate_limited``).
+    """
+
+    handler_class = _AnthropicHandler
+
+    def __init__(self, text: str = "Stub coaching reply.", input_tokens: int = 1200, output_tokens: int = 80,
+                 script: Optional[List[Dict]] = None, latency: float = 0.0, jitter: float = 0.0,
+                 chunk_delay: float = 0.0, concurrency_limit: int = 0, retry_after: float = 1.0):
+        self.text = text
+        self.input_tokens = input_tokens
+        self.output_tokens = output_tokens
+        self.script = script or [{'text': text}]
+        self.chunk_delay = chunk_delay
+        self.concurrency_limit = concurrency_limit
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.rate_limited = 0
+        self._ids = itertools.count()
+        super().__init__(latency, jitter)
+
+    def enter(self) -> bool:
+        """Start a call, or count a 429 if ``concurrency_limit`` calls are already in flight"""
+        with self._calls_lock:
+            if self.concurrency_limit and self.in_flight >= self.concurrency_limit:
+                self.rate_limited += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def leave(self) -> None:
+        with self._calls_lock:
+            self.in_flight -= 1
+
+    @staticmethod
+    def _step_index(messages: List[Dict]) -> int:
+        """Assistant messages since the latest user message that is not tool results"""
+        steps = 0
+        for message in reversed(messages):
+            if message.get('role') == 'assistant':
+                steps += 1
+                continue
+            content = message.get('content')
+            if isinstance(content, str) or not any(
+                isinstance(block, dict) and block.get('type') == 'tool_result' for block in content or []
+            ):
+                break
+        return steps
+
+    def _script_content(self, request: Dict):
+        step = self.script[min(self._step_index(request.get('messages', [])), len(self.script) - 1)]
+        if 'tool_use' in step:
+            content = [
+                {'type': 'tool_use', 'id': f"toolu_{next(self._ids):024d}", 'name': call['name'],
+                 'input': call.get('input', {})}
+                for call in step['tool_use']
+            ]
+            return content, 'tool_use'
+        return [{'type': 'text', 'text': step.get('text', self.text)}], 'end_turn'
+
+    def reply(self, request: Dict, content: Optional[List[Dict]] = None, stop_reason: Optional[str] = None) -> Dict:
+        if content is None:
+            content, scripted_stop = self._script_content(request)
+            stop_reason = stop_reason or scripted_stop
+        return {
+            'id': f"msg_{uuid.uuid4().hex[:24]}",
+            'type': 'message',
+            'role': 'assistant',
+            'model': request.get('model', 'stub'),
+            'content': content,
+            'stop_reason': stop_reason or 'end_turn',
+            'stop_sequence': None,
+            'usage': {'input_tokens': self.input_tokens, 'output_tokens': self.output_tokens,
+                      'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 0},
+        }
+
+    @staticmethod
+    def stream_events(message: Dict) -> List[Dict]:
+        """The Messages API streaming events that rebuild ``message``"""
+        usage = message['usage']
+        events = [{'type': 'message_start', 'message': {
+            **message, 'content': [], 'stop_reason': None, 'usage': {**usage, 'output_tokens': 1},
+        }}]
+        for index, block in enumerate(message['content']):
+            if block['type'] == 'text':
+                events.append({'type': 'content_block_start', 'index': index,
+                               'content_block': {'type': 'text', 'text': ''}})
+                words = block['text'].split(' ')
+                events += [
+                    {'type': 'content_block_delta', 'index': index,
+                     'delta': {'type': 'text_delta', 'text': word if i == 0 else ' ' + word}}
+                    for i, word in enumerate(words)
+                ]
+            else:
+                events.append({'type': 'content_block_start', 'index': index,
+                               'content_block': {**block, 'input': {}}})
+                events.append({'type': 'content_block_delta', 'index': index,
+                               'delta': {'type': 'input_json_delta', 'partial_json': json.dumps(block['input'])}})
+            events.append({'type': 'content_block_stop', 'index': index})
+        events.append({'type': 'message_delta', 'delta': {'stop_reason': message['stop_reason'], 'stop_sequence': None},
+                       'usage': {'output_tokens': usage['output_tokens']}})
+        events.append({'type': 'message_stop'})
+        return events
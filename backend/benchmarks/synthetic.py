@@ -0,0 +1,115 @@
+"""Synthetic gym, climb and Google Sheets CSVs shaped like the real sources.
+
+Rows are generated with NumPy from small fixed vocabularies, with
+description words drawn from a Zipf-like distribution so term statistics
+resemble natural text. Generation is seeded, so every run at a given size
+benchmarks the same data.
+"""
+import os
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+BODYPARTS = ['Forearms', 'Shoulders', 'Middle Back', 'Lower Back', 'Abdominals', 'Lats',
+             'Biceps', 'Chest', 'Triceps', 'Quadriceps', 'Hamstrings', 'Glutes', 'Calves']
+EQUIPMENT = ['Body Only', 'Dumbbell', 'Barbell', 'Cable', 'Kettlebells', 'Bands',
+             'Machine', 'Hangboard', 'Campus Board', 'Rings', 'Pull-up Bar', 'Medicine Ball']
+LEVELS = ['Beginner', 'Intermediate', 'Expert']
+TYPES = ['Strength', 'Stretching', 'Plyometrics', 'Powerlifting', 'Cardio', 'Strongman']
+
+NAME_WORDS = ['pull', 'up', 'row', 'curl', 'press', 'hang', 'dead', 'hold', 'plank', 'raise',
+              'reverse', 'wrist', 'finger', 'grip', 'pinch', 'lock', 'off', 'scapular', 'shrug',
+              'lever', 'front', 'side', 'single', 'arm', 'one', 'two', 'wide', 'close', 'incline',
+              'decline', 'hanging', 'knee', 'leg', 'toes', 'bar', 'rotation', 'twist', 'extension',
+              'fly', 'dip', 'push', 'campus', 'ladder', 'max', 'repeater', 'isometric', 'eccentric']
+TEXT_WORDS = NAME_WORDS + [
+    'the', 'and', 'with', 'your', 'to', 'of', 'a', 'in', 'for', 'is', 'this', 'exercise', 'muscles',
+    'strength', 'endurance', 'power', 'forearms', 'shoulders', 'back', 'core', 'abs', 'lats', 'biceps',
+    'chest', 'triceps', 'tension', 'control', 'slowly', 'lower', 'body', 'position', 'keep', 'engaged',
+    'start', 'return', 'repeat', 'sets', 'reps', 'rest', 'seconds', 'edge', 'crimp', 'sloper', 'jug',
+    'open', 'hand', 'half', 'contact', 'stability', 'mobility', 'injury', 'prevention', 'antagonist',
+    'training', 'climbing', 'climbers', 'wall', 'board', 'hold', 'feet', 'hips', 'shoulder', 'elbow',
+    'wrist', 'tendons', 'pulley', 'load', 'volume', 'intensity', 'recovery', 'warm', 'cool', 'down',
+]
+V_GRADES = [f"V{g}" for g in range(0, 13)]
+YDS_GRADES = [f"5.{g}{s}" for g in range(6, 15) for s in ('', 'a', 'b', 'c', 'd') if g >= 10 or not s]
+STYLES = ['boulder', 'sport', 'trad', 'top rope']
+
+
+def _zipf_words(rng: np.random.Generator, vocab: list, rows: int, min_words: int, max_words: int) -> list:
+    """Space-joined word sequences, frequent words first in the vocabulary"""
+    weights = 1.0 / np.arange(1, len(vocab) + 1)
+    lengths = rng.integers(min_words, max_words + 1, rows)
+    words = np.asarray(vocab, dtype=object)[rng.choice(len(vocab), size=(rows, max_words), p=weights / weights.sum())]
+    return [' '.join(row[:n]) for row, n in zip(words, lengths)]
+
+
+def _title(texts: list) -> list:
+    return [text.title() for text in texts]
+
+
+def gym_frame(rows: int, seed: int = 0) -> pd.DataFrame:
+    """Rows shaped like the Kaggle megaGymDataset"""
+    rng = np.random.default_rng(seed)
+    ratings = np.round(rng.uniform(0, 10, rows), 1)
+    ratings[rng.random(rows) < 0.4] = np.nan
+    return pd.DataFrame({
+        'Title': _title(_zipf_words(rng, NAME_WORDS, rows, 2, 4)),
+        'Desc': _zipf_words(rng, TEXT_WORDS, rows, 12, 45),
+        'Type': rng.choice(TYPES, rows),
+        'BodyPart': rng.choice(BODYPARTS, rows),
+        'Equipment': rng.choice(EQUIPMENT, rows),
+        'Level': rng.choice(LEVELS, rows),
+        'Rating': ratings,
+        'RatingDesc': np.where(np.isnan(ratings), '', 'Average'),
+    })
+
+
+def sheets_frame(rows: int, seed: int = 1) -> pd.DataFrame:
+    """Rows shaped like the coaching Google Sheet"""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Exercise': _title(_zipf_words(rng, NAME_WORDS, rows, 2, 4)),
+        'Description': _zipf_words(rng, TEXT_WORDS, rows, 8, 30),
+        'Body Part': rng.choice(BODYPARTS[:9], rows),
+        'Equipment': rng.choice(EQUIPMENT, rows),
+        'Level': rng.choice(LEVELS, rows),
+        'Sets': rng.integers(1, 6, rows),
+        'Reps': rng.choice(['5', '8', '10', '3x7s', 'max'], rows),
+    })
+
+
+def climb_frame(rows: int, seed: int = 2) -> pd.DataFrame:
+    """Logged ascents with a grade column, like the Kaggle climbing data"""
+    rng = np.random.default_rng(seed)
+    boulder = rng.random(rows) < 0.6
+    grades = np.where(boulder, rng.choice(V_GRADES, rows), rng.choice(YDS_GRADES, rows))
+    dates = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 5 * 365, rows), unit='D')
+    return pd.DataFrame({
+        'user_id': rng.integers(0, max(1, rows // 50), rows),
+        'name': _title(_zipf_words(rng, NAME_WORDS, rows, 1, 3)),
+        'grade': grades,
+        'style': np.where(boulder, 'boulder', rng.choice(STYLES[1:], rows)),
+        'attempts': rng.integers(1, 12, rows),
+        'date': dates.strftime('%Y-%m-%d'),
+    })
+
+
+def write_datasets(directory: str, rows: int, sheets_rows: int = None) -> Dict[str, str]:
+    """Write (or reuse) the three CSVs for a size; returns their paths"""
+    sheets_rows = sheets_rows if sheets_rows is not None else max(1, rows // 10)
+    os.makedirs(directory, exist_ok=True)
+    paths = {
+        'gym': os.path.join(directory, f"gym_{rows}.csv"),
+        'climb': os.path.join(directory, f"climb_{rows}.csv"),
+        'sheets': os.path.join(directory, f"sheets_{sheets_rows}.csv"),
+    }
+    builders = {'gym': (gym_frame, rows), 'climb': (climb_frame, rows), 'sheets': (sheets_frame, sheets_rows)}
+    for name, path in paths.items():
+        if not os.path.exists(path):
+            build, count = builders[name]
+            tmp = f"{path}.tmp"
+            build(count).to_csv(tmp)
+            os.replace(tmp, path)
+    return paths
@@ -0,0 +1,220 @@
+import asyncio
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+# Stands in for tool results dropped from older requests
+ELIDED_RESULT = "[Earlier tool result removed to save context; call the tool again if you still need it.]"
+
+DIGEST_HEADER = "Summary of earlier messages in this conversation:"
+
+# Lines kept in a conversation's digest of dropped turns
+MAX_DIGEST_LINES = 20
+DIGEST_SNIPPET = 240
+
+
+def content_chars(content) -> int:
+    """Rough size of a message's content in characters"""
+    if isinstance(content, str):
+        return len(content)
+    total = 0
+    for block in content:
+        if isinstance(block, dict):
+            total += len(json.dumps(block, default=str))
+        elif hasattr(block, "model_dump_json"):
+            total += len(block.model_dump_json())
+        else:
+            total += len(str(block))
+    return total
+
+
+def _text(content) -> str:
+    """Plain text of a message, ignoring tool blocks"""
+    if isinstance(content, str):
+        return content
+    parts = []
+    for block in content:
+        kind = block.get("type") if isinstance(block, dict) else getattr(block, "type", None)
+        text = block.get("text") if isinstance(block, dict) else getattr(block, "text", None)
+        if kind == "text" and text and not text.startswith(DIGEST_HEADER):
+            parts.append(text)
+    return " ".join(parts)
+
+
+def _snippet(text: str) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= DIGEST_SNIPPET else text[:DIGEST_SNIPPET - 3] + "..."
+
+
+def _is_turn_start(message: Dict) -> bool:
+    """A user message carrying the user's words rather than tool results"""
+    if message["role"] != "user":
+        return False
+    content = message["content"]
+    if isinstance(content, str):
+        return True
+    return not any(isinstance(block, dict) and block.get("type") == "tool_result" for block in content)
+
+
+class TokenBudget:
+    """Keeps the messages sent per call under ``max_tokens``.
+
+    Sizes are estimated from characters; the characters-per-token ratio is
+    recalibrated after every call from the input tokens the API reports, so
+    no tokenizer round trip is needed. Once over budget, history is cut to
+    ``target_ratio * max_tokens``: old tool results are elided first, then
+    whole turns are dropped oldest first and replaced by a one-line digest.
+    Cutting below the limit means the cached prompt prefix is only
+    rewritten every few turns rather than on every call.
+    """
+
+    def __init__(self, max_tokens: int = 12000, target_ratio: float = 0.6, fixed_chars: int = 0):
+        self.max_tokens = max_tokens
+        self.target_ratio = target_ratio
+        # Characters sent on every call outside ``messages`` (system prompt, tools)
+        self.fixed_chars = fixed_chars
+        self.chars_per_token = 4.0
+        self.compactions = 0
+
+    def estimate(self, messages: List[Dict]) -> int:
+        return int(sum(content_chars(m["content"]) for m in messages) / self.chars_per_token)
+
+    def observe(self, messages: List[Dict], usage) -> None:
+        """Recalibrate from the prompt size the API reported for ``messages``"""
+        tokens = sum(
+            getattr(usage, key, 0) or 0
+            for key in ("input_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+        )
+        if tokens <= 0:
+            return
+        chars = self.fixed_chars + sum(content_chars(m["content"]) for m in messages)
+        self.chars_per_token = min(8.0, max(1.5, chars / tokens))
+
+    def compact(self, messages: List[Dict], digest: List[str]) -> Tuple[List[Dict], List[str]]:
+        """Fit messages into the budget; returns new messages and digest lines.
+
+        The newest message is never touched, and the turn it belongs to is
+        never dropped. The digest is carried as a text block at the start of
+        the first message.
+        """
+        messages = [self._strip_digest(m) if i == 0 else m for i, m in enumerate(messages)]
+        digest = list(digest)
+        if self.estimate(messages) <= self.max_tokens:
+            return self._with_digest(messages, digest), digest
+
+        self.compactions += 1
+        target = self.max_tokens * self.target_ratio
+
+        # Elide tool results, oldest first
+        for i in range(len(messages) - 1):
+            if self.estimate(messages) <= target:
+                break
+            content = messages[i]["content"]
+            if messages[i]["role"] != "user" or isinstance(content, str):
+                continue
+            blocks = [
+                {**block, "content": ELIDED_RESULT}
+                if isinstance(block, dict) and block.get("type") == "tool_result"
+                and content_chars([block]) > len(ELIDED_RESULT) * 2 else block
+                for block in content
+            ]
+            messages[i] = {**messages[i], "content": blocks}
+
+        # Drop whole turns, oldest first, keeping a line for each
+        while self.estimate(messages) > target:
+            starts = [i for i, m in enumerate(messages) if _is_turn_start(m)]
+            if len(starts) < 2:
+                break
+            turn, messages = messages[:starts[1]], messages[starts[1]:]
+            reply = next((m for m in reversed(turn) if m["role"] == "assistant"), None)
+            digest.append(
+                f"- User: {_snippet(_text(turn[0]['content']))}"
+                + (f" / Coach: {_snippet(_text(reply['content']))}" if reply else "")
+            )
+        digest = digest[-MAX_DIGEST_LINES:]
+
+        return self._with_digest(messages, digest), digest
+
+    def _strip_digest(self, message: Dict) -> Dict:
+        content = message["content"]
+        if isinstance(content, str):
+            return message
+        blocks = [
+            block for block in content
+            if not (isinstance(block, dict) and str(block.get("text", "")).startswith(DIGEST_HEADER))
+        ]
+        if len(blocks) == len(content):
+            return message
+        if len(blocks) == 1 and blocks[0].get("type") == "text":
+            return {**message, "content": blocks[0]["text"]}
+        return {**message, "content": blocks}
+
+    def _with_digest(self, messages: List[Dict], digest: List[str]) -> List[Dict]:
+        if not digest or not messages:
+            return messages
+        first = messages[0]
+        content = first["content"]
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        block = {"type": "text", "text": "\n".join([DIGEST_HEADER] + digest)}
+        return [{**first, "content": [block] + list(content)}] + messages[1:]
+
+
+class Conversation:
+    """History of one chat, replayed to the model on every turn"""
+
+    def __init__(self, conversation_id: str):
+        self.id = conversation_id
+        self.messages: List[Dict] = []
+        self.digest: List[str] = []
+        self.updated = time.monotonic()
+        # Serializes turns; concurrent requests would interleave the history
+        self.lock = asyncio.Lock()
+
+    def commit(self, messages: List[Dict], digest: List[str]) -> None:
+        """Keep a finished turn's messages as the new history"""
+        self.messages = messages
+        self.digest = digest
+        self.updated = time.monotonic()
+
+
+class ConversationStore:
+    """Bounded LRU of conversations; idle ones expire after ``ttl`` seconds"""
+
+    def __init__(self, max_conversations: int = 256, ttl: float = 3600.0):
+        self.max_conversations = max_conversations
+        self.ttl = ttl
+        self._conversations: "OrderedDict[str, Conversation]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, conversation_id: Optional[str] = None) -> Conversation:
+        """Conversation for an id, starting a fresh one if it is unknown or expired"""
+        with self._lock:
+            self._expire()
+            conversation = self._conversations.get(conversation_id) if conversation_id else None
+            if conversation is None:
+                conversation = Conversation(conversation_id or uuid.uuid4().hex)
+                self._conversations[conversation.id] = conversation
+                while len(self._conversations) > self.max_conversations:
+                    self._conversations.popitem(last=False)
+            conversation.updated = time.monotonic()
+            self._conversations.move_to_end(conversation.id)
+            return conversation
+
+    def discard(self, conversation_id: str) -> None:
+        with self._lock:
+            self._conversations.pop(conversation_id, None)
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.ttl
+        while self._conversations:
+            oldest = next(iter(self._conversations.values()))
+            if oldest.updated >= cutoff:
+                break
+            self._conversations.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._conversations)
@@ -0,0 +1,208 @@
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from exercise_index import resolve_field, tokenize
+from exercise_store import NumericColumn, pack_strings, unpack_strings
+
+# Store fields exposed as search_exercises filters
+FACET_FIELDS = ('bodypart', 'equipment', 'level', 'type')
+
+# Values on at least this share of exercises also get a bitmap
+DENSE_FRACTION = 1 / 64
+
+# Values listed per field when a filter value is unknown
+MAX_LISTED_VALUES = 30
+
+
+def facet_key(value: str) -> str:
+    """Filter value as matched: tokenized like the search index, so "Forearm" finds "Forearms" """
+    return ' '.join(tokenize(value))
+
+
+def _bits_set(bitmap: np.ndarray, doc_ids: np.ndarray) -> np.ndarray:
+    """Whether each doc id's bit is set in a np.packbits bitmap"""
+    return (bitmap[doc_ids >> 3] >> (7 - (doc_ids & 7)).astype(np.uint8)) & 1 == 1
+
+
+class Facet(NamedTuple):
+    """Postings of one filterable field"""
+    # Normalized values (see facet_key), sorted, and each as first seen in the data
+    keys: List[str]
+    labels: List[str]
+    # Doc ids with value ``v`` are doc_ids[offsets[v]:offsets[v + 1]], ascending
+    offsets: np.ndarray
+    doc_ids: np.ndarray
+    # Value ids with a packed bitmap, and the bitmaps (one np.packbits row each)
+    dense: np.ndarray
+    bitmaps: np.ndarray
+
+
+class FacetIndex:
+    """Posting sets over the categorical exercise fields, plus a rating order.
+
+    Values within a field are alternatives and fields must all match.
+    Common values (``DENSE_FRACTION`` of the exercises or more) also have
+    a packed bitmap, so fields made of those are combined with bytewise
+    OR/AND over ``num_docs / 8`` bytes. Rare values keep only their sorted
+    postings: the smallest such set is the starting candidates, which are
+    then checked against the other fields' postings by binary search and
+    against the combined bitmap by bit lookup, so a selective filter never
+    touches the whole store. ``rating_order`` lists every exercise best
+    rated first (unrated last), and ``rating_rank`` is its inverse, so any
+    candidate set can be put in rating order without sorting by rating.
+    """
+
+    def __init__(self, fields: Dict[str, Facet], rating_order: np.ndarray, rating_rank: np.ndarray, num_docs: int):
+        self.fields = fields
+        self.value_ids = {field: {key: i for i, key in enumerate(facet.keys)} for field, facet in fields.items()}
+        self.dense_rows = {field: {int(v): row for row, v in enumerate(facet.dense)} for field, facet in fields.items()}
+        self.rating_order = rating_order
+        self.rating_rank = rating_rank
+        self.num_docs = num_docs
+
+    @classmethod
+    def from_store(cls, store) -> "FacetIndex":
+        """Build postings for every column that resolves to a facet field, and the rating order"""
+        num_docs = len(store)
+        columns: Dict[str, List[Tuple[np.ndarray, List[str]]]] = {}
+        labels: Dict[str, Dict[str, str]] = {}
+        ratings = np.full(num_docs, np.nan)
+
+        for name, column in store.columns.items():
+            if str(name).strip().lower() == 'rating' and isinstance(column, NumericColumn):
+                ratings = np.asarray(column.values, dtype=np.float64)
+                continue
+            field = resolve_field(name)
+            if field not in FACET_FIELDS:
+                continue
+            codes, uniques = column.factorize()
+            keys = [facet_key(u) for u in uniques]
+            seen = labels.setdefault(field, {})
+            for key, label in zip(keys, uniques):
+                if key:
+                    seen.setdefault(key, label)
+            columns.setdefault(field, []).append((np.asarray(codes), keys))
+
+        fields = {}
+        stride = np.int64(max(num_docs, 1))
+        for field, sources in columns.items():
+            keys = sorted(labels[field])
+            key_ids = {key: i for i, key in enumerate(keys)}
+            grouped = []
+            for codes, column_keys in sources:
+                # Code -> value id; the trailing -1 also serves missing values (code -1)
+                lookup = np.array([key_ids[k] if k else -1 for k in column_keys] + [-1], dtype=np.int64)
+                value_ids = lookup[codes]
+                docs = np.flatnonzero(value_ids >= 0)
+                grouped.append(value_ids[docs] * stride + docs)
+            # Grouped by value, docs ascending; a doc named in two source columns keeps one posting
+            grouped = np.unique(np.concatenate(grouped))
+            offsets = np.concatenate(([0], np.cumsum(np.bincount(grouped // stride, minlength=len(keys)))))
+            doc_ids = (grouped % stride).astype(np.int32)
+
+            dense = np.flatnonzero(np.diff(offsets) >= max(1, num_docs * DENSE_FRACTION))
+            bitmaps = np.zeros((len(dense), (num_docs + 7) // 8), dtype=np.uint8)
+            for row, value in enumerate(dense):
+                mask = np.zeros(num_docs, dtype=bool)
+                mask[doc_ids[offsets[value]:offsets[value + 1]]] = True
+                bitmaps[row] = np.packbits(mask)
+            fields[field] = Facet(keys, [labels[field][k] for k in keys], offsets.astype(np.int64), doc_ids,
+                                  dense.astype(np.int32), bitmaps)
+
+        # Unrated (NaN) sorts last; ties keep database order
+        rating_order = np.argsort(-ratings, kind='stable').astype(np.int32)
+        rating_rank = np.empty(num_docs, dtype=np.int32)
+        rating_rank[rating_order] = np.arange(num_docs, dtype=np.int32)
+        return cls(fields, rating_order, rating_rank, num_docs)
+
+    def to_arrays(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        """Flatten into JSON-able metadata and named arrays"""
+        arrays = {'rating_order': self.rating_order, 'rating_rank': self.rating_rank}
+        for field, facet in self.fields.items():
+            arrays[f"{field}.keys_data"], arrays[f"{field}.keys_offsets"] = pack_strings(facet.keys)
+            arrays[f"{field}.labels_data"], arrays[f"{field}.labels_offsets"] = pack_strings(facet.labels)
+            for name in ('offsets', 'doc_ids', 'dense', 'bitmaps'):
+                arrays[f"{field}.{name}"] = getattr(facet, name)
+        return {'num_docs': self.num_docs, 'fields': list(self.fields)}, arrays
+
+    @classmethod
+    def from_arrays(cls, meta: Dict, arrays: Dict[str, np.ndarray]) -> "FacetIndex":
+        """Rebuild from to_arrays output (arrays may be memory-mapped)"""
+        fields = {
+            field: Facet(
+                keys=unpack_strings(arrays[f"{field}.keys_data"], arrays[f"{field}.keys_offsets"]),
+                labels=unpack_strings(arrays[f"{field}.labels_data"], arrays[f"{field}.labels_offsets"]),
+                offsets=arrays[f"{field}.offsets"],
+                doc_ids=arrays[f"{field}.doc_ids"],
+                dense=arrays[f"{field}.dense"],
+                bitmaps=arrays[f"{field}.bitmaps"],
+            )
+            for field in meta['fields']
+        }
+        return cls(fields, arrays['rating_order'], arrays['rating_rank'], meta['num_docs'])
+
+    def values(self, field: str) -> List[str]:
+        """Values of ``field`` as shown in the data, most common first"""
+        if field not in self.fields:
+            return []
+        facet = self.fields[field]
+        counts = np.diff(facet.offsets)
+        return [facet.labels[i] for i in np.argsort(-counts, kind='stable')[:MAX_LISTED_VALUES]]
+
+    def unknown(self, filters: Dict[str, Iterable[str]]) -> Dict[str, List[str]]:
+        """Filter values (and unsupported fields) that match nothing in the data"""
+        unknown = {}
+        for field, values in filters.items():
+            ids = self.value_ids.get(field, {})
+            missing = [value for value in values if facet_key(value) not in ids]
+            if missing:
+                unknown[field] = missing
+        return unknown
+
+    def match(self, filters: Dict[str, Iterable[str]]) -> np.ndarray:
+        """Sorted doc ids of exercises matching every field, with any listed value per field"""
+        bitmap = None
+        sparse = []
+        for field, values in filters.items():
+            if field not in self.fields:
+                return np.zeros(0, dtype=np.int32)
+            facet = self.fields[field]
+            ids = sorted({self.value_ids[field][key] for key in map(facet_key, values) if key in self.value_ids[field]})
+            if not ids:
+                return np.zeros(0, dtype=np.int32)
+            rows = [self.dense_rows[field].get(i) for i in ids]
+            if None in rows:
+                sparse.append([facet.doc_ids[facet.offsets[i]:facet.offsets[i + 1]] for i in ids])
+                continue
+            field_bitmap = np.bitwise_or.reduce(facet.bitmaps[rows], axis=0)
+            bitmap = field_bitmap if bitmap is None else bitmap & field_bitmap
+
+        if not sparse:
+            if bitmap is None:
+                return np.arange(self.num_docs, dtype=np.int32)
+            return np.flatnonzero(np.unpackbits(bitmap, count=self.num_docs)).astype(np.int32)
+
+        # Rare values: start from the smallest field and look the candidates up in the rest
+        sparse.sort(key=lambda postings: sum(len(p) for p in postings))
+        first = sparse[0]
+        result = np.asarray(first[0]) if len(first) == 1 else np.unique(np.concatenate(first))
+        for postings in sparse[1:]:
+            keep = np.zeros(len(result), dtype=bool)
+            for posting in postings:
+                if len(posting):
+                    found = np.minimum(np.searchsorted(posting, result), len(posting) - 1)
+                    keep |= posting[found] == result
+            result = result[keep]
+        if bitmap is not None:
+            result = result[_bits_set(bitmap, result)]
+        return result
+
+    def by_rating(self, doc_ids: np.ndarray, limit: Optional[int] = None) -> np.ndarray:
+        """``doc_ids`` best rated first, keeping the first ``limit``"""
+        doc_ids = np.asarray(doc_ids)
+        ranks = self.rating_rank[doc_ids]
+        if limit is not None and len(doc_ids) > limit:
+            keep = np.argpartition(ranks, limit - 1)[:limit] if limit > 0 else np.zeros(0, dtype=np.int64)
+            doc_ids, ranks = doc_ids[keep], ranks[keep]
+        return doc_ids[np.argsort(ranks, kind='stable')]
@@ -0,0 +1,226 @@
+import bisect
+import heapq
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from exercise_store import pack_strings, unpack_strings
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Field boosts applied to term frequencies before BM25 saturation (BM25F)
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'bodypart': 2.0,
+    'equipment': 2.0,
+    'level': 1.0,
+    'type': 1.0,
+    'description': 1.0,
+}
+
+# Column names seen in the source datasets that map onto the fields above
+FIELD_ALIASES = {
+    'title': 'name',
+    'exercise': 'name',
+    'desc': 'description',
+    'body part': 'bodypart',
+}
+
+# Fields that never carry useful search text
+SKIPPED_FIELDS = {'rating', 'ratingdesc'}
+
+STOPWORDS = {'a', 'an', 'and', 'for', 'in', 'of', 'on', 'or', 'the', 'to', 'with'}
+
+# Cap on vocabulary terms a single unknown query word may expand to
+MAX_PREFIX_EXPANSION = 20
+
+
+def normalize_token(token: str) -> str:
+    """Fold simple plurals so 'forearm' and 'forearms' share postings"""
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on non-alphanumerics and drop stopwords"""
+    return [normalize_token(t) for t in TOKEN_RE.findall(str(text).lower()) if t not in STOPWORDS]
+
+
+def resolve_field(key: str) -> Optional[str]:
+    """Map a dataset column name onto an indexed field, or None to skip it"""
+    key = str(key).strip().lower()
+    if key in SKIPPED_FIELDS:
+        return None
+    return FIELD_ALIASES.get(key, key)
+
+
+class ExerciseIndex:
+    """Inverted index over the exercise database with BM25F ranking.
+
+    Postings are stored CSR-style: the postings for term ``t`` live in
+    ``doc_ids[offsets[t]:offsets[t + 1]]`` with a matching slice of
+    ``impacts``, the precomputed BM25 term-frequency component for that
+    document. A query therefore only touches the postings of its own terms.
+    """
+
+    def __init__(self, vocab: List[str], offsets: np.ndarray, doc_ids: np.ndarray,
+                 impacts: np.ndarray, idf: np.ndarray, num_docs: int):
+        self.vocab = vocab
+        self.term_ids = {term: i for i, term in enumerate(vocab)}
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.impacts = impacts
+        self.idf = idf
+        self.num_docs = num_docs
+
+    @classmethod
+    def from_store(cls, store, k1: float = 1.2, b: float = 0.75) -> "ExerciseIndex":
+        """Build the index column by column from an ExerciseStore"""
+        num_docs = len(store)
+        pair_docs = []
+        pair_terms = []
+        pair_weights = []
+
+        for column, codes, uniques in store.iter_columns():
+            field = resolve_field(column)
+            if field is None:
+                continue
+            weight = FIELD_WEIGHTS.get(field, 1.0)
+
+            # Tokenize each distinct value once, then fan tokens out by code
+            unique_tokens = [tokenize(u) for u in uniques]
+            token_counts = np.fromiter((len(t) for t in unique_tokens), dtype=np.int64, count=len(unique_tokens))
+            flat_tokens = np.array([t for tokens in unique_tokens for t in tokens], dtype=object)
+            token_offsets = np.concatenate(([0], np.cumsum(token_counts)))
+
+            docs = np.flatnonzero(codes >= 0)
+            doc_codes = codes[docs]
+            counts = token_counts[doc_codes]
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            starts = np.repeat(token_offsets[doc_codes] - (np.cumsum(counts) - counts), counts)
+            pair_docs.append(np.repeat(docs, counts))
+            pair_terms.append(flat_tokens[starts + np.arange(total)])
+            pair_weights.append(np.full(total, weight))
+
+        return cls._from_pairs(pair_docs, pair_terms, pair_weights, num_docs, k1, b)
+
+    @classmethod
+    def _from_pairs(cls, pair_docs: List[np.ndarray], pair_terms: List[np.ndarray],
+                    pair_weights: List[np.ndarray], num_docs: int, k1: float, b: float) -> "ExerciseIndex":
+        """Aggregate (doc, term, weight) occurrences into BM25 postings"""
+        if not pair_docs:
+            return cls([], np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32),
+                       np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32), num_docs)
+
+        docs = np.concatenate(pair_docs)
+        weights = np.concatenate(pair_weights)
+        term_ids, vocab = pd.factorize(np.concatenate(pair_terms), sort=True)
+        vocab = [str(term) for term in vocab]
+
+        doc_lengths = np.bincount(docs, weights=weights, minlength=num_docs)
+        avg_length = doc_lengths.mean() if num_docs else 0.0
+
+        # Sum weighted term frequency per (term, doc); the key order groups postings by term
+        keys, inverse = np.unique(term_ids * np.int64(num_docs) + docs, return_inverse=True)
+        tf = np.bincount(inverse, weights=weights)
+        posting_terms = keys // num_docs
+        posting_docs = keys % num_docs
+
+        norm = k1 * (1 - b + b * doc_lengths[posting_docs] / avg_length) if avg_length else np.full(len(keys), k1)
+        impacts = tf * (k1 + 1) / (tf + norm)
+
+        df = np.bincount(posting_terms, minlength=len(vocab))
+        idf = np.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+        offsets = np.concatenate(([0], np.cumsum(df))).astype(np.int64)
+
+        return cls(
+            vocab=vocab,
+            offsets=offsets,
+            doc_ids=posting_docs.astype(np.int32),
+            impacts=impacts.astype(np.float32),
+            idf=idf.astype(np.float32),
+            num_docs=num_docs,
+        )
+
+    def to_arrays(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        """Flatten the index into JSON-able metadata and named arrays"""
+        vocab_data, vocab_offsets = pack_strings(self.vocab)
+        arrays = {
+            'vocab_data': vocab_data,
+            'vocab_offsets': vocab_offsets,
+            'offsets': self.offsets,
+            'doc_ids': self.doc_ids,
+            'impacts': self.impacts,
+            'idf': self.idf,
+        }
+        return {'num_docs': self.num_docs}, arrays
+
+    @classmethod
+    def from_arrays(cls, meta: Dict, arrays: Dict[str, np.ndarray]) -> "ExerciseIndex":
+        """Rebuild an index from to_arrays output (arrays may be memory-mapped)"""
+        return cls(
+            vocab=unpack_strings(arrays['vocab_data'], arrays['vocab_offsets']),
+            offsets=arrays['offsets'],
+            doc_ids=arrays['doc_ids'],
+            impacts=arrays['impacts'],
+            idf=arrays['idf'],
+            num_docs=meta['num_docs'],
+        )
+
+    def query_term_ids(self, query: str) -> List[int]:
+        """Resolve query words to term ids, expanding unknown words by prefix"""
+        term_ids = set()
+        for token in tokenize(query):
+            term_id = self.term_ids.get(token)
+            if term_id is not None:
+                term_ids.add(term_id)
+                continue
+            # Keep the old substring behaviour for partial words ("hang" -> "hangboard")
+            start = bisect.bisect_left(self.vocab, token)
+            for i in range(start, min(start + MAX_PREFIX_EXPANSION, len(self.vocab))):
+                if not self.vocab[i].startswith(token):
+                    break
+                term_ids.add(i)
+        return sorted(term_ids)
+
+    def scores(self, query: str, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """BM25 scores of every matching document as (doc_ids, scores).
+
+        ``allowed`` is a boolean mask over documents (see FacetIndex);
+        postings outside it are dropped before they are scored.
+        """
+        term_ids = self.query_term_ids(query)
+        if not term_ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+
+        docs = []
+        contributions = []
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            term_docs = self.doc_ids[start:end]
+            impacts = self.impacts[start:end]
+            if allowed is not None:
+                keep = allowed[term_docs]
+                term_docs, impacts = term_docs[keep], impacts[keep]
+            docs.append(term_docs)
+            contributions.append(impacts * self.idf[term_id])
+
+        docs = np.concatenate(docs)
+        contributions = np.concatenate(contributions)
+        unique_docs, inverse = np.unique(docs, return_inverse=True)
+        return unique_docs, np.bincount(inverse, weights=contributions)
+
+    def search(self, query: str, limit: int = 8, allowed: Optional[np.ndarray] = None) -> List[Tuple[float, int]]:
+        """Return up to ``limit`` (score, doc_id) pairs, best first"""
+        if limit <= 0:
+            return []
+        unique_docs, scores = self.scores(query, allowed)
+
+        # Ties keep database order, matching the old stable sort
+        top = heapq.nlargest(limit, zip(scores.tolist(), (-unique_docs).tolist()))
+        return [(score, -neg_doc) for score, neg_doc in top]
@@ -0,0 +1,259 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Kaggle gym columns and the exercise fields they populate
+GYM_COLUMNS = {
+    'Title': 'name',
+    'Desc': 'description',
+    'BodyPart': 'bodypart',
+    'Equipment': 'equipment',
+    'Level': 'level',
+    'Type': 'type',
+    'Rating': 'rating',
+}
+
+CLIMBING_RELEVANT_BODYPARTS = ['forearms', 'shoulders', 'back', 'core', 'abs', 'lats', 'biceps', 'chest', 'triceps']
+
+# Low-cardinality fields stored as pandas categoricals
+CATEGORICAL_FIELDS = ['bodypart', 'equipment', 'level', 'type']
+
+MAX_TEXT_LENGTH = 300
+
+
+def _gym_frame(gym_data: pd.DataFrame) -> pd.DataFrame:
+    """Filter the gym dataset to climbing-relevant rows and normalize columns"""
+    if 'BodyPart' not in gym_data.columns:
+        return pd.DataFrame(columns=list(GYM_COLUMNS.values()))
+
+    bodypart = gym_data['BodyPart'].astype(str).str.lower()
+    mask = bodypart.str.contains('|'.join(CLIMBING_RELEVANT_BODYPARTS), regex=True).to_numpy()
+    rows = gym_data.loc[mask]
+
+    frame = pd.DataFrame(index=pd.RangeIndex(len(rows)))
+    for source, field in GYM_COLUMNS.items():
+        if source not in rows.columns:
+            frame[field] = 'Unknown' if field == 'name' else ''
+            continue
+        column = rows[source].reset_index(drop=True)
+        if field == 'rating':
+            frame[field] = pd.to_numeric(column, errors='coerce')
+        elif field == 'description':
+            frame[field] = column.fillna('').astype(str).str.slice(0, MAX_TEXT_LENGTH)
+        else:
+            frame[field] = column.fillna('').astype(str)
+    return frame
+
+
+def _sheets_frame(sheets_data: pd.DataFrame) -> pd.DataFrame:
+    """Stringify and truncate every sheet column, dropping empty rows"""
+    present = sheets_data.notna()
+    frame = sheets_data.apply(lambda column: column.astype(str).str.slice(0, MAX_TEXT_LENGTH))
+    frame = frame.where(present)
+    return frame.loc[present.any(axis=1).to_numpy()].reset_index(drop=True)
+
+
+def pack_strings(values: List[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pack strings into one UTF-8 byte buffer plus an offsets array"""
+    encoded = [value.encode('utf-8') if value is not None else b'' for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def unpack_strings(data: np.ndarray, offsets: np.ndarray) -> List[str]:
+    """Inverse of pack_strings for every entry"""
+    raw = data.tobytes()
+    bounds = offsets.tolist()
+    return [raw[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(len(bounds) - 1)]
+
+
+class StringColumn:
+    """Free-text column packed into a UTF-8 buffer with offsets"""
+
+    kind = 'string'
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray, valid: np.ndarray):
+        self.data = data
+        self.offsets = offsets
+        self.valid = valid
+
+    @classmethod
+    def from_series(cls, series: pd.Series) -> "StringColumn":
+        valid = series.notna().to_numpy()
+        values = [str(v) if ok else None for v, ok in zip(series.tolist(), valid.tolist())]
+        data, offsets = pack_strings(values)
+        return cls(data, offsets, valid)
+
+    def get(self, i: int) -> Optional[str]:
+        if not self.valid[i]:
+            return None
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode('utf-8')
+
+    def factorize(self) -> Tuple[np.ndarray, List[str]]:
+        values = pd.Series(unpack_strings(self.data, self.offsets), dtype=object).where(self.valid)
+        codes, uniques = pd.factorize(values)
+        return codes, [str(u) for u in uniques]
+
+    def to_arrays(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        return {}, {'data': self.data, 'offsets': self.offsets, 'valid': self.valid}
+
+    @classmethod
+    def from_arrays(cls, meta: Dict, arrays: Dict[str, np.ndarray]) -> "StringColumn":
+        return cls(arrays['data'], arrays['offsets'], arrays['valid'])
+
+
+class CategoricalColumn:
+    """Low-cardinality column stored as integer codes into a category list"""
+
+    kind = 'categorical'
+
+    def __init__(self, codes: np.ndarray, categories: List[str]):
+        self.codes = codes
+        self.categories = categories
+
+    @classmethod
+    def from_series(cls, series: pd.Series) -> "CategoricalColumn":
+        categorical = series.astype('category')
+        return cls(categorical.cat.codes.to_numpy(), [str(c) for c in categorical.cat.categories])
+
+    def get(self, i: int) -> Optional[str]:
+        code = self.codes[i]
+        return self.categories[code] if code >= 0 else None
+
+    def factorize(self) -> Tuple[np.ndarray, List[str]]:
+        return np.asarray(self.codes), self.categories
+
+    def to_arrays(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        return {'categories': self.categories}, {'codes': self.codes}
+
+    @classmethod
+    def from_arrays(cls, meta: Dict, arrays: Dict[str, np.ndarray]) -> "CategoricalColumn":
+        return cls(arrays['codes'], meta['categories'])
+
+
+class NumericColumn:
+    """Float column with NaN for missing values"""
+
+    kind = 'numeric'
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+
+    @classmethod
+    def from_series(cls, series: pd.Series) -> "NumericColumn":
+        return cls(series.to_numpy(dtype=np.float64))
+
+    def get(self, i: int) -> Optional[float]:
+        value = float(self.values[i])
+        return None if np.isnan(value) else value
+
+    def factorize(self) -> Tuple[np.ndarray, List[str]]:
+        codes, uniques = pd.factorize(pd.Series(self.values))
+        return codes, [str(u) for u in uniques]
+
+    def to_arrays(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        return {}, {'values': self.values}
+
+    @classmethod
+    def from_arrays(cls, meta: Dict, arrays: Dict[str, np.ndarray]) -> "NumericColumn":
+        return cls(arrays['values'])
+
+
+COLUMN_KINDS = {column.kind: column for column in (StringColumn, CategoricalColumn, NumericColumn)}
+
+
+class ExerciseStore:
+    """Columnar exercise database.
+
+    Gym rows come first and sheet rows after, so the row position doubles
+    as the document id used by the search index. Every column is backed
+    by flat NumPy arrays (no per-row Python objects), which keeps the
+    store small and lets snapshots memory-map it directly. Dicts are only
+    built for the rows a caller asks for.
+    """
+
+    def __init__(self, columns: Dict[str, object], num_rows: int):
+        self.columns = columns
+        self.num_rows = num_rows
+
+    @classmethod
+    def from_sources(cls, gym_data: Optional[pd.DataFrame], sheets_data: Optional[pd.DataFrame]) -> "ExerciseStore":
+        """Build the store from the raw gym and Google Sheets datasets"""
+        frames = []
+        if gym_data is not None:
+            frames.append(_gym_frame(gym_data))
+        if sheets_data is not None:
+            frames.append(_sheets_frame(sheets_data))
+
+        if not frames:
+            return cls({}, 0)
+
+        frame = pd.concat(frames, ignore_index=True, sort=False)
+        columns = {}
+        for name in frame.columns:
+            series = frame[name]
+            if name in CATEGORICAL_FIELDS:
+                columns[name] = CategoricalColumn.from_series(series)
+            elif pd.api.types.is_float_dtype(series.dtype):
+                columns[name] = NumericColumn.from_series(series)
+            else:
+                columns[name] = StringColumn.from_series(series)
+        return cls(columns, len(frame))
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return self.records(range(*item.indices(len(self))))
+        return self.record(item)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self.record(i)
+
+    def record(self, doc_id: int) -> Dict:
+        """Materialize one exercise as a dict, omitting missing fields"""
+        exercise = {}
+        for name, column in self.columns.items():
+            value = column.get(doc_id)
+            if value is not None:
+                exercise[name] = value
+        return exercise
+
+    def records(self, doc_ids: Iterable[int]) -> List[Dict]:
+        """Materialize several exercises, preserving the given order"""
+        return [self.record(doc_id) for doc_id in doc_ids]
+
+    def iter_columns(self) -> Iterator[Tuple[str, np.ndarray, List[str]]]:
+        """Yield (column, codes, uniques) for every column.
+
+        ``codes`` maps each row to its value in ``uniques`` (-1 for missing),
+        so callers can process each distinct value once.
+        """
+        for name, column in self.columns.items():
+            codes, uniques = column.factorize()
+            yield name, codes, uniques
+
+    def to_arrays(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        """Flatten the store into JSON-able metadata and named arrays"""
+        meta = {'num_rows': self.num_rows, 'columns': []}
+        arrays = {}
+        for i, (name, column) in enumerate(self.columns.items()):
+            column_meta, column_arrays = column.to_arrays()
+            meta['columns'].append({'name': name, 'kind': column.kind, **column_meta})
+            for key, array in column_arrays.items():
+                arrays[f"col{i}_{key}"] = array
+        return meta, arrays
+
+    @classmethod
+    def from_arrays(cls, meta: Dict, arrays: Dict[str, np.ndarray]) -> "ExerciseStore":
+        """Rebuild a store from to_arrays output (arrays may be memory-mapped)"""
+        columns = {}
+        for i, column_meta in enumerate(meta['columns']):
+            prefix = f"col{i}_"
+            column_arrays = {key[len(prefix):]: array for key, array in arrays.items() if key.startswith(prefix)}
+            columns[column_meta['name']] = COLUMN_KINDS[column_meta['kind']].from_arrays(column_meta, column_arrays)
+        return cls(columns, meta['num_rows'])
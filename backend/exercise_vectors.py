@@ -0,0 +1,148 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from exercise_index import ExerciseIndex
+
+# Latent dimensions kept by the LSA projection
+DEFAULT_DIMS = 96
+
+# Postings multiplied per step in the sparse products, bounding temporary memory
+SPMM_CHUNK = 1 << 16
+
+
+def _spmm(rows: np.ndarray, cols: np.ndarray, values: np.ndarray, dense: np.ndarray, num_rows: int) -> np.ndarray:
+    """Sparse (rows, cols, values) triplets times a dense matrix; ``rows`` must be sorted"""
+    out = np.zeros((num_rows, dense.shape[1]))
+    for start in range(0, len(rows), SPMM_CHUNK):
+        r = rows[start:start + SPMM_CHUNK]
+        products = values[start:start + SPMM_CHUNK, None] * dense[cols[start:start + SPMM_CHUNK]]
+        segments = np.flatnonzero(np.r_[True, r[1:] != r[:-1]])
+        out[r[segments]] += np.add.reduceat(products, segments, axis=0)
+    return out
+
+
+def top_k(scores: np.ndarray, limit: int) -> List[Tuple[float, int]]:
+    """Up to ``limit`` positive (score, doc_id) pairs, best first, ties by doc id"""
+    if limit <= 0:
+        return []
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > limit:
+        # Keep every doc tied with the cut-off so the tie-break stays deterministic
+        kth = np.partition(scores[candidates], len(candidates) - limit)[len(candidates) - limit]
+        candidates = candidates[scores[candidates] >= kth]
+    order = np.lexsort((candidates, -scores[candidates]))[:limit]
+    return [(float(scores[doc]), int(doc)) for doc in candidates[order]]
+
+
+class ExerciseVectors:
+    """Latent semantic (LSA) vectors for the exercise database.
+
+    The BM25-weighted document-term matrix already held by ExerciseIndex is
+    factorized with a randomized truncated SVD, entirely in NumPy and
+    offline. Exercises are stored as unit-length float32 rows of
+    ``doc_vectors``; a query is folded in through ``components`` from its
+    terms' idf weights. Words that co-occur across exercises ("grip",
+    "forearm", "hangboard") land close together, so a query matches
+    exercises that never use its exact words. Scoring a batch of queries is
+    one matrix product followed by a partial sort per query.
+    """
+
+    def __init__(self, components: np.ndarray, doc_vectors: np.ndarray):
+        self.components = components
+        self.doc_vectors = doc_vectors
+
+    @property
+    def dims(self) -> int:
+        return self.components.shape[1]
+
+    @classmethod
+    def from_index(cls, index: ExerciseIndex, dims: int = DEFAULT_DIMS, oversample: int = 10,
+                   power_iters: int = 2, seed: int = 0) -> "ExerciseVectors":
+        """Factorize the index's document-term matrix (Halko et al. randomized SVD)"""
+        num_terms = len(index.vocab)
+        num_docs = index.num_docs
+        rank = min(dims + oversample, num_terms, num_docs)
+        if rank == 0:
+            return cls(np.zeros((num_terms, 0), dtype=np.float32), np.zeros((num_docs, 0), dtype=np.float32))
+
+        # Postings come grouped by term; also keep a copy ordered by document
+        terms = np.repeat(np.arange(num_terms), np.diff(index.offsets))
+        docs = np.asarray(index.doc_ids, dtype=np.int64)
+        values = np.asarray(index.impacts, dtype=np.float64) * index.idf[terms]
+        # Unit-length documents, so long descriptions do not dominate the factors
+        norms = np.sqrt(np.bincount(docs, weights=values ** 2, minlength=num_docs))
+        values = values / norms[docs]
+        by_doc = np.argsort(docs, kind='stable')
+        doc_rows, doc_cols, doc_values = docs[by_doc], terms[by_doc], values[by_doc]
+
+        def times(dense):  # X @ dense
+            return _spmm(doc_rows, doc_cols, doc_values, dense, num_docs)
+
+        def times_transpose(dense):  # X.T @ dense
+            return _spmm(terms, docs, values, dense, num_terms)
+
+        rng = np.random.default_rng(seed)
+        basis, _ = np.linalg.qr(times(rng.standard_normal((num_terms, rank))))
+        for _ in range(power_iters):
+            projected, _ = np.linalg.qr(times_transpose(basis))
+            basis, _ = np.linalg.qr(times(projected))
+        _, _, vt = np.linalg.svd(times_transpose(basis).T, full_matrices=False)
+
+        components = vt[:dims].T
+        doc_vectors = times(components)
+        doc_vectors /= np.maximum(np.linalg.norm(doc_vectors, axis=1, keepdims=True), 1e-12)
+        return cls(components.astype(np.float32), doc_vectors.astype(np.float32))
+
+    def to_arrays(self) -> Tuple[Dict, Dict[str, np.ndarray]]:
+        return {'dims': self.dims}, {'components': self.components, 'doc_vectors': self.doc_vectors}
+
+    @classmethod
+    def from_arrays(cls, meta: Dict, arrays: Dict[str, np.ndarray]) -> "ExerciseVectors":
+        """Rebuild from to_arrays output (arrays may be memory-mapped)"""
+        return cls(arrays['components'], arrays['doc_vectors'])
+
+    def embed(self, index: ExerciseIndex, queries: List[str]) -> np.ndarray:
+        """Unit-length query vectors, one row per query (zero if no word is known)"""
+        out = np.zeros((len(queries), self.dims), dtype=np.float32)
+        for i, query in enumerate(queries):
+            term_ids = index.query_term_ids(query)
+            if term_ids:
+                out[i] = index.idf[term_ids] @ self.components[term_ids]
+        out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out
+
+    def search_batch(self, index: ExerciseIndex, queries: List[str], limit: int = 8,
+                     keyword_weight: float = 0.0, docs: Optional[np.ndarray] = None) -> List[List[Tuple[float, int]]]:
+        """Top ``limit`` (score, doc_id) pairs per query.
+
+        With ``keyword_weight`` > 0 the cosine similarity is blended with the
+        query's BM25 scores, scaled to the best match, so exact keyword hits
+        still rank first among semantically close exercises. ``docs``
+        (sorted doc ids, e.g. from FacetIndex.match) restricts scoring to
+        those rows.
+        """
+        if not queries:
+            return []
+        vectors = self.doc_vectors if docs is None else self.doc_vectors[docs]
+        scores = vectors @ self.embed(index, queries).T
+        if keyword_weight > 0:
+            scores = np.maximum(scores, 0) * (1 - keyword_weight)
+            allowed = None
+            if docs is not None:
+                allowed = np.zeros(index.num_docs, dtype=bool)
+                allowed[docs] = True
+            for j, query in enumerate(queries):
+                matched, keyword = index.scores(query, allowed)
+                if len(matched):
+                    rows = matched if docs is None else np.searchsorted(docs, matched)
+                    scores[rows, j] += keyword_weight * keyword / keyword.max()
+        results = [top_k(scores[:, j], limit) for j in range(len(queries))]
+        if docs is not None:
+            # Rows follow ``docs``, so row order is still doc id order for tie-breaks
+            results = [[(score, int(docs[row])) for score, row in hits] for hits in results]
+        return results
+
+    def search(self, index: ExerciseIndex, query: str, limit: int = 8,
+               keyword_weight: float = 0.0, docs: Optional[np.ndarray] = None) -> List[Tuple[float, int]]:
+        return self.search_batch(index, [query], limit, keyword_weight, docs)[0]
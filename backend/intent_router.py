@@ -0,0 +1,67 @@
+import re
+from typing import Dict, NamedTuple, Optional
+
+from response_cache import normalize_message
+
+
+class Intent(NamedTuple):
+    """A lookup answered from one read tool, without the model"""
+    tool: str
+    tool_input: Dict
+
+
+# Optional lead-in of a lookup: "show me", "what is", "can you list"...
+_ASK = r"(?:(?:can|could) you\s+)?(?:please\s+)?"
+_LOOKUP = (_ASK + r"(?:(?:show|list|get|give|tell|display|check|pull up|what(?:['’]s| is| are))"
+           r"(?:\s+me)?\s+)?(?:all\s+)?(?:of\s+)?")
+
+_TRAINING_LOAD = re.compile(
+    r"^" + _LOOKUP + r"(?:my\s+)?(?:current\s+)?"
+    r"(?:acwr|training load|training load and acwr|acute:?\s*chronic(?: workload)? ratio|workload|load)$"
+)
+_WORKOUTS = re.compile(
+    r"^(?:" + _LOOKUP + r"my\s+(?:past\s+|saved\s+|previous\s+|recent\s+)?workouts"
+    r"|what workouts do i have|which workouts do i have)$"
+)
+_EXERCISES = (
+    # "find hangboard exercises", "show me some core exercises"
+    re.compile(r"^" + _ASK + r"(?:find|search(?: for)?|look up|lookup|show|list|give|suggest)(?:\s+me)?\s+"
+               r"(?:some\s+|a few\s+)?(?P<query>[a-z0-9][a-z0-9' -]{1,60}?)\s+exercises$"),
+    # "exercises for forearms", "find exercises to strengthen fingers"
+    re.compile(r"^" + _ASK + r"(?:(?:find|search(?: for)?|look up|show|list|give|suggest)(?:\s+me)?\s+)?"
+               r"(?:some\s+|a few\s+)?exercises\s+(?:for|targeting|to (?:train|work|strengthen|improve))\s+"
+               r"(?:my\s+)?(?P<query>[a-z0-9][a-z0-9' -]{1,60})$"),
+)
+# Searches that are really part of a plan go to the model
+_NOT_A_SEARCH = re.compile(r"\b(?:plan|program|programme|routine|schedule|week|session|workout|then|my)\b")
+
+# Requests that plan, write or reason over several steps keep the full model
+_FULL_MODEL_TERMS = re.compile(
+    r"\b(?:plan|program|programme|schedule|periodi[sz]|build|create|design|make|log|add|save|record|write|week"
+    r"|month|cycle|phase|block|routine|session|workout|progress|progression|compare|analy[sz]e|injur\w*|pain)\b"
+)
+FAST_MODEL_MAX_WORDS = 20
+
+
+def match_intent(message: str) -> Optional[Intent]:
+    """The lookup a message asks for, or None when it needs the model.
+
+    Rules match the whole (normalized) message, so anything beyond a bare
+    lookup, like "show my ACWR and plan my week", falls through.
+    """
+    text = normalize_message(message)
+    if _TRAINING_LOAD.match(text):
+        return Intent("get_training_load", {})
+    if _WORKOUTS.match(text):
+        return Intent("lookup_workouts", {})
+    for pattern in _EXERCISES:
+        found = pattern.match(text)
+        if found and not _NOT_A_SEARCH.search(found["query"]):
+            return Intent("search_exercises", {"query": found["query"].strip(), "limit": 8})
+    return None
+
+
+def needs_full_model(message: str) -> bool:
+    """Whether a message asks for planning or writes, or is too long to trust to the fast model tier"""
+    text = normalize_message(message)
+    return len(text.split()) > FAST_MODEL_MAX_WORDS or _FULL_MODEL_TERMS.search(text) is not None
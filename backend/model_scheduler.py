@@ -0,0 +1,301 @@
+import asyncio
+import random
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+import anthropic
+
+from telemetry import MODEL_CONCURRENCY_LIMIT, MODEL_QUEUE_SECONDS, MODEL_QUEUED, MODEL_REJECTED, MODEL_RETRIES
+
+# The account is over its rate limit (429) or the API is overloaded (529): every caller backs off
+BACKOFF_STATUSES = (429, 529)
+# Transient upstream failures: only the failed call is retried
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# Backoff when the API gives no retry-after, doubled per attempt
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+
+
+class ModelOverloaded(Exception):
+    """No model capacity within the wait limits; the client should retry after ``retry_after`` seconds"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def retry_after(error: Exception) -> Optional[float]:
+    """Seconds from a response's retry-after-ms or retry-after header (delta or HTTP date)"""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class _Waiter:
+    def __init__(self, future: asyncio.Future, key: Hashable, tokens: int, continuing: bool):
+        self.future = future
+        self.key = key
+        self.tokens = tokens
+        self.continuing = continuing
+        self.enqueued = time.monotonic()
+
+
+class ModelScheduler:
+    """Process-wide admission control for Messages API calls.
+
+    At most ``concurrency`` calls run at once, and with
+    ``tokens_per_minute`` the estimated tokens of the calls started in
+    any minute stay under that budget (a token bucket, corrected with
+    the usage each response reports). Callers waiting for a slot are
+    queued per ``key`` and served round-robin, so one conversation cannot
+    starve the others; calls continuing a turn go before calls starting
+    one, so turns already under way finish instead of every turn slowing
+    down together. The queue is bounded in depth and in wait time; past
+    either, ``ModelOverloaded`` is raised instead of letting latency grow
+    without bound.
+
+    A 429 or 529 pauses every call until its retry-after has passed and
+    halves the concurrency actually used, which then grows back by about
+    one slot per round of successful calls, so retries do not arrive as
+    one burst that is rate limited again. 5xx and connection errors
+    retry only the failed call. All of this is asyncio state, used from
+    one event loop.
+    """
+
+    def __init__(self, concurrency: int = 8, tokens_per_minute: int = 0, queue_limit: int = 64,
+                 queue_timeout: float = 30.0, max_retries: int = 3):
+        self.concurrency = max(1, concurrency)
+        self.tokens_per_minute = tokens_per_minute
+        # 0: unbounded
+        self.queue_limit = queue_limit
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        # Concurrency in use: ``concurrency`` until rate limited
+        self.limit = float(self.concurrency)
+        self.active = 0
+        self.paused_until = 0.0
+        self._tokens = float(tokens_per_minute)
+        self._refilled = time.monotonic()
+        # Continuing turns, then new ones; each an LRU of per-key FIFOs
+        self._queues: Tuple["OrderedDict[Hashable, Deque[_Waiter]]", ...] = (OrderedDict(), OrderedDict())
+        self._waiting = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        MODEL_CONCURRENCY_LIMIT.set(self.limit)
+
+    @property
+    def waiting(self) -> int:
+        return self._waiting
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        if self.tokens_per_minute > 0:
+            self._tokens = min(float(self.tokens_per_minute),
+                               self._tokens + (now - self._refilled) * self.tokens_per_minute / 60)
+        self._refilled = now
+
+    def _retry_hint(self) -> float:
+        """Rough seconds until a new caller could get a slot, for Retry-After"""
+        return max(1.0, self.paused_until - time.monotonic(), min(self.queue_timeout, 5.0))
+
+    def admit(self) -> None:
+        """Raise ModelOverloaded now if a new caller would be turned away anyway"""
+        if self.queue_limit and self._waiting >= self.queue_limit:
+            MODEL_REJECTED.inc(reason="queue_full")
+            raise ModelOverloaded("Too many requests are waiting for the model", self._retry_hint())
+        pause = self.paused_until - time.monotonic()
+        if pause > self.queue_timeout:
+            MODEL_REJECTED.inc(reason="rate_limited")
+            raise ModelOverloaded("The model is rate limited", pause)
+
+    def _full(self) -> bool:
+        return self.active >= int(self.limit)
+
+    def _can_start(self, tokens: int) -> bool:
+        if self._full() or time.monotonic() < self.paused_until:
+            return False
+        if self.tokens_per_minute > 0:
+            self._refill()
+            return self._tokens >= tokens
+        return True
+
+    def _start(self, tokens: int) -> None:
+        self.active += 1
+        if self.tokens_per_minute > 0:
+            self._tokens -= tokens
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        for queues in self._queues:
+            if queues:
+                return next(iter(queues.values()))[0]
+        return None
+
+    def _dispatch(self) -> None:
+        """Grant slots to queued callers in order while capacity lasts"""
+        self._timer = None
+        while (waiter := self._next_waiter()) is not None:
+            if not self._can_start(waiter.tokens):
+                self._schedule_dispatch(waiter.tokens)
+                break
+            queues = self._queues[0 if waiter.continuing else 1]
+            queue = queues[waiter.key]
+            queue.popleft()
+            self._waiting -= 1
+            if queue:
+                queues.move_to_end(waiter.key)
+            else:
+                del queues[waiter.key]
+            self._start(waiter.tokens)
+            waiter.future.set_result(None)
+        MODEL_QUEUED.set(self._waiting)
+
+    def _schedule_dispatch(self, tokens: int) -> None:
+        """Wake up when a pause ends or the bucket holds ``tokens``; a finishing call also wakes it"""
+        if self._full() or self._timer is not None:
+            return
+        delay = self.paused_until - time.monotonic()
+        if self.tokens_per_minute > 0 and self._tokens < tokens:
+            delay = max(delay, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+        self._timer = asyncio.get_running_loop().call_later(max(delay, 0.001), self._dispatch)
+
+    def _remove(self, waiter: _Waiter) -> None:
+        queues = self._queues[0 if waiter.continuing else 1]
+        queue = queues.get(waiter.key)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._waiting -= 1
+            if not queue:
+                del queues[waiter.key]
+            MODEL_QUEUED.set(self._waiting)
+            # It may have been the head waiter holding the others back
+            self._dispatch()
+
+    async def acquire(self, key: Hashable, tokens: int = 0, continuing: bool = False) -> None:
+        """Wait for a slot (and ``tokens`` of budget) in ``key``'s turn"""
+        if self.tokens_per_minute > 0:
+            tokens = min(tokens, self.tokens_per_minute)
+        if not self._waiting and self._can_start(tokens):
+            self._start(tokens)
+            MODEL_QUEUE_SECONDS.observe(0.0)
+            return
+        self.admit()
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), key, tokens, continuing)
+        self._queues[0 if continuing else 1].setdefault(key, deque()).append(waiter)
+        self._waiting += 1
+        MODEL_QUEUED.set(self._waiting)
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if not waiter.future.done():
+                self._remove(waiter)
+                waiter.future.cancel()
+                MODEL_REJECTED.inc(reason="wait_timeout")
+                raise ModelOverloaded("Timed out waiting for the model", self._retry_hint())
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted just as the caller went away: hand the slot and its tokens on
+                self.release(tokens, 0)
+            else:
+                self._remove(waiter)
+                waiter.future.cancel()
+            raise
+        MODEL_QUEUE_SECONDS.observe(time.monotonic() - waiter.enqueued)
+
+    def release(self, reserved: int, used: Optional[int]) -> None:
+        """Free a slot, correcting the bucket from ``reserved`` to the tokens actually ``used``.
+
+        ``used`` is None when the call failed; it then keeps its reservation.
+        """
+        self.active -= 1
+        if used is not None:
+            if self.limit < self.concurrency:
+                self.limit = min(float(self.concurrency), self.limit + 1 / self.limit)
+                MODEL_CONCURRENCY_LIMIT.set(self.limit)
+            if self.tokens_per_minute > 0:
+                self._refill()
+                self._tokens -= used - min(reserved, self.tokens_per_minute)
+        self._dispatch()
+
+    def pause(self, seconds: float) -> None:
+        """Hold every queued and new call for ``seconds``, halving the concurrency once per pause"""
+        now = time.monotonic()
+        if now >= self.paused_until:
+            self.limit = max(1.0, self.limit / 2)
+            MODEL_CONCURRENCY_LIMIT.set(self.limit)
+        self.paused_until = max(self.paused_until, now + seconds)
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable, tokens: int = 0, continuing: bool = False) -> AsyncIterator[Dict]:
+        """Hold a slot for one call; set ``usage`` on the yielded dict to correct the token budget"""
+        await self.acquire(key, tokens, continuing)
+        grant = {"usage": None}
+        try:
+            yield grant
+        finally:
+            self.release(tokens, grant["usage"])
+
+    def backoff(self, error: Exception, attempt: int) -> float:
+        """Seconds the caller should sleep, outside its slot, before retrying ``error``.
+
+        Rate limits pause the whole scheduler instead, so for those the
+        caller just queues again (0 is returned). Raises ``error`` when it
+        is not retryable, and ModelOverloaded once retries run out.
+        """
+        status = getattr(error, "status_code", None)
+        if isinstance(error, anthropic.APIStatusError) and status not in BACKOFF_STATUSES + RETRY_STATUSES:
+            raise error
+        if not isinstance(error, (anthropic.APIStatusError, anthropic.APIConnectionError)):
+            raise error
+
+        hinted = retry_after(error)
+        delay = hinted if hinted is not None else min(MAX_BACKOFF, BASE_BACKOFF * 2 ** attempt)
+        delay += random.uniform(0, 0.25 * BASE_BACKOFF)
+        reason = str(status) if status else "connection"
+        if status in BACKOFF_STATUSES:
+            self.pause(delay)
+        if attempt >= self.max_retries or delay > self.queue_timeout:
+            MODEL_REJECTED.inc(reason="rate_limited" if status in BACKOFF_STATUSES else "upstream_error")
+            raise ModelOverloaded(f"The model is unavailable ({reason})", delay) from error
+        MODEL_RETRIES.inc(reason=reason)
+        return 0.0 if status in BACKOFF_STATUSES else delay
+
+    async def call(self, key: Hashable, tokens: int, request: Callable[[], Awaitable], continuing: bool = False):
+        """Run ``request()`` in a slot, retrying rate limits and transient errors; returns its response"""
+        for attempt in range(self.max_retries + 1):
+            # A retried call has waited its turn once already
+            async with self.slot(key, tokens, continuing or attempt > 0) as grant:
+                try:
+                    response = await request()
+                except (anthropic.APIStatusError, anthropic.APIConnectionError) as e:
+                    # Inside the slot, so a rate-limit pause is in place before the slot is handed on
+                    delay = self.backoff(e, attempt)
+                else:
+                    grant["usage"] = usage_tokens(response.usage)
+                    return response
+            await asyncio.sleep(delay)
+
+
+def usage_tokens(usage) -> int:
+    """Tokens a response counts against rate limits: input, cache writes and output (cache reads are free)"""
+    return sum(
+        getattr(usage, key, 0) or 0
+        for key in ("input_tokens", "cache_creation_input_tokens", "output_tokens")
+    )
@@ -0,0 +1,118 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+
+def normalize_message(message: str) -> str:
+    """Case, spacing and trailing punctuation folded, so trivially different phrasings share a key"""
+    return " ".join(message.casefold().split()).rstrip("?!. ")
+
+
+class CachedReply(NamedTuple):
+    """A finished first turn, reusable by any new conversation asking the same thing"""
+    reply: str
+    # The turn's messages, ending with the reply, committed as the new conversation's history
+    messages: List[Dict]
+    # Version of the data each tool call read (see AsyncClimbingCoachSystem.read_versions);
+    # None when the reply must not be reused
+    versions: Optional[Dict[str, str]]
+
+
+class ResponseCache:
+    """Bounded LRU of replies; entries also expire ``ttl`` seconds after they are stored.
+
+    Entries are not pushed out when data changes. Callers compare
+    ``versions`` with the current data on every hit and ``discard`` stale
+    entries, which also catches changes made outside this process.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[float, CachedReply]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl > 0
+
+    def get(self, key: Hashable) -> Optional[CachedReply]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Hashable, value: CachedReply) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class FlightAbandoned(Exception):
+    """Raised to callers sharing a computation whose owner stopped before finishing it"""
+
+
+class SingleFlight:
+    """Runs one computation per key at a time; concurrent callers share its result.
+
+    The computation runs as its own task, so a caller that goes away (a
+    client disconnect cancelling its request) does not cancel it for the
+    others still waiting. A caller that must run the computation itself,
+    such as a streamed reply, can ``lead`` it instead; if it stops early,
+    the callers sharing it get FlightAbandoned.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable]) -> Tuple[object, bool]:
+        """Result of ``compute()`` for ``key``, and whether it was shared with an earlier caller"""
+        task = self._calls.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def pending(self, key: Hashable) -> Optional[asyncio.Future]:
+        """The in-flight computation for ``key``, if any"""
+        return self._calls.get(key)
+
+    def lead(self, key: Hashable) -> asyncio.Future:
+        """Register a computation the caller runs itself; it must resolve the returned future.
+
+        Check ``pending`` first: the future replaces any computation in flight.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    def _finish(self, key: Hashable, task: asyncio.Future) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller went away
+            task.exception()
+
+    def __len__(self) -> int:
+        return len(self._calls)
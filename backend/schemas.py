@@ -0,0 +1,43 @@
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel, Field, ValidationError, field_validator
+
+
+class WorkoutExercise(BaseModel):
+    """One exercise within a workout, matching the Prisma Exercise model"""
+    name: str = Field(min_length=1)
+    sets: int = Field(ge=0)
+    reps: Optional[int] = Field(default=None, ge=0)
+    duration: Optional[int] = Field(default=None, ge=0, description="seconds")
+    rest: Optional[int] = Field(default=None, ge=0, description="seconds")
+
+
+class WorkoutCreate(BaseModel):
+    """Body accepted by POST /api/workouts"""
+    name: str = Field(min_length=1)
+    description: Optional[str] = None
+    userId: Optional[str] = None
+    scheduledDate: Optional[str] = None
+    exercises: List[WorkoutExercise] = Field(default_factory=list)
+
+    @field_validator("name")
+    @classmethod
+    def name_not_blank(cls, value: str) -> str:
+        if not value.strip():
+            raise ValueError("name must not be blank")
+        return value.strip()
+
+    @field_validator("scheduledDate")
+    @classmethod
+    def iso_date(cls, value: Optional[str]) -> Optional[str]:
+        if value:
+            datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return value or None
+
+
+def format_validation_error(error: ValidationError) -> str:
+    """Flatten pydantic errors into one line the model can act on"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in e['loc']) or 'input'}: {e['msg']}" for e in error.errors()
+    )
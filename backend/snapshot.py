@@ -0,0 +1,269 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+import requests
+
+from exercise_facets import FacetIndex
+from exercise_index import ExerciseIndex
+from exercise_store import ExerciseStore
+from exercise_vectors import ExerciseVectors
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent builds are not coordinated
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout of the store, index, vectors or facets changes
+SNAPSHOT_VERSION = 3
+
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.build.lock'
+
+
+def file_sha256(path: str) -> str:
+    """Hash a file's contents in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class SourceFingerprints:
+    """Detects changes to the exercise sources without re-reading unchanged ones.
+
+    Local files are fingerprinted by mtime and size, falling back to a
+    content hash when those change. The Google Sheets URL is trusted for
+    ``sheets_ttl`` seconds, then revalidated with a conditional request
+    (ETag / Last-Modified) when the server supports it, or by hashing the
+    export otherwise. An export downloaded because it changed is kept
+    until ``take_body`` hands it to the rebuild, so the sheet is not
+    downloaded twice.
+    """
+
+    def __init__(self, sheets_ttl: float = 3600.0, timeout: float = 10.0):
+        self.sheets_ttl = sheets_ttl
+        self.timeout = timeout
+        # url -> body of its last changed export, until the rebuild takes it
+        self._bodies: Dict[str, bytes] = {}
+
+    def take_body(self, url: str) -> Optional[bytes]:
+        """The export fetched by the last ``url`` fingerprint that found it changed, once"""
+        return self._bodies.pop(url, None)
+
+    def file(self, path: str, previous: Optional[Dict] = None) -> Dict:
+        """Fingerprint a local source, reusing the previous hash if stat is unchanged"""
+        if not path or not os.path.exists(path):
+            return {'path': path, 'missing': True}
+        stat = os.stat(path)
+        fingerprint = {'path': path, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+        if previous and previous.get('mtime_ns') == stat.st_mtime_ns and previous.get('size') == stat.st_size:
+            fingerprint['sha256'] = previous.get('sha256')
+        else:
+            fingerprint['sha256'] = file_sha256(path)
+        return fingerprint
+
+    def url(self, url: str, previous: Optional[Dict] = None, max_age: Optional[float] = None) -> Dict:
+        """Fingerprint a remote CSV export; ``max_age`` overrides ``sheets_ttl``"""
+        if not url:
+            return {'url': url}
+
+        now = time.time()
+        max_age = self.sheets_ttl if max_age is None else max_age
+        if previous and previous.get('url') == url and now - previous.get('checked_at', 0) < max_age:
+            return previous
+
+        headers = {}
+        if previous and previous.get('url') == url:
+            if previous.get('etag'):
+                headers['If-None-Match'] = previous['etag']
+            if previous.get('last_modified'):
+                headers['If-Modified-Since'] = previous['last_modified']
+        try:
+            response = requests.get(url, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            logger.warning("Could not revalidate %s: %s", url, e)
+            # Keep serving the snapshot rather than failing startup on a flaky network
+            return previous or {'url': url, 'unavailable': True}
+
+        if response.status_code == 304 and previous:
+            return {**previous, 'checked_at': now}
+        sha256 = hashlib.sha256(response.content).hexdigest()
+        if response.ok and not (previous and previous.get('sha256') == sha256):
+            self._bodies[url] = response.content
+        else:
+            self._bodies.pop(url, None)
+        return {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'sha256': sha256,
+            'checked_at': now,
+        }
+
+    def sources(self, sources: Dict[str, str], previous: Optional[Dict] = None,
+                max_age: Optional[float] = None) -> Dict[str, Dict]:
+        """Fingerprint every source; http(s) locations under keys ending in ``_url`` are treated as URLs"""
+        previous = previous or {}
+        fingerprints = {}
+        for key, location in sources.items():
+            if key.endswith('_url') and (not location or location.startswith(('http://', 'https://'))):
+                fingerprints[key] = self.url(location, previous.get(key), max_age)
+            else:
+                fingerprints[key] = self.file(location, previous.get(key))
+        return fingerprints
+
+    @staticmethod
+    def same(a: Optional[Dict[str, Dict]], b: Optional[Dict[str, Dict]]) -> bool:
+        """Compare fingerprints on identity and content, ignoring check times"""
+        if a is None or b is None or a.keys() != b.keys():
+            return False
+        for key in a:
+            left, right = a[key], b[key]
+            if left.get('path', left.get('url')) != right.get('path', right.get('url')):
+                return False
+            if left.get('missing') != right.get('missing') or left.get('sha256') != right.get('sha256'):
+                return False
+        return True
+
+
+class SnapshotCache:
+    """On-disk snapshot of the processed exercise store, search index, vectors and facets.
+
+    A snapshot is a directory of ``.npy`` arrays plus a ``manifest.json``
+    recording the fingerprints (see SourceFingerprints) of the sources it
+    was built from. Arrays are memory-mapped on load, so a warm start costs
+    a few ``open`` calls instead of re-reading the CSVs and rebuilding the
+    index, and server workers mapping the same snapshot share one copy in
+    the page cache.
+    """
+
+    def __init__(self, directory: str, sheets_ttl: float = 3600.0, timeout: float = 10.0,
+                 fingerprints: Optional[SourceFingerprints] = None):
+        self.directory = directory
+        self.fingerprints = fingerprints or SourceFingerprints(sheets_ttl, timeout)
+
+    def _read_manifest(self) -> Optional[Dict]:
+        try:
+            with open(os.path.join(self.directory, MANIFEST_NAME)) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('version') != SNAPSHOT_VERSION:
+            return None
+        return manifest
+
+    def fingerprint_sources(self, sources: Dict[str, str], previous: Optional[Dict] = None) -> Dict[str, Dict]:
+        return self.fingerprints.sources(sources, previous)
+
+    @contextmanager
+    def build_lock(self) -> Iterator[None]:
+        """Hold an exclusive lock on the snapshot directory across processes.
+
+        Workers that find the snapshot stale build under it, so the first
+        one builds and saves while the rest wait and then map its arrays.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, LOCK_NAME), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def load(self, sources: Dict[str, str]) -> Tuple[Optional[Tuple[ExerciseStore, ExerciseIndex, ExerciseVectors, FacetIndex]], Dict[str, Dict]]:
+        """Return ((store, index, vectors, facets), fingerprints), or (None, fingerprints) when stale"""
+        manifest = self._read_manifest()
+        previous = manifest.get('sources') if manifest else None
+        fingerprints = self.fingerprint_sources(sources, previous)
+        if manifest is None or not SourceFingerprints.same(previous, fingerprints):
+            return None, fingerprints
+
+        data = self._map(manifest)
+        if data is not None and fingerprints != previous:
+            # Refresh stat/TTL bookkeeping so the next start skips hashing
+            self._write_manifest({**manifest, 'sources': fingerprints})
+        return data, fingerprints
+
+    def open(self) -> Optional[Tuple[ExerciseStore, ExerciseIndex, ExerciseVectors, FacetIndex]]:
+        """Map the current snapshot without checking its sources, e.g. right after save()"""
+        manifest = self._read_manifest()
+        return self._map(manifest) if manifest else None
+
+    def _map(self, manifest: Dict) -> Optional[Tuple[ExerciseStore, ExerciseIndex, ExerciseVectors, FacetIndex]]:
+        data_dir = os.path.join(self.directory, manifest['data_dir'])
+        try:
+            arrays = {
+                name: np.load(os.path.join(data_dir, f"{name}.npy"), mmap_mode='r')
+                for name in manifest['arrays']
+            }
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable exercise snapshot: %s", e)
+            return None
+
+        store = ExerciseStore.from_arrays(manifest['store'], {
+            k[len('store.'):]: v for k, v in arrays.items() if k.startswith('store.')
+        })
+        index = ExerciseIndex.from_arrays(manifest['index'], {
+            k[len('index.'):]: v for k, v in arrays.items() if k.startswith('index.')
+        })
+        vectors = ExerciseVectors.from_arrays(manifest['vectors'], {
+            k[len('vectors.'):]: v for k, v in arrays.items() if k.startswith('vectors.')
+        })
+        facets = FacetIndex.from_arrays(manifest['facets'], {
+            k[len('facets.'):]: v for k, v in arrays.items() if k.startswith('facets.')
+        })
+        return store, index, vectors, facets
+
+    def save(self, fingerprints: Dict[str, Dict], store: ExerciseStore, index: ExerciseIndex,
+             vectors: ExerciseVectors, facets: FacetIndex) -> None:
+        """Write a new snapshot and atomically point the manifest at it"""
+        store_meta, store_arrays = store.to_arrays()
+        index_meta, index_arrays = index.to_arrays()
+        vectors_meta, vectors_arrays = vectors.to_arrays()
+        facets_meta, facets_arrays = facets.to_arrays()
+        arrays = {f"store.{k}": v for k, v in store_arrays.items()}
+        arrays.update({f"index.{k}": v for k, v in index_arrays.items()})
+        arrays.update({f"vectors.{k}": v for k, v in vectors_arrays.items()})
+        arrays.update({f"facets.{k}": v for k, v in facets_arrays.items()})
+
+        data_dir = f"data-{uuid.uuid4().hex}"
+        path = os.path.join(self.directory, data_dir)
+        os.makedirs(path, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+
+        old = self._read_manifest()
+        self._write_manifest({
+            'version': SNAPSHOT_VERSION,
+            'sources': fingerprints,
+            'data_dir': data_dir,
+            'arrays': sorted(arrays),
+            'store': store_meta,
+            'index': index_meta,
+            'vectors': vectors_meta,
+            'facets': facets_meta,
+        })
+
+        # Other processes may still have the old arrays mapped; unlinking is safe on POSIX
+        if old and old.get('data_dir') and old['data_dir'] != data_dir:
+            shutil.rmtree(os.path.join(self.directory, old['data_dir']), ignore_errors=True)
+
+    def _write_manifest(self, manifest: Dict) -> None:
+        tmp = os.path.join(self.directory, f".{MANIFEST_NAME}.{uuid.uuid4().hex}")
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, os.path.join(self.directory, MANIFEST_NAME))
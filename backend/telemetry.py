@@ -0,0 +1,309 @@
+"""Metrics, request traces and logging for the coach and api_server.
+
+Metrics live in-process and ``render_metrics()`` writes them in the
+Prometheus text exposition format for ``/metrics``, so no client library
+is needed. ``span()`` times a block of work. It adds the block to the
+current request's trace, and can feed the duration into a metric.
+Traces are logged as a single JSON line only for a sampled fraction of
+requests, plus every failed or slow one. Logging goes through a queue to
+a background thread, so code on the event loop never waits on console
+I/O.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers cached tool calls through multi-iteration chats
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_REGISTRY: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels: Dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def record(self, value: float, **labels) -> None:
+        """Record a span duration (histograms observe it, gauges are set to it)"""
+        raise NotImplementedError
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        with self._lock:
+            lines = list(self.samples())
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + lines
+
+
+class Counter(_Metric):
+    """Monotonic count; name it with a ``_total`` suffix"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def record(self, value: float, **labels) -> None:
+        self.inc(value, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def record(self, value: float, **labels) -> None:
+        self.set(value, **labels)
+
+    def value(self, **labels) -> Optional[float]:
+        return self._values.get(self._key(labels))
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (not cumulative) counts, then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def record(self, value: float, **labels) -> None:
+        self.observe(value, **labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def samples(self) -> Iterator[str]:
+        for key, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labels, key)} {count}"
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)"""
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = Counter("climbcoach_http_requests_total", "HTTP requests by route and status.",
+                        ("method", "route", "status"))
+HTTP_REQUEST_SECONDS = Histogram("climbcoach_http_request_seconds", "HTTP request duration, including streaming.",
+                                 ("method", "route"))
+MODEL_CALL_SECONDS = Histogram("climbcoach_model_call_seconds", "Claude Messages API call duration.",
+                               ("model", "streaming"))
+MODEL_TOKENS = Counter("climbcoach_model_tokens_total", "Claude tokens by kind (input, output, cache_read, cache_write).",
+                       ("model", "kind"))
+MODEL_QUEUE_SECONDS = Histogram("climbcoach_model_queue_seconds", "Time model calls waited for a scheduler slot.")
+MODEL_QUEUED = Gauge("climbcoach_model_queued", "Model calls waiting for a scheduler slot.")
+MODEL_CONCURRENCY_LIMIT = Gauge("climbcoach_model_concurrency_limit",
+                                "Concurrent model calls allowed now; lowered after rate limits, then regrown.")
+MODEL_REJECTED = Counter("climbcoach_model_rejected_total",
+                         "Model calls turned away (queue_full, wait_timeout, rate_limited, upstream_error).",
+                         ("reason",))
+MODEL_RETRIES = Counter("climbcoach_model_retries_total", "Model call retries by HTTP status or connection error.",
+                        ("reason",))
+API_REQUEST_SECONDS = Histogram("climbcoach_api_request_seconds",
+                                "SvelteKit API request duration by outcome (ok, error for 5xx and connection failures).",
+                                ("endpoint", "outcome"))
+API_RETRIES = Counter("climbcoach_api_retries_total", "SvelteKit API request retries.", ("endpoint",))
+API_CIRCUIT_OPEN = Gauge("climbcoach_api_circuit_open", "1 while the SvelteKit API circuit breaker is open, else 0.")
+TOOL_CALL_SECONDS = Histogram("climbcoach_tool_call_seconds", "Tool call duration.", ("tool",))
+TOOL_CALLS = Counter("climbcoach_tool_calls_total", "Tool calls by outcome (ok, failed, error, timeout).",
+                     ("tool", "outcome"))
+CHAT_ITERATIONS = Histogram("climbcoach_chat_iterations", "Model calls used per chat turn.",
+                            buckets=(1, 2, 3, 4, 5, 6, 8, 10))
+CHAT_TURNS = Counter("climbcoach_chat_turns_total", "Chat turns by how they ended (end_turn, max_iterations, stop).",
+                     ("outcome",))
+ROUTED_TURNS = Counter("climbcoach_routed_turns_total",
+                      "Chat turns by route (the read tool for lookups answered locally, fast_model or model).",
+                      ("route",))
+RESPONSE_CACHE = Counter("climbcoach_response_cache_total",
+                         "First-message /analyze replies by cache result (hit, miss, stale, coalesced, uncacheable).",
+                         ("result",))
+DATASET_LOAD_SECONDS = Gauge("climbcoach_dataset_load_seconds", "Seconds taken to load each dataset at startup.",
+                             ("dataset",))
+DATASET_ROWS = Gauge("climbcoach_dataset_rows", "Rows in each loaded dataset.", ("dataset",))
+EXERCISE_RELOADS = Counter("climbcoach_exercise_reloads_total", "Exercise source checks by result (unchanged, swapped, error).",
+                           ("outcome",))
+BUILD_SECONDS = Gauge("climbcoach_build_seconds", "Seconds taken by each startup build step.", ("step",))
+
+
+class Trace:
+    """Spans recorded while handling one request"""
+
+    def __init__(self, name: str, sampled: bool):
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.sampled = sampled
+        self.started = time.perf_counter()
+        self.spans: List[Dict] = []
+        self.attributes: Dict = {}
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+_parent: ContextVar[Optional[str]] = ContextVar("span", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+
+@contextmanager
+def span(name: str, metric: Optional[_Metric] = None, **attributes) -> Iterator[Dict]:
+    """Time a block as a span of the current trace.
+
+    Yields the span's attribute dict so the block can add to it. With
+    ``metric``, the duration is also recorded under the labels of the same
+    name in ``attributes``. Outside a request, only the metric is recorded.
+    """
+    trace = _trace.get()
+    span_id = uuid.uuid4().hex[:8]
+    token = _parent.set(span_id)
+    started = time.perf_counter()
+    try:
+        yield attributes
+    except BaseException as e:
+        attributes["error"] = type(e).__name__
+        raise
+    finally:
+        try:
+            _parent.reset(token)
+        except ValueError:
+            # Closed from another context, e.g. an abandoned async generator being finalized
+            pass
+        seconds = time.perf_counter() - started
+        if metric is not None:
+            metric.record(seconds, **{label: attributes.get(label, "") for label in metric.labels})
+        if trace is not None:
+            trace.spans.append({
+                "name": name,
+                "id": span_id,
+                "parent": _parent.get(),
+                "start_ms": round((started - trace.started) * 1000, 2),
+                "duration_ms": round(seconds * 1000, 2),
+                **attributes,
+            })
+
+
+@contextmanager
+def trace(name: str, **attributes) -> Iterator[Trace]:
+    """Collect spans for one request; logs them when sampled, failed or slow"""
+    current = Trace(name, random.random() < float(os.getenv("LOG_SAMPLE_RATE", "0.01")))
+    current.attributes.update(attributes)
+    token = _trace.set(current)
+    failed = False
+    try:
+        yield current
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        _trace.reset(token)
+        seconds = time.perf_counter() - current.started
+        failed = failed or current.attributes.get("status", 200) >= 500
+        if current.sampled or failed or seconds > float(os.getenv("TRACE_SLOW_SECONDS", "30")):
+            log = logger.warning if failed else logger.info
+            log("trace %s", json.dumps({
+                "trace_id": current.id,
+                "name": current.name,
+                "duration_ms": round(seconds * 1000, 2),
+                **current.attributes,
+                "spans": current.spans,
+            }, default=str))
+
+
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging(level: Optional[str] = None) -> None:
+    """Route the root logger through a queue drained by a background thread"""
+    global _listener
+    if _listener is not None:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    records = queue.SimpleQueue()
+    _listener = QueueListener(records, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+    root = logging.getLogger()
+    root.addHandler(QueueHandler(records))
+    root.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+    if root.level > logging.DEBUG:
+        # httpx logs every request at INFO, which would be a line per upstream call
+        logging.getLogger("httpx").setLevel(logging.WARNING)
@@ -0,0 +1,81 @@
+import copy
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from training_load import LoadStateStore, training_load_summary, window_fingerprint
+
+NOW = datetime(2025, 6, 1, tzinfo=timezone.utc)
+
+
+def make_sessions(count: int = 30):
+    return [
+        {
+            'id': f's{i}',
+            'name': f'Session {i}',
+            'scheduledDate': (NOW - timedelta(days=2 * i)).isoformat(),
+            'climbs': [
+                {'grade': 'V5', 'attempts': 3, 'flagBoulder': True},
+                {'grade': '5.11a', 'attempts': 1, 'flagSport': True},
+            ],
+        }
+        for i in range(count)
+    ]
+
+
+def current_summary(store: LoadStateStore, sessions):
+    """What get_training_load does with a fresh listing"""
+    summary = store.summary('me', window_fingerprint(sessions), NOW)
+    if summary is None:
+        summary = store.rebuild('me', sessions).summary(NOW)
+    return summary
+
+
+def test_unchanged_window_reuses_state():
+    store = LoadStateStore()
+    sessions = make_sessions()
+    first = current_summary(store, sessions)
+    assert store.summary('me', window_fingerprint(sessions), NOW) == first
+
+
+def test_editing_older_session_changes_acwr():
+    store = LoadStateStore()
+    sessions = make_sessions()
+    before = current_summary(store, sessions)['currentACWR']
+
+    edited = copy.deepcopy(sessions)
+    edited[10]['climbs'][0]['attempts'] = 12
+    assert store.summary('me', window_fingerprint(edited), NOW) is None
+    after = current_summary(store, edited)['currentACWR']
+
+    assert after != before
+    assert after == pytest.approx(training_load_summary(edited, NOW)['currentACWR'])
+
+
+def test_deleted_session_forces_rebuild():
+    store = LoadStateStore()
+    sessions = make_sessions()
+    current_summary(store, sessions)
+    assert store.summary('me', window_fingerprint(sessions[:5] + sessions[6:]), NOW) is None
+
+
+def test_record_keeps_fingerprint_current():
+    store = LoadStateStore()
+    sessions = make_sessions()[1:]
+    current_summary(store, sessions)
+    new = make_sessions(1)[0]
+    new['scheduledDate'] = (NOW - timedelta(hours=1)).isoformat()
+    store.record('me', new)
+    assert store.summary('me', window_fingerprint([new] + sessions), NOW) is not None
+
+
+def test_record_on_stale_state_stays_stale():
+    store = LoadStateStore()
+    sessions = make_sessions()[1:]
+    current_summary(store, sessions)
+    edited = copy.deepcopy(sessions)
+    edited[5]['climbs'][0]['grade'] = 'V8'
+    new = make_sessions(1)[0]
+    new['scheduledDate'] = (NOW - timedelta(hours=1)).isoformat()
+    store.record('me', new)
+    assert store.summary('me', window_fingerprint([new] + edited), NOW) is None
@@ -0,0 +1,113 @@
+import json
+import uuid
+from typing import Any, Dict, List, Optional
+
+from ttl_cache import TTLCache
+
+# No spaces after separators; pretty-printing costs tokens on every later call of a turn
+COMPACT_SEPARATORS = (",", ":")
+
+# Decimals kept for floats in compact results
+FLOAT_DIGITS = 3
+
+# Characters kept free for the continuation marker when a table is cut
+MORE_CHARS = 80
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=COMPACT_SEPARATORS)
+
+
+def tabulate(value: Any, tables: Optional[List[Dict]] = None) -> Any:
+    """Lists of two or more records become ``{"columns": [...], "rows": [[...], ...]}``, recursively.
+
+    Floats are rounded to FLOAT_DIGITS. Each table built is appended to
+    ``tables``, so callers can cut its rows afterwards.
+    """
+    if isinstance(value, dict):
+        return {key: tabulate(item, tables) for key, item in value.items()}
+    if isinstance(value, list):
+        items = [tabulate(item, tables) for item in value]
+        if len(items) >= 2 and all(isinstance(item, dict) for item in items):
+            columns = list(dict.fromkeys(key for item in items for key in item))
+            table = {"columns": columns, "rows": [[item.get(column) for column in columns] for item in items]}
+            if tables is not None:
+                tables.append(table)
+            return table
+        return items
+    if isinstance(value, float):
+        return round(value, FLOAT_DIGITS)
+    return value
+
+
+class ResultEncoder:
+    """Encodes tool results for the model: compact JSON, tables, and a token budget per tool.
+
+    Tools keep returning indented JSON, which direct callers and the
+    local intent router read; only what goes into the model's messages is
+    re-encoded. Lists of records are sent as column-oriented tables, so
+    each key is written once instead of once per record. A result still
+    over its tool's budget has its largest table cut to the rows that fit,
+    with ``"more": {"remaining": n, "cursor": ...}``. The model then calls
+    the same tool with that ``cursor`` for the next page, served from
+    here for ``cursor_ttl`` seconds without running the tool again. At
+    most ``max_cursors`` are kept; the oldest go first once that is reached.
+    """
+
+    def __init__(self, budgets: Dict[str, int], default_budget: int, verbose: bool = False,
+                 cursor_ttl: float = 600.0, max_cursors: int = 256):
+        self.budgets = budgets
+        self.default_budget = default_budget
+        self.verbose = verbose
+        self._pages = TTLCache(ttl=cursor_ttl, max_entries=max_cursors)
+
+    def budget(self, tool_name: str) -> int:
+        """Token budget of one result of ``tool_name``; 0 never cuts"""
+        return self.budgets.get(tool_name, self.default_budget)
+
+    def encode(self, tool_name: str, result: str, chars_per_token: float) -> str:
+        """Model-facing form of a tool's result"""
+        if self.verbose:
+            return result
+        try:
+            value = json.loads(result)
+        except ValueError:
+            return result
+        tables: List[Dict] = []
+        value = tabulate(value, tables)
+        text = _dumps(value)
+        max_chars = int(self.budget(tool_name) * chars_per_token)
+        if max_chars <= 0 or len(text) <= max_chars or not tables:
+            return text
+        table = max(tables, key=lambda t: len(_dumps(t["rows"])))
+        self._cut(tool_name, table, max_chars - (len(text) - len(_dumps(table["rows"]))))
+        return _dumps(value)
+
+    def page(self, tool_name: str, cursor: str, chars_per_token: float) -> str:
+        """Next rows of a table cut by ``encode``, under the same budget"""
+        entry = self._pages.get(cursor)
+        if entry is None or entry["tool"] != tool_name:
+            return json.dumps({
+                "success": False,
+                "error": f"Unknown or expired cursor; call {tool_name} again without a cursor"
+            }, indent=2)
+        table = {"columns": entry["columns"], "rows": entry["rows"]}
+        max_chars = int(self.budget(tool_name) * chars_per_token)
+        if max_chars > 0:
+            self._cut(tool_name, table, max_chars - len(_dumps({"columns": table["columns"], "rows": []})))
+        return _dumps(table)
+
+    def _cut(self, tool_name: str, table: Dict, row_chars: int) -> None:
+        """Keep the rows that fit in ``row_chars`` (at least one) and save the rest behind a cursor"""
+        rows = table["rows"]
+        used = 2 + MORE_CHARS
+        keep = 0
+        while keep < len(rows) and (keep == 0 or used + len(_dumps(rows[keep])) + 1 <= row_chars):
+            used += len(_dumps(rows[keep])) + 1
+            keep += 1
+        if keep == len(rows):
+            return
+        cursor = uuid.uuid4().hex[:12]
+        self._pages.set(cursor, {"tool": tool_name, "columns": table["columns"], "rows": rows[keep:]})
+        table["rows"] = rows[:keep]
+        table["more"] = {"remaining": len(rows) - keep, "cursor": cursor}
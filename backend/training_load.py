@@ -0,0 +1,534 @@
+"""Training load and ACWR (acute:chronic workload ratio), vectorized with NumPy.
+
+Mirrors ``src/lib/load.ts`` so the coach can compute the same numbers as
+the SvelteKit ``/api/training-load`` route without it:
+
+- relative intensity ``1.4 ** (grade - gMax)``
+- climb load ``max(1, attempts) * intensity * style weight``
+- EWMA with ``alpha = 2 / (span + 1)`` per session, or per day when
+  time-weighted (``1 - (1 - alpha) ** days`` between sessions)
+
+EWMA is a sequential recurrence, so it is evaluated in blocks: inside a
+block every output is a decayed weighted sum of that block's loads plus
+the decayed carry from the previous block. All decay factors are powers
+of ``1 - alpha`` with non-negative exponents, so the blocked form stays
+numerically stable for arbitrarily long histories, and every array
+operation also runs across many athletes at once.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEIGHTS = {
+    'boulder': 1.0,
+    'sport': 0.75,
+    'other': 0.8,
+}
+
+INTENSITY_BASE = 1.4
+
+# Steps per EWMA block; the block matrix is BLOCK x BLOCK per athlete
+EWMA_BLOCK = 64
+
+MS_PER_DAY = 1000 * 60 * 60 * 24
+
+# Sessions counted in totals, like /api/training-load
+WINDOW_DAYS = 180
+RECENT_DAYS = 7
+
+# Bump when the persisted LoadState layout changes
+LOAD_STATE_VERSION = 2
+
+# Window fingerprints add up per-session hashes modulo this
+FINGERPRINT_MOD = 2 ** 64
+
+V_GRADE_RE = re.compile(r"^V(\d+)$", re.IGNORECASE)
+YDS_GRADE_RE = re.compile(r"^5\.(\d{1,2})")
+# Leading number, as JavaScript's parseFloat reads it
+NUMBER_RE = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?")
+
+
+def date_ms(dates: Iterable) -> np.ndarray:
+    """Epoch milliseconds for many dates at once (naive dates read as UTC)"""
+    return pd.to_datetime(pd.Series(list(dates), dtype=object), utc=True, format='ISO8601').to_numpy(dtype='datetime64[ms]').astype(np.int64)
+
+
+def sort_by_date(items: List[Dict], key: str = 'scheduledDate') -> Tuple[List[Dict], np.ndarray]:
+    """Items in date order (stable, like Array.sort) and their epoch milliseconds"""
+    ms = date_ms(item[key] for item in items)
+    order = np.argsort(ms, kind='stable')
+    return [items[i] for i in order], ms[order]
+
+
+def parse_grade(value) -> float:
+    """Numeric grade from a number, V-scale ('V4') or YDS ('5.10a') string"""
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    s = str(value).strip().upper()
+    match = V_GRADE_RE.match(s)
+    if match:
+        return float(match.group(1))
+    match = YDS_GRADE_RE.match(s)
+    if match:
+        return float(match.group(1))
+    match = NUMBER_RE.match(s)
+    return float(match.group(0)) if match else 0.0
+
+
+def rel_intensity(grades: np.ndarray, g_max: float) -> np.ndarray:
+    """RelIntensity = 1.4^(G_i - G_max)"""
+    return np.power(INTENSITY_BASE, np.asarray(grades, dtype=np.float64) - g_max)
+
+
+def climb_loads(grades: np.ndarray, attempts: np.ndarray, flag_boulder: np.ndarray,
+                flag_sport: np.ndarray, g_max: float, weights: Dict[str, float] = DEFAULT_WEIGHTS) -> np.ndarray:
+    """Per-climb load: max(1, attempts) * relative intensity * style weight"""
+    style = np.where(flag_boulder, weights['boulder'], np.where(flag_sport, weights['sport'], weights['other']))
+    return np.maximum(1, attempts) * rel_intensity(grades, g_max) * style
+
+
+def max_grade(sessions: List[Dict]) -> Optional[float]:
+    """Highest finite grade across all climbs, or None without any"""
+    grades = np.array([parse_grade(c.get('grade')) for s in sessions for c in s.get('climbs') or []])
+    grades = grades[np.isfinite(grades)]
+    return float(grades.max()) if len(grades) else None
+
+
+def session_loads(sessions: List[Dict], g_max: Optional[float] = None,
+                  weights: Dict[str, float] = DEFAULT_WEIGHTS) -> Tuple[List[Dict], float]:
+    """Load per session, sorted by date, plus the gMax used.
+
+    Like ``computeSessionLoads``, gMax defaults to the highest grade found
+    across all sessions.
+    """
+    sessions, _ = sort_by_date(sessions)
+
+    session_index = []
+    grades = []
+    attempts = []
+    flag_boulder = []
+    flag_sport = []
+    for i, session in enumerate(sessions):
+        for climb in session.get('climbs') or []:
+            session_index.append(i)
+            grades.append(parse_grade(climb.get('grade')))
+            attempts.append(climb.get('attempts') if climb.get('attempts') is not None else 1)
+            flag_boulder.append(bool(climb.get('flagBoulder')))
+            flag_sport.append(bool(climb.get('flagSport')))
+
+    if g_max is None:
+        g_max = max_grade(sessions)
+        g_max = 0.0 if g_max is None else g_max
+
+    loads = climb_loads(
+        np.asarray(grades, dtype=np.float64),
+        np.asarray(attempts, dtype=np.float64),
+        np.asarray(flag_boulder, dtype=bool),
+        np.asarray(flag_sport, dtype=bool),
+        g_max,
+        weights,
+    )
+    totals = np.bincount(np.asarray(session_index, dtype=np.int64), weights=loads, minlength=len(sessions))
+
+    out = [
+        {'scheduledDate': s['scheduledDate'], 'name': s.get('name'), 'load': float(load)}
+        for s, load in zip(sessions, totals)
+    ]
+    return out, g_max
+
+
+def decay_days(ms: np.ndarray, time_weighted: bool) -> np.ndarray:
+    """Cumulative decay exponent per session, from sorted epoch milliseconds.
+
+    Plain EWMA decays one step per session; time-weighted EWMA decays by
+    the whole days between sessions, at least one, rounded half up like
+    ``Math.round``.
+    """
+    if not time_weighted:
+        return np.arange(len(ms), dtype=np.float64)
+    steps = np.maximum(1, np.floor(np.diff(ms) / MS_PER_DAY + 0.5))
+    return np.concatenate(([0.0], np.cumsum(steps)))
+
+
+def ewma(values: np.ndarray, days: np.ndarray, span: float, block: int = EWMA_BLOCK) -> np.ndarray:
+    """EWMA series for ``values`` shaped (T,) or (T, athletes).
+
+    ``days`` holds cumulative decay exponents with the same shape (see
+    decay_days); padding past an athlete's last session is harmless since
+    later steps never feed back into earlier ones.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    days = np.asarray(days, dtype=np.float64)
+    squeeze = values.ndim == 1
+    if squeeze:
+        values = values[:, None]
+        days = days[:, None]
+
+    steps, athletes = values.shape
+    out = np.empty_like(values)
+    if steps == 0:
+        return out[:, 0] if squeeze else out
+
+    log_keep = np.log1p(-2.0 / (span + 1))
+    # Step weights: 1 - (1 - alpha)^gap, with the first session taken as-is
+    gaps = np.diff(days, axis=0, prepend=days[:1])
+    alphas = -np.expm1(log_keep * gaps)
+    alphas[0] = 1.0
+
+    carry = np.zeros(athletes)
+    carry_day = days[0]
+    for start in range(0, steps, block):
+        end = min(start + block, steps)
+        d = days[start:end]
+        # decay[i, k] = (1 - alpha)^(d_i - d_k) for k <= i, else 0
+        exponent = d[:, None, :] - d[None, :, :]
+        lower = np.tril(np.ones((end - start, end - start), dtype=bool))[:, :, None]
+        decay = np.where(lower, np.exp(log_keep * np.maximum(exponent, 0.0)), 0.0)
+        weighted = alphas[start:end] * values[start:end]
+        out[start:end] = np.einsum('ika,ka->ia', decay, weighted) + np.exp(log_keep * (d - carry_day)) * carry
+        carry = out[end - 1]
+        carry_day = d[-1]
+
+    return out[:, 0] if squeeze else out
+
+
+def compute_acwr(session_loads: List[Dict], time_weighted: bool = False,
+                 span7: float = 7, span42: float = 42) -> Dict:
+    """ACWR from session loads; same result shape as ``computeACWR``"""
+    return compute_acwr_batch({None: session_loads}, time_weighted, span7, span42)[None]
+
+
+def compute_acwr_batch(athletes: Dict, time_weighted: bool = False,
+                       span7: float = 7, span42: float = 42) -> Dict:
+    """ACWR for many athletes at once: {athlete: session_loads} -> {athlete: result}.
+
+    Histories are padded into one (steps, athletes) matrix so each EWMA
+    block is a single array operation across every athlete.
+    """
+    results = {}
+    keys = []
+    series = []
+    for key, loads in athletes.items():
+        if not loads:
+            results[key] = {'ewma7': None, 'ewma42': None, 'acwr': None}
+            continue
+        ordered, ms = sort_by_date(loads)
+        keys.append(key)
+        series.append((
+            np.array([s.get('load') or 0.0 for s in ordered], dtype=np.float64),
+            decay_days(ms, time_weighted),
+        ))
+
+    if not keys:
+        return results
+
+    lengths = np.array([len(v) for v, _ in series])
+    steps = int(lengths.max())
+    values = np.zeros((steps, len(keys)))
+    days = np.zeros((steps, len(keys)))
+    for j, (v, d) in enumerate(series):
+        values[:len(v), j] = v
+        days[:len(d), j] = d
+        # Pad by repeating the last day so padded steps carry no extra decay
+        days[len(d):, j] = d[-1]
+
+    ewma7 = ewma(values, days, span7)
+    ewma42 = ewma(values, days, span42)
+
+    for j, key in enumerate(keys):
+        n = lengths[j]
+        acute = float(ewma7[n - 1, j])
+        chronic = float(ewma42[n - 1, j])
+        results[key] = {
+            'ewma7': acute,
+            'ewma42': chronic,
+            'acwr': acute / chronic if chronic > 0 else None,
+            'ewma7Series': ewma7[:n, j].tolist(),
+            'ewma42Series': ewma42[:n, j].tolist(),
+        }
+    return results
+
+
+def training_load_summary(sessions: List[Dict], now: Optional[datetime] = None,
+                          time_weighted: bool = False) -> Optional[Dict]:
+    """Same payload as ``trainingLoad`` from /api/training-load, or None without sessions"""
+    if not sessions:
+        return None
+
+    loads, g_max = session_loads(sessions)
+    acwr = compute_acwr(loads, time_weighted=time_weighted)
+
+    now = now or datetime.now(timezone.utc)
+    week_ago = date_ms([now - timedelta(days=RECENT_DAYS)])[0]
+    recent_mask = date_ms(s['scheduledDate'] for s in loads) >= week_ago
+    recent = [s for s, is_recent in zip(loads, recent_mask) if is_recent]
+    total = sum(s['load'] for s in loads)
+
+    return {
+        'currentACWR': acwr['acwr'],
+        'acuteLoad': acwr['ewma7'],
+        'chronicLoad': acwr['ewma42'],
+        'maxGrade': int(g_max) if float(g_max).is_integer() else g_max,
+        'recentSessionCount': len(recent),
+        'totalLoad': total,
+        'averageSessionLoad': total / len(loads) if loads else 0,
+        'recentSessions': [{'date': s['scheduledDate'], 'name': s['name'], 'load': s['load']} for s in recent],
+    }
+
+
+def session_fingerprint(session: Dict) -> int:
+    """Hash of everything a session contributes to the training load: id, date, name and climbs"""
+    climbs = sorted(
+        f"{climb.get('grade')}:{climb.get('attempts')}:{bool(climb.get('flagBoulder'))}:{bool(climb.get('flagSport'))}"
+        for climb in session.get('climbs') or []
+    )
+    key = "|".join([str(session.get('id')), str(session.get('scheduledDate')), str(session.get('name')), *climbs])
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+def window_fingerprint(sessions: List[Dict]) -> Tuple[int, int]:
+    """Session count and order-independent hash of a listing, comparable with LoadState.fingerprint"""
+    return len(sessions), sum(session_fingerprint(session) for session in sessions) % FINGERPRINT_MOD
+
+
+class LoadState:
+    """Running EWMA/ACWR for one athlete, updated in O(1) per new session.
+
+    Loads are kept relative to gMax = 0 and scaled by ``1.4 ** -gMax`` on
+    read. EWMA is linear, so a new max grade only changes that scale;
+    only a session dated before the latest one needs a rebuild. Sessions
+    from the last WINDOW_DAYS are kept for the totals and recent list,
+    with a hash of each so the window can be compared with a fresh listing.
+    """
+
+    def __init__(self, span7: float = 7, span42: float = 42):
+        self.span7 = span7
+        self.span42 = span42
+        self.ewma7: Optional[float] = None
+        self.ewma42: Optional[float] = None
+        self.g_max: Optional[float] = None
+        self.last_ms: Optional[int] = None
+        self.last_id: Optional[str] = None
+        # (epoch ms, scheduledDate, name, load at gMax = 0, session_fingerprint), oldest first
+        self.window = deque()
+        self.window_total = 0.0
+        self.window_hash = 0
+
+    @classmethod
+    def from_sessions(cls, sessions: List[Dict], span7: float = 7, span42: float = 42) -> 'LoadState':
+        """Full rebuild from raw sessions"""
+        state = cls(span7, span42)
+        if not sessions:
+            return state
+        loads, _ = session_loads(sessions, g_max=0.0)
+        acwr = compute_acwr(loads, span7=span7, span42=span42)
+        ordered, ms = sort_by_date(sessions)
+        state.ewma7 = acwr['ewma7']
+        state.ewma42 = acwr['ewma42']
+        state.g_max = max_grade(sessions)
+        state.last_ms = int(ms[-1])
+        state.last_id = ordered[-1].get('id')
+        for t, session, s in zip(ms, ordered, loads):
+            state._append(int(t), s, session_fingerprint(session))
+        return state
+
+    def apply(self, session: Dict) -> bool:
+        """Fold in a new session; False if it is back-dated and a rebuild is needed"""
+        ms = int(date_ms([session['scheduledDate']])[0])
+        if self.last_ms is not None and ms < self.last_ms:
+            return False
+
+        (entry,), _ = session_loads([session], g_max=0.0)
+        load = entry['load']
+        if self.ewma7 is None:
+            self.ewma7 = self.ewma42 = load
+        else:
+            self.ewma7 += 2.0 / (self.span7 + 1) * (load - self.ewma7)
+            self.ewma42 += 2.0 / (self.span42 + 1) * (load - self.ewma42)
+
+        grade = max_grade([session])
+        if grade is not None:
+            self.g_max = grade if self.g_max is None else max(self.g_max, grade)
+        self.last_ms = ms
+        self.last_id = session.get('id')
+        self._append(ms, entry, session_fingerprint(session))
+        return True
+
+    def _append(self, ms: int, entry: Dict, fingerprint: int) -> None:
+        self.window.append((ms, entry['scheduledDate'], entry['name'], entry['load'], fingerprint))
+        self.window_total += entry['load']
+        self.window_hash = (self.window_hash + fingerprint) % FINGERPRINT_MOD
+
+    def _prune(self, now_ms: int) -> None:
+        """Drop sessions that fell out of the window"""
+        cutoff = now_ms - WINDOW_DAYS * MS_PER_DAY
+        while self.window and self.window[0][0] < cutoff:
+            _, _, _, load, fingerprint = self.window.popleft()
+            self.window_total -= load
+            self.window_hash = (self.window_hash - fingerprint) % FINGERPRINT_MOD
+
+    def fingerprint(self, now: Optional[datetime] = None) -> Tuple[int, int]:
+        """window_fingerprint of the sessions the state holds for the window ending ``now``"""
+        self._prune(int(date_ms([now or datetime.now(timezone.utc)])[0]))
+        return len(self.window), self.window_hash
+
+    def summary(self, now: Optional[datetime] = None) -> Optional[Dict]:
+        """Same payload as training_load_summary, without touching older sessions"""
+        now = now or datetime.now(timezone.utc)
+        now_ms = int(date_ms([now])[0])
+        self._prune(now_ms)
+        if self.ewma7 is None or not self.window:
+            return None
+
+        g_max = self.g_max or 0.0
+        scale = INTENSITY_BASE ** -g_max
+        acute = self.ewma7 * scale
+        chronic = self.ewma42 * scale
+        total = self.window_total * scale
+
+        # Only the tail of the window can fall in the recent period
+        week_ago = now_ms - RECENT_DAYS * MS_PER_DAY
+        recent = []
+        for t, date, name, load, _ in reversed(self.window):
+            if t < week_ago:
+                break
+            recent.append({'date': date, 'name': name, 'load': load * scale})
+        recent.reverse()
+
+        return {
+            'currentACWR': acute / chronic if chronic > 0 else None,
+            'acuteLoad': acute,
+            'chronicLoad': chronic,
+            'maxGrade': int(g_max) if float(g_max).is_integer() else g_max,
+            'recentSessionCount': len(recent),
+            'totalLoad': total,
+            'averageSessionLoad': total / len(self.window),
+            'recentSessions': recent,
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            'span7': self.span7,
+            'span42': self.span42,
+            'ewma7': self.ewma7,
+            'ewma42': self.ewma42,
+            'g_max': self.g_max,
+            'last_ms': self.last_ms,
+            'last_id': self.last_id,
+            'window': list(self.window),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LoadState':
+        state = cls(data['span7'], data['span42'])
+        state.ewma7 = data['ewma7']
+        state.ewma42 = data['ewma42']
+        state.g_max = data['g_max']
+        state.last_ms = data['last_ms']
+        state.last_id = data['last_id']
+        state.window = deque(tuple(entry) for entry in data['window'])
+        state.window_total = sum(entry[3] for entry in state.window)
+        state.window_hash = sum(entry[4] for entry in state.window) % FINGERPRINT_MOD
+        return state
+
+
+class LoadStateStore:
+    """Per-athlete LoadState kept in memory and persisted as one JSON file.
+
+    Writes go to a temporary file that atomically replaces the old one.
+    Without a path the states only live for the process.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._states: Dict[str, LoadState] = {}
+        self._lock = threading.Lock()
+        self._read()
+
+    def _read(self) -> None:
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != LOAD_STATE_VERSION:
+            return
+        try:
+            self._states = {athlete: LoadState.from_dict(state) for athlete, state in data['athletes'].items()}
+        except (KeyError, TypeError, IndexError):
+            self._states = {}
+
+    def _write(self) -> None:
+        if not self.path:
+            return
+        data = {
+            'version': LOAD_STATE_VERSION,
+            'athletes': {athlete: state.to_dict() for athlete, state in self._states.items()},
+        }
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = f"{self.path}.{uuid.uuid4().hex}"
+            with open(tmp, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning("Could not save training load state: %s", e)
+
+    def get(self, athlete: str) -> Optional[LoadState]:
+        with self._lock:
+            return self._states.get(athlete)
+
+    def summary(self, athlete: str, fingerprint: Tuple[int, int], now: Optional[datetime] = None) -> Optional[Dict]:
+        """Summary from the stored state, or None if it is missing or its sessions differ from ``fingerprint``.
+
+        ``fingerprint`` is the window_fingerprint of a fresh listing, so
+        edited, deleted and back-dated sessions all force a rebuild.
+        """
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            state = self._states.get(athlete)
+            if state is None or state.fingerprint(now) != fingerprint:
+                return None
+            return state.summary(now)
+
+    def rebuild(self, athlete: str, sessions: List[Dict]) -> LoadState:
+        """Replace the athlete's state with one built from all their sessions"""
+        state = LoadState.from_sessions(sessions)
+        with self._lock:
+            self._states[athlete] = state
+            self._write()
+        return state
+
+    def record(self, athlete: str, session: Dict) -> None:
+        """Apply a newly written session; a back-dated one drops the state for a rebuild.
+
+        Sessions scheduled in the future are left out until they are due;
+        the state's fingerprint then no longer matches the listing and it is
+        rebuilt. Applying to a state that was already stale keeps it stale.
+        """
+        now_ms, session_ms = date_ms([datetime.now(timezone.utc), session['scheduledDate']])
+        if session_ms > now_ms:
+            return
+        with self._lock:
+            state = self._states.get(athlete)
+            if state is None:
+                return
+            if not state.apply(session):
+                del self._states[athlete]
+            self._write()
@@ -0,0 +1,79 @@
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Small thread-safe cache whose entries expire after ``ttl`` seconds.
+
+    Each key carries a generation counter bumped by ``invalidate``. Readers
+    take a ``token`` before fetching and pass it back to ``set``; a value
+    fetched before an invalidation is then dropped instead of cached, so a
+    write is never hidden by a slow read that started before it.
+
+    With ``max_entries``, each ``set`` also drops the expired entries and,
+    when the cache is full, the oldest ones, so keys that are never read
+    again do not pile up.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 0):
+        self.ttl = ttl
+        # 0: unbounded
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._generations: Dict[Hashable, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def token(self, key: Hashable) -> Tuple[int, int]:
+        """Generation to hand back to set() once the value has been fetched"""
+        with self._lock:
+            return self._epoch, self._generations.get(key, 0)
+
+    def set(self, key: Hashable, value: Any, token: Optional[Tuple[int, int]] = None) -> None:
+        """Cache a value unless the key was invalidated after ``token`` was taken"""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            if token is not None and token != (self._epoch, self._generations.get(key, 0)):
+                return
+            now = time.monotonic()
+            # Re-inserted, so the dict stays in order of expiry
+            self._entries.pop(key, None)
+            if self.max_entries:
+                self._evict(now)
+            self._entries[key] = (now + self.ttl, value)
+
+    def _evict(self, now: float) -> None:
+        """Drop expired entries, then the oldest until one more fits (lock held)"""
+        while self._entries:
+            oldest = next(iter(self._entries))
+            if self._entries[oldest][0] >= now and len(self._entries) < self.max_entries:
+                break
+            del self._entries[oldest]
+
+    def invalidate(self, *keys: Hashable) -> None:
+        """Drop entries and reject in-flight fetches for them"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def clear(self) -> None:
+        """Drop everything and reject every in-flight fetch"""
+        with self._lock:
+            self._entries.clear()
+            self._epoch += 1
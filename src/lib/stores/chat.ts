@@ -22,6 +22,18 @@ if (browser) {
     });
 }
 
+// Backend conversation the messages belong to, so follow-ups keep their context
+export const conversationId = writable<string | null>(
+    browser ? localStorage.getItem('conversationId') : null
+);
+
+if (browser) {
+    conversationId.subscribe(id => {
+        if (id) localStorage.setItem('conversationId', id);
+        else localStorage.removeItem('conversationId');
+    });
+}
+
 // Helper functions to manipulate the chat store
 export function addMessage(message: ChatMessage) {
     chatMessages.update(messages => [
@@ -32,6 +44,7 @@ export function addMessage(message: ChatMessage) {
 
 export function clearMessages() {
     chatMessages.set([]);
+    conversationId.set(null);
 }
 
 // Function to get the last N messages (useful for context)
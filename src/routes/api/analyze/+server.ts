@@ -14,6 +14,17 @@ export const POST: RequestHandler = async ({ request }) => {
       body: JSON.stringify(data)
     });
 
+    // Streaming mode: hand the SSE body straight to the client without buffering
+    if (data?.stream && pythonResponse.ok && pythonResponse.body) {
+      return new Response(pythonResponse.body, {
+        headers: {
+          'Content-Type': 'text/event-stream',
+          'Cache-Control': 'no-cache',
+          Connection: 'keep-alive'
+        }
+      });
+    }
+
     const responseText = await pythonResponse.text();
 
     if (!pythonResponse.ok) {
@@ -24,7 +35,8 @@ export const POST: RequestHandler = async ({ request }) => {
     
     return json({
       success: true,
-      reply: pythonData.reply
+      reply: pythonData.reply,
+      conversationId: pythonData.conversation_id
     });
     
   } catch (error) {
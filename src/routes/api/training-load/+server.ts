@@ -3,6 +3,10 @@ import type { RequestHandler } from './$types';
 import { listTrainingSessions } from '$lib/server/training';
 import { computeSessionLoads, computeACWR } from '$lib/load';
 
+// Same cap as the coach's TRAINING_LOAD_MAX_SESSIONS; listTrainingSessions
+// otherwise returns only the latest 20, cutting into the 42-day chronic window
+const MAX_SESSIONS = 1000;
+
 export const GET: RequestHandler = async () => {
   try {
     // Get sessions from the last 180 days
@@ -12,7 +16,8 @@ export const GET: RequestHandler = async () => {
     
     const sessions = await listTrainingSessions({ 
       from, 
-      to 
+      to,
+      take: MAX_SESSIONS
     });
 
     if (!sessions || sessions.length === 0) {